@@ -2,12 +2,12 @@ from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import subprocess
 import os
-from typing import Dict, List
+import sys
+from typing import Dict, List, Optional
 import logging
 import asyncio
 import json
 from pydantic import BaseModel
-import httpx
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,6 +31,16 @@ IMAGE_SERVICE_URL = "http://localhost:8001"
 PERFORMANCE_SERVICE_URL = "http://localhost:8003"
 CAMPAIGN_SERVICE_URL = "http://localhost:8004"
 
+# Reuse the services' pooled keep-alive clients for MCP tool calls
+sys.path.append(os.getenv("META_ADS_SERVICES_DIR", os.path.join(DOCKER_COMPOSE_DIR, "services")))
+from http_pool import ServicePool
+
+service_pool = ServicePool()
+service_pool.register("master", MASTER_SERVICE_URL, env_prefix="DASHBOARD_MASTER")
+service_pool.register("image-generator", IMAGE_SERVICE_URL, env_prefix="DASHBOARD_IMAGE")
+service_pool.register("performance-analyzer", PERFORMANCE_SERVICE_URL, env_prefix="DASHBOARD_PERFORMANCE")
+service_pool.register("campaign-manager", CAMPAIGN_SERVICE_URL, env_prefix="DASHBOARD_CAMPAIGN")
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
@@ -46,11 +56,44 @@ class ConnectionManager:
         await websocket.send_text(message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        for connection in list(self.active_connections):
+            try:
+                await connection.send_text(message)
+            except Exception:
+                self.disconnect(connection)
 
 manager = ConnectionManager()
 
+# Background relays of master job events to every WebSocket client
+relay_tasks = set()
+
+async def relay_job_events(job_id: str, send) -> bool:
+    """Forward a master job's progress events to ``send``, one JSON text per event
+    
+    Follows the master's NDJSON stream until the job finishes; False if the job is unknown.
+    """
+    async with service_pool["master"].stream(
+        "GET", f"/jobs/{job_id}/events", params={"format": "ndjson"}, timeout=60.0
+    ) as response:
+        if response.status_code != 200:
+            return False
+        async for line in response.aiter_lines():
+            if line.strip():  # Blank lines are keep-alives
+                await send(line)
+    return True
+
+def start_job_relay(job_id: str):
+    """Broadcast a job's progress to all WebSocket clients in the background"""
+    async def relay():
+        try:
+            await relay_job_events(job_id, manager.broadcast)
+        except Exception as e:
+            logger.warning(f"Job {job_id} event relay stopped: {str(e)}")
+    
+    task = asyncio.create_task(relay())
+    relay_tasks.add(task)
+    task.add_done_callback(relay_tasks.discard)
+
 def run_command(command: List[str], cwd: str = DOCKER_COMPOSE_DIR) -> tuple:
     """Execute a shell command and return output and error."""
     try:
@@ -261,6 +304,21 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+@app.websocket("/ws/jobs/{job_id}")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """Live progress events of one ad creation job, relayed from the master"""
+    await websocket.accept()
+    try:
+        found = await relay_job_events(job_id, websocket.send_text)
+        if not found:
+            await websocket.send_text(json.dumps({"type": "error", "job_id": job_id, "error": "Job not found"}))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Job {job_id} event relay failed: {str(e)}")
+        await websocket.close(code=1011)
+
 # MCP Tool Definitions
 MCP_TOOLS = [
     {
@@ -282,9 +340,23 @@ MCP_TOOLS = [
             }
         }
     },
+    {
+        "name": "get_job_status",
+        "description": "Get the progress of an ad creation job started by create_ads, including per-ad stage, cost and errors",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {
+                    "type": "string",
+                    "description": "Job ID returned by create_ads"
+                }
+            },
+            "required": ["job_id"]
+        }
+    },
     {
         "name": "check_service_health",
-        "description": "Check the health status of all Meta Ads microservices",
+        "description": "Check the health status of all Meta Ads microservices, including circuit breaker state",
         "parameters": {
             "type": "object",
             "properties": {}
@@ -306,50 +378,77 @@ MCP_TOOLS = [
     }
 ]
 
-async def call_mcp_tool(tool_name: str, arguments: dict) -> str:
-    """Call an MCP tool and return the result"""
+async def call_mcp_tool(tool_name: str, arguments: dict, request_id: Optional[str] = None) -> str:
+    """Call an MCP tool and return the result
+    
+    ``request_id`` identifies the chat message; resending the same message reuses
+    it, so the master runs the cycle once however often the call is repeated.
+    """
     try:
         if tool_name == "create_ads":
             ads_to_create = arguments.get("ads_to_create", 1)
             daily_budget = arguments.get("daily_budget", 500)
+            headers = {"Idempotency-Key": f"chat-{request_id}"} if request_id else None
             
-            async with httpx.AsyncClient(timeout=600.0) as client:
-                response = await client.post(
-                    f"{MASTER_SERVICE_URL}/execute",
-                    json={
-                        "ads_to_create": ads_to_create,
-                        "daily_budget": daily_budget
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return json.dumps(result, indent=2)
-                else:
-                    return f"Error creating ads: {response.status_code} - {response.text}"
+            # The master queues the cycle and returns a job ID right away
+            response = await service_pool["master"].post(
+                "/execute",
+                json={
+                    "ads_to_create": ads_to_create,
+                    "daily_budget": daily_budget,
+                    "priority": "interactive"  # Ahead of scheduled batch cycles
+                },
+                headers=headers,
+                timeout=30.0,
+                idempotent=bool(request_id)
+            )
+            
+            if response.status_code in (200, 202):
+                result = response.json()
+                if response.status_code == 202 and not result.get("replayed"):
+                    # Progress events reach WebSocket clients while the job runs
+                    start_job_relay(result["job_id"])
+                return json.dumps(result, indent=2)
+            else:
+                return f"Error creating ads: {response.status_code} - {response.text}"
+        
+        elif tool_name == "get_job_status":
+            job_id = arguments.get("job_id")
+            if not job_id:
+                return "Error: job_id is required"
+            
+            response = await service_pool["master"].get(f"/jobs/{job_id}", timeout=10.0)
+            
+            if response.status_code == 200:
+                return json.dumps(response.json(), indent=2)
+            else:
+                return f"Error getting job status: {response.status_code} - {response.text}"
         
         elif tool_name == "check_service_health":
             health_status = {}
-            services = {
-                "master": f"{MASTER_SERVICE_URL}/health",
-                "image-generator": f"{IMAGE_SERVICE_URL}/health",
-                "performance-analyzer": f"{PERFORMANCE_SERVICE_URL}/health",
-                "campaign-manager": f"{CAMPAIGN_SERVICE_URL}/health"
-            }
             
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                for service_name, health_url in services.items():
-                    try:
-                        response = await client.get(health_url)
-                        health_status[service_name] = {
-                            "status": "healthy" if response.status_code == 200 else "unhealthy",
-                            "status_code": response.status_code
-                        }
-                    except Exception as e:
-                        health_status[service_name] = {
-                            "status": "unreachable",
-                            "error": str(e)
-                        }
+            breakers = {}
+            
+            for service_name in SERVICE_NAMES:
+                try:
+                    response = await service_pool[service_name].get("/health", timeout=5.0, retries=0)
+                    health_status[service_name] = {
+                        "status": "healthy" if response.status_code == 200 else "unhealthy",
+                        "status_code": response.status_code
+                    }
+                    if service_name == "master" and response.status_code == 200:
+                        health_status[service_name]["status"] = response.json().get("status", "healthy")
+                        breakers = response.json().get("circuit_breakers", {})
+                except Exception as e:
+                    health_status[service_name] = {
+                        "status": "unreachable",
+                        "error": str(e)
+                    }
+            
+            # Circuit breaker state as seen by the master, which makes the downstream calls
+            for service_name, breaker in breakers.items():
+                if service_name in health_status:
+                    health_status[service_name]["circuit_breaker"] = breaker
             
             return json.dumps(health_status, indent=2)
         
@@ -386,7 +485,8 @@ async def call_mcp_tool(tool_name: str, arguments: dict) -> str:
         logger.error(f"Error calling MCP tool {tool_name}: {str(e)}")
         return f"Error: {str(e)}"
 
-async def chat_with_ai_agent(user_message: str, api_key: str, model: str) -> str:
+async def chat_with_ai_agent(user_message: str, api_key: str, model: str,
+                             request_id: Optional[str] = None) -> str:
     """Chat with AI agent that has access to MCP tools"""
     try:
         from openai import OpenAI
@@ -426,6 +526,7 @@ When a user asks you to perform actions like creating ads, checking health, or g
 
 For example:
 - To create 5 ads: {{"tool": "create_ads", "arguments": {{"ads_to_create": 5, "daily_budget": 1000}}}}
+- To check progress of an ad creation job: {{"tool": "get_job_status", "arguments": {{"job_id": "<job_id from create_ads>"}}}}
 - To check health: {{"tool": "check_service_health", "arguments": {{}}}}
 - To get recent ads count: {{"tool": "get_recent_ads_count", "arguments": {{"hours": 4}}}}
 
@@ -451,7 +552,7 @@ If you use a tool, respond ONLY with the JSON tool call. Otherwise, respond conv
                 logger.info(f"AI agent calling tool: {tool_name} with args: {tool_args}")
                 
                 # Execute the tool
-                tool_result = await call_mcp_tool(tool_name, tool_args)
+                tool_result = await call_mcp_tool(tool_name, tool_args, request_id)
                 
                 # Send result back to AI for interpretation
                 completion2 = client.chat.completions.create(
@@ -474,11 +575,21 @@ If you use a tool, respond ONLY with the JSON tool call. Otherwise, respond conv
         logger.error(f"Error in AI agent chat: {str(e)}")
         raise
 
+@app.get("/api/pool-stats")
+async def get_pool_stats():
+    """Connection reuse statistics for the dashboard's service clients"""
+    return service_pool.stats()
+
+@app.on_event("shutdown")
+async def close_service_pool():
+    await service_pool.aclose()
+
 @app.post("/api/chat")
 async def chat_with_agent(message: dict):
     user_message = message.get("message")
     api_key = message.get("apiKey", "")
     model = message.get("model", "gpt-4.1-mini")
+    request_id = message.get("requestId")  # Same for resends of one message
     
     if not user_message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
@@ -486,7 +597,7 @@ async def chat_with_agent(message: dict):
     # Use AI agent with MCP tools if API key is provided
     if api_key:
         try:
-            response = await chat_with_ai_agent(user_message, api_key, model)
+            response = await chat_with_ai_agent(user_message, api_key, model, request_id)
             return {"response": response}
         except Exception as e:
             logger.error(f"Error using AI agent: {str(e)}")
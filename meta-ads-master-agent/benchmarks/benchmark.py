@@ -0,0 +1,405 @@
+"""
+End-to-end throughput benchmark for the ad creation cycle
+
+Starts the four services plus the Kie.ai and Graph API simulators as local processes,
+drives POST /execute across a matrix of ads_to_create x max_concurrency, and writes
+ads per minute, per-ad latency percentiles, per-stage timings and peak RSS per service
+to a JSON file. Passing an earlier result as --baseline flags regressions.
+
+    python benchmarks/benchmark.py --ads 5,20 --concurrency 1,3,8 --output bench.json
+    python benchmarks/benchmark.py --baseline bench.json --output bench-new.json
+
+With --master-url the harness drives an already running stack instead (for example
+docker-compose.yml + docker-compose.sim.yml); peak RSS is then not measured.
+"""
+
+import os
+import re
+import math
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = os.path.join(ROOT, "services")
+
+KIE_PORT, GRAPH_PORT = 8101, 8102
+
+# name -> (app directory, module, port)
+STACK = {
+    "kie-fake": ("simulators", "kie", KIE_PORT),
+    "graph-fake": ("simulators", "graph", GRAPH_PORT),
+    "image-generator": ("image-generator", "app", 8001),
+    "performance-analyzer": ("performance-analyzer", "app", 8003),
+    "campaign-manager": ("campaign-manager", "app", 8004),
+    "master": ("master", "app", 8000),
+}
+
+TERMINAL_EVENTS = {"saved", "failed"}
+FINISHED_STATUSES = {"completed", "failed"}
+
+STAGE_METRIC = re.compile(r'^master_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for no samples"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+class RssSampler:
+    """Tracks the peak resident set size of each started process between resets"""
+
+    def __init__(self, pids: Dict[str, int], interval: float = 0.1):
+        self.pids = pids
+        self.interval = interval
+        self.peaks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def reset(self) -> Dict[str, float]:
+        """Peak RSS in MB per service since the last reset"""
+        with self._lock:
+            peaks, self.peaks = self.peaks, {}
+        return {name: round(kb / 1024, 1) for name, kb in sorted(peaks.items())}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for name, pid in self.pids.items():
+                kb = self._rss_kb(pid)
+                if kb is None:
+                    continue
+                with self._lock:
+                    self.peaks[name] = max(self.peaks.get(name, 0), kb)
+
+    @staticmethod
+    def _rss_kb(pid: int) -> Optional[int]:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError):
+            return None
+        return None
+
+
+class LocalStack:
+    """The services and simulators as uvicorn processes sharing a scratch data directory"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="meta-ads-bench-")
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def environment(self) -> Dict[str, str]:
+        data = self.workdir
+        return {
+            **os.environ,
+            "PYTHONUNBUFFERED": "1",
+            # Simulators
+            "KIE_FAKE_COMPLETION": self.args.kie_completion,
+            "KIE_FAKE_FAIL_RATE": str(self.args.kie_fail_rate),
+            "KIE_FAKE_PUBLIC_URL": f"http://127.0.0.1:{KIE_PORT}",
+            "GRAPH_FAKE_LATENCY": self.args.graph_latency,
+            "GRAPH_FAKE_ERROR_RATE": str(self.args.graph_error_rate),
+            # Services
+            "SIMULATION_MODE": "true",
+            "KIE_API_BASE": f"http://127.0.0.1:{KIE_PORT}/api/v1",
+            "KIE_POLL_INTERVAL": str(self.args.kie_poll_interval),
+            "GRAPH_API_BASE": f"http://127.0.0.1:{GRAPH_PORT}/v21.0",
+            "IMAGE_SERVICE_URL": "http://127.0.0.1:8001",
+            "PERFORMANCE_SERVICE_URL": "http://127.0.0.1:8003",
+            "CAMPAIGN_SERVICE_URL": "http://127.0.0.1:8004",
+            "DB_PATH": os.path.join(data, "meta_ads_performance.db"),
+            "BUDGET_DB_PATH": os.path.join(data, "budget.db"),
+            "CHECKPOINT_DB_PATH": os.path.join(data, "master_checkpoints.db"),
+            "SCHEDULE_DB_PATH": os.path.join(data, "master_schedules.db"),
+            "IDEMPOTENCY_DB_PATH": os.path.join(data, "master_idempotency.db"),
+            "JOB_QUEUE_DB_PATH": os.path.join(data, "master_jobs.db"),
+            "TRACE_DIR": os.path.join(data, "traces"),
+            "SCHEDULER_ENABLED": "false",
+            "RESUME_ON_STARTUP": "false",
+        }
+
+    def start(self):
+        env = self.environment()
+        os.makedirs(os.path.join(self.workdir, "logs"))
+        for name, (directory, module, port) in STACK.items():
+            if port_in_use(port):
+                raise RuntimeError(f"Port {port} for {name} is already in use; stop that process "
+                                   f"or benchmark the running stack with --master-url")
+            log = open(os.path.join(self.workdir, "logs", f"{name}.log"), "w")
+            self.processes[name] = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", f"{module}:app", "--app-dir", os.path.join(SERVICES, directory),
+                 "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            wait_healthy(name, f"http://127.0.0.1:{port}/health", self.processes[name])
+        print(f"✅ Stack running, data and logs in {self.workdir}")
+
+    def pids(self) -> Dict[str, int]:
+        return {name: process.pid for name, process in self.processes.items()}
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if not self.args.keep_data:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def port_in_use(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def wait_healthy(name: str, url: str, process: Optional[subprocess.Popen] = None, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{name} not healthy at {url} after {timeout:.0f}s")
+
+
+def stage_totals(client: httpx.Client) -> Dict[str, List[float]]:
+    """Cumulative [sum, count] of master_stage_duration_seconds per stage"""
+    totals: Dict[str, List[float]] = {}
+    for line in client.get("/metrics").text.splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, [0.0, 0.0])[kind == "count"] = float(value)
+    return totals
+
+
+def stage_breakdown(before: Dict[str, List[float]], after: Dict[str, List[float]]) -> Dict[str, dict]:
+    breakdown = {}
+    for stage, (total, count) in sorted(after.items()):
+        total -= before.get(stage, [0.0, 0.0])[0]
+        count -= before.get(stage, [0.0, 0.0])[1]
+        if count:
+            breakdown[stage] = {"count": int(count), "mean_seconds": round(total / count, 3),
+                                "total_seconds": round(total, 3)}
+    return breakdown
+
+
+def reset_simulators(args):
+    for url in (args.kie_url, args.graph_url):
+        try:
+            httpx.post(f"{url}/stats/reset", timeout=5)
+        except httpx.HTTPError:
+            pass
+
+
+def simulator_stats(args) -> Dict[str, dict]:
+    stats = {}
+    for name, url in (("kie", args.kie_url), ("graph", args.graph_url)):
+        try:
+            stats[name] = httpx.get(f"{url}/stats", timeout=5).json()
+        except httpx.HTTPError:
+            stats[name] = None
+    return stats
+
+
+def run_scenario(client: httpx.Client, args, ads: int, concurrency: int, sampler: Optional[RssSampler]) -> dict:
+    """One /execute cycle; per-ad latency runs from an ad's first progress event to saved or failed"""
+    name = f"{args.mode}-ads{ads}-c{concurrency}"
+    print(f"🏁 {name}")
+    reset_simulators(args)
+    before = stage_totals(client)
+    if sampler is not None:
+        sampler.reset()
+
+    started = time.monotonic()
+    submission = client.post("/execute", json={
+        "ads_to_create": ads, "max_concurrency": concurrency, "mode": args.mode,
+        "daily_budget": args.daily_budget, "priority": "batch",
+    })
+    submission.raise_for_status()
+    job_id = submission.json()["job_id"]
+
+    first_seen: Dict[tuple, datetime] = {}
+    finished: Dict[tuple, datetime] = {}
+    with client.stream("GET", f"/jobs/{job_id}/events", params={"format": "ndjson"},
+                       timeout=httpx.Timeout(10, read=args.timeout)) as stream:
+        for line in stream.iter_lines():
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if "ad_index" not in event:
+                continue
+            key = (event.get("ad_account_id"), event.get("cycle_id"), event["ad_index"])
+            at = datetime.fromisoformat(event["time"])
+            first_seen.setdefault(key, at)
+            if event["type"] in TERMINAL_EVENTS:
+                finished[key] = at
+    job = client.get(f"/jobs/{job_id}").json()
+    while job.get("status") not in FINISHED_STATUSES:
+        # The stream closes a moment before the job's result is stored
+        time.sleep(0.05)
+        job = client.get(f"/jobs/{job_id}").json()
+    wall = time.monotonic() - started
+
+    result = job.get("result") or {}
+    ads_created = result.get("ads_created", 0)
+    latencies = [(finished[key] - first_seen[key]).total_seconds() for key in finished]
+    scenario = {
+        "name": name,
+        "mode": args.mode,
+        "ads_to_create": ads,
+        "max_concurrency": concurrency,
+        "job_id": job_id,
+        "status": job.get("status"),
+        "ads_created": ads_created,
+        "ads_failed": ads - ads_created,
+        "wall_seconds": round(wall, 3),
+        "ads_per_minute": round(ads_created / wall * 60, 2) if wall else 0.0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 3) if latencies else None,
+        },
+        "stages": stage_breakdown(before, stage_totals(client)),
+        "peak_rss_mb": sampler.reset() if sampler is not None else None,
+        "upstream_calls": simulator_stats(args),
+    }
+    latency = scenario["latency_seconds"]
+    print(f"   {ads_created}/{ads} ads in {wall:.1f}s, {scenario['ads_per_minute']} ads/min, "
+          f"p50 {latency['p50']}s p95 {latency['p95']}s p99 {latency['p99']}s")
+    return scenario
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Scenarios slower than the baseline by more than ``tolerance`` (a fraction)"""
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            continue
+        if old["ads_per_minute"] and scenario["ads_per_minute"] < old["ads_per_minute"] * (1 - tolerance):
+            regressions.append(f"{scenario['name']}: {old['ads_per_minute']} -> "
+                               f"{scenario['ads_per_minute']} ads/min")
+        old_p95, new_p95 = old["latency_seconds"]["p95"], scenario["latency_seconds"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{scenario['name']}: p95 {old_p95}s -> {new_p95}s")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--ads", type=int_list, default=[1, 5, 20], help="ads_to_create values, e.g. 1,5,20")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 3, 8], help="max_concurrency values")
+    parser.add_argument("--mode", choices=["concurrent", "pipeline"], default="concurrent")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each scenario")
+    parser.add_argument("--daily-budget", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds to wait for one cycle")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown before a regression")
+    parser.add_argument("--master-url", help="Benchmark a running stack instead of starting one")
+    parser.add_argument("--kie-url", default=f"http://127.0.0.1:{KIE_PORT}")
+    parser.add_argument("--graph-url", default=f"http://127.0.0.1:{GRAPH_PORT}")
+    parser.add_argument("--kie-completion", default="lognormal:2,0.3", help="Simulated image generation time")
+    parser.add_argument("--kie-poll-interval", type=float, default=0.5)
+    parser.add_argument("--kie-fail-rate", type=float, default=0.0)
+    parser.add_argument("--graph-latency", default="lognormal:0.05,0.3", help="Simulated Graph API latency")
+    parser.add_argument("--graph-error-rate", type=float, default=0.0)
+    parser.add_argument("--keep-data", action="store_true", help="Keep the scratch databases and logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stack = sampler = None
+    if args.master_url is None:
+        stack = LocalStack(args)
+        stack.start()
+        sampler = RssSampler(stack.pids())
+        sampler.start()
+    master_url = args.master_url or "http://127.0.0.1:8000"
+
+    results = {
+        "started_at": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "scenarios": [],
+    }
+    try:
+        with httpx.Client(base_url=master_url, timeout=30) as client:
+            for ads in args.ads:
+                for concurrency in args.concurrency:
+                    for run in range(args.repeat):
+                        scenario = run_scenario(client, args, ads, concurrency, sampler)
+                        scenario["run"] = run + 1
+                        results["scenarios"].append(scenario)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if stack is not None:
+            stack.stop()
+    results["finished_at"] = datetime.now().isoformat()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+    for regression in regressions:
+        print(f"⚠️  Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
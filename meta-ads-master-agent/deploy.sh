@@ -70,45 +70,21 @@ ssh -o StrictHostKeyChecking=no ${VPS_USER}@${VPS_HOST} "
 "
 
 echo ""
-echo "⏰ Step 5: Setting up systemd timer..."
+echo "⏰ Step 5: Configuring the built-in scheduler..."
 ssh -o StrictHostKeyChecking=no ${VPS_USER}@${VPS_HOST} "
-    # Create service file
-    cat > /etc/systemd/system/meta-ads-master.service << 'EOF'
-[Unit]
-Description=Meta Ads Master Agent
-After=docker.service
-Requires=docker.service
-
-[Service]
-Type=oneshot
-WorkingDirectory=${DEPLOY_PATH}
-ExecStart=/usr/bin/curl -X POST http://localhost:8000/execute -H \"Content-Type: application/json\" -d '{\"ads_to_create\": 1, \"daily_budget\": 500}'
-
-[Install]
-WantedBy=multi-user.target
-EOF
-
-    # Create timer file
-    cat > /etc/systemd/system/meta-ads-master.timer << 'EOF'
-[Unit]
-Description=Run Meta Ads Master Agent every 15 minutes
-
-[Timer]
-OnBootSec=5min
-OnUnitActiveSec=15min
-Unit=meta-ads-master.service
+    # The master schedules cycles itself; remove the old systemd timer if present
+    systemctl disable --now meta-ads-master.timer 2>/dev/null || true
+    rm -f /etc/systemd/system/meta-ads-master.service /etc/systemd/system/meta-ads-master.timer
+    systemctl daemon-reload
 
-[Install]
-WantedBy=timers.target
-EOF
+    # Create the default 15-minute schedule once
+    if ! curl -s http://localhost:8000/schedules | jq -e '.schedules[] | select(.name == \"default\")' > /dev/null; then
+        curl -s -X POST http://localhost:8000/schedules -H 'Content-Type: application/json' \
+            -d '{\"name\": \"default\", \"cron\": \"*/15 * * * *\", \"ads_to_create\": 1, \"daily_budget\": 500, \"jitter_seconds\": 60}' > /dev/null
+    fi
 
-    # Reload systemd and enable timer
-    systemctl daemon-reload
-    systemctl enable meta-ads-master.timer
-    systemctl start meta-ads-master.timer
-    
-    echo '✅ Systemd timer configured and started'
-    systemctl status meta-ads-master.timer --no-pager
+    echo '✅ Built-in scheduler configured'
+    curl -s http://localhost:8000/schedules | jq '.schedules[] | {name, cron, next_run_at}'
 "
 
 echo ""
@@ -0,0 +1,172 @@
+"""
+Cost budget governor shared by Meta Ads services
+Reserves expected cost before paid work starts and settles the actual cost afterwards,
+enforcing hourly and daily caps atomically across processes through SQLite on /data
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Budget categories
+GENERATION = "generation"  # Image generation spend in dollars
+AD_SPEND = "ad_spend"      # Daily budgets committed to new ad sets, in dollars
+
+# Rolling windows each category can be capped over
+WINDOWS = {"hourly": 3600, "daily": 86400}
+
+
+class BudgetExceeded(Exception):
+    """A reservation would take a category over one of its caps"""
+
+    def __init__(self, category: str, window: str, cap: float, remaining: float, amount: float):
+        super().__init__(
+            f"{category} {window} budget exceeded: ${amount:.2f} requested, "
+            f"${max(remaining, 0):.2f} of ${cap:.2f} left"
+        )
+        self.category = category
+        self.window = window
+        self.cap = cap
+        self.remaining = remaining
+
+
+class BudgetGovernor:
+    """Atomic reserve / settle / release against per-category rolling caps
+
+    Reserved amounts count against the caps until they are settled with the actual
+    cost or released. Reservations left behind by a crashed worker stop counting
+    after ``reservation_ttl`` seconds.
+    """
+
+    def __init__(self, db_path: str, caps: Dict[str, Dict[str, Optional[float]]],
+                 reservation_ttl: float = 1800):
+        self.db_path = db_path
+        self.caps = caps
+        self.reservation_ttl = reservation_ttl
+        self.init_database()
+
+    @classmethod
+    def from_env(cls) -> "BudgetGovernor":
+        """Caps from BUDGET_<CATEGORY>_<WINDOW>_CAP in dollars; unset or 0 means uncapped"""
+        def cap(name):
+            value = float(os.getenv(name) or 0)
+            return value if value > 0 else None
+
+        caps = {
+            category: {window: cap(f"BUDGET_{category.upper()}_{window.upper()}_CAP") for window in WINDOWS}
+            for category in (GENERATION, AD_SPEND)
+        }
+        return cls(
+            os.getenv("BUDGET_DB_PATH", "/data/budget.db"),
+            caps,
+            reservation_ttl=float(os.getenv("BUDGET_RESERVATION_TTL", "1800")),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so reserve() can hold an explicit write lock
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def init_database(self):
+        """Initialize reservation table"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS reservations (
+                reservation_id TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                amount REAL NOT NULL,
+                actual REAL,
+                status TEXT NOT NULL DEFAULT 'reserved',
+                owner TEXT,
+                created_at REAL NOT NULL,
+                settled_at REAL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reservations_category ON reservations(category, created_at)
+        ''')
+        conn.close()
+        logger.info(f"✅ Budget database initialized ({self.db_path})")
+
+    def _usage(self, conn: sqlite3.Connection, category: str, window_seconds: int, now: float) -> Dict:
+        settled, reserved = conn.execute('''
+            SELECT
+                COALESCE(SUM(CASE WHEN status = 'settled' THEN actual ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN status = 'reserved' AND expires_at > ? THEN amount ELSE 0 END), 0)
+            FROM reservations
+            WHERE category = ? AND COALESCE(settled_at, created_at) > ?
+        ''', (now, category, now - window_seconds)).fetchone()
+        return {"settled": settled, "reserved": reserved}
+
+    def reserve(self, category: str, amount: float, owner: Optional[str] = None,
+                ttl: Optional[float] = None) -> str:
+        """Reserve ``amount`` or raise BudgetExceeded; returns the reservation ID"""
+        now = time.time()
+        reservation_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            # One writer at a time across every process sharing the database
+            conn.execute('BEGIN IMMEDIATE')
+            for window, seconds in WINDOWS.items():
+                cap = self.caps.get(category, {}).get(window)
+                if cap is None:
+                    continue
+                usage = self._usage(conn, category, seconds, now)
+                remaining = cap - usage["settled"] - usage["reserved"]
+                if amount > remaining + 1e-9:
+                    raise BudgetExceeded(category, window, cap, remaining, amount)
+            conn.execute('''
+                INSERT INTO reservations (reservation_id, category, amount, owner, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (reservation_id, category, amount, owner, now, now + (ttl or self.reservation_ttl)))
+            conn.execute('DELETE FROM reservations WHERE created_at < ?', (now - 2 * max(WINDOWS.values()),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return reservation_id
+
+    def settle(self, reservation_id: str, actual: float):
+        """Record the actual cost; also applies to released or expired reservations,
+        since money spent after a caller gave up is still spent"""
+        conn = self._connect()
+        conn.execute('''
+            UPDATE reservations SET status = 'settled', actual = ?, settled_at = ?
+            WHERE reservation_id = ?
+        ''', (actual, time.time(), reservation_id))
+        conn.close()
+
+    def release(self, reservation_id: str):
+        """Give back a reservation that will not be spent; settled ones are unaffected"""
+        conn = self._connect()
+        conn.execute('''
+            UPDATE reservations SET status = 'released', settled_at = ?
+            WHERE reservation_id = ? AND status = 'reserved'
+        ''', (time.time(), reservation_id))
+        conn.close()
+
+    def headroom(self) -> Dict:
+        """Cap, settled, reserved and remaining amount per category and window"""
+        now = time.time()
+        conn = self._connect()
+        result = {}
+        for category, caps in self.caps.items():
+            result[category] = {}
+            for window, seconds in WINDOWS.items():
+                usage = self._usage(conn, category, seconds, now)
+                cap = caps.get(window)
+                result[category][window] = {
+                    "cap": cap,
+                    "settled": round(usage["settled"], 4),
+                    "reserved": round(usage["reserved"], 4),
+                    "remaining": round(cap - usage["settled"] - usage["reserved"], 4) if cap is not None else None,
+                }
+        conn.close()
+        return result
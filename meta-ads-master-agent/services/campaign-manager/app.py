@@ -5,22 +5,110 @@ Creates and manages Meta Ads campaigns
 
 import os
 import sys
+import json
+import time
 import requests
-from typing import Optional
+import threading
+import contextvars
+from typing import Dict, Literal, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 # Add parent directory to path for shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared_models import HookData, TARGETING_SPEC, LANDING_PAGE_URL
+import tracing
 
 app = FastAPI(title="Campaign Manager Service")
+tracing.install(app, "campaign-manager")
+
+# Graph API error codes for application / account level rate limiting
+GRAPH_RATE_LIMIT_CODES = {4, 17, 32, 613}
+
+# Set to the Graph error code when a call made for the current request was throttled
+graph_rate_limited = contextvars.ContextVar("graph_rate_limited", default=None)
+
+# Offline mode: talk to the local Graph API simulator instead of graph.facebook.com, no token required
+SIMULATION_MODE = os.getenv("SIMULATION_MODE", "false").lower() == "true"
+GRAPH_API_BASE = os.getenv(
+    "GRAPH_API_BASE", "http://graph-fake:8102/v21.0" if SIMULATION_MODE else "https://graph.facebook.com/v21.0"
+).rstrip("/")
+
+
+class AccountThrottled(Exception):
+    """The ad account is cooling down after a Graph API rate limit"""
+
+
+class AccountThrottle:
+    """Per ad account Graph API cool-down
+    
+    The Graph API rate-limits each ad account separately, so a throttled account is
+    paused on its own for as long as the API asks (or ``default_cooldown`` seconds).
+    Calls for it fail fast with 429 meanwhile, and other accounts keep going.
+    """
+    
+    def __init__(self, default_cooldown: float = 60):
+        self.default_cooldown = default_cooldown
+        self.blocked_until: Dict[str, float] = {}
+        self.throttled: Dict[str, int] = {}
+        self.usage: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+    
+    def retry_in(self, account: str) -> float:
+        return max(0.0, self.blocked_until.get(account, 0) - time.time())
+    
+    def check(self, account: str):
+        """Raise AccountThrottled while the account is cooling down"""
+        wait = self.retry_in(account)
+        if wait > 0:
+            raise AccountThrottled(f"Ad account {account} is rate limited, retry in {wait:.0f}s")
+    
+    def observe(self, account: str, response: requests.Response, rate_limited: bool):
+        """Record the account's usage headers and start a cool-down when throttled"""
+        usage = response.headers.get("x-ad-account-usage")
+        if usage:
+            try:
+                self.usage[account] = json.loads(usage)
+            except ValueError:
+                pass
+        if not rate_limited:
+            return
+        cooldown = self._regain_seconds(response) or self.default_cooldown
+        with self._lock:
+            self.blocked_until[account] = max(self.blocked_until.get(account, 0), time.time() + cooldown)
+            self.throttled[account] = self.throttled.get(account, 0) + 1
+        print(f"⏸️  Ad account {account} throttled, pausing it for {cooldown:.0f}s")
+    
+    def _regain_seconds(self, response: requests.Response) -> Optional[float]:
+        """Longest estimated_time_to_regain_access (minutes) in the business use case header"""
+        try:
+            usage = json.loads(response.headers.get("x-business-use-case-usage") or "{}")
+            minutes = [
+                entry.get("estimated_time_to_regain_access") or 0
+                for entries in usage.values() for entry in entries
+            ]
+        except (ValueError, AttributeError, TypeError):
+            return None
+        return max(minutes) * 60 if minutes and max(minutes) > 0 else None
+    
+    def to_dict(self) -> Dict:
+        return {
+            account: {
+                "retry_in_seconds": round(self.retry_in(account), 1),
+                "times_throttled": self.throttled.get(account, 0),
+                "usage": self.usage.get(account),
+            }
+            for account in sorted(set(self.throttled) | set(self.usage))
+        }
 
 
 class CampaignRequest(BaseModel):
     hook_data: dict
     image_url: str
     daily_budget: int = 2000  # $20 in cents (updated for $300 offer)
+    ad_account_id: Optional[str] = None  # Defaults to AD_ACCOUNT_ID
+    page_id: Optional[str] = None        # Defaults to PAGE_ID
 
 
 class CampaignResponse(BaseModel):
@@ -31,21 +119,95 @@ class CampaignResponse(BaseModel):
     error: Optional[str] = None
 
 
+class AdSetRequest(BaseModel):
+    hook_data: dict
+    daily_budget: int = 2000
+    ad_account_id: Optional[str] = None
+    status: Literal["ACTIVE", "PAUSED"] = "ACTIVE"  # PAUSED keeps it from spending before its ad exists
+
+
+class AdSetResponse(BaseModel):
+    success: bool
+    campaign_id: Optional[str] = None
+    adset_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class AdRequest(BaseModel):
+    hook_data: dict
+    image_url: str
+    adset_id: str
+    ad_account_id: Optional[str] = None
+    page_id: Optional[str] = None
+    activate_adset: bool = False  # Set the ad set ACTIVE once the ad is created
+
+
+class AdResponse(BaseModel):
+    success: bool
+    creative_id: Optional[str] = None
+    ad_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ActivateAdSetRequest(BaseModel):
+    adset_id: str
+    ad_account_id: Optional[str] = None
+
+
+class ActivateAdSetResponse(BaseModel):
+    success: bool
+    adset_id: str
+    error: Optional[str] = None
+
+
 class CampaignManagerService:
     def __init__(self):
-        self.fb_access_token = os.getenv("FB_ACCESS_TOKEN")
+        self.fb_access_token = os.getenv("FB_ACCESS_TOKEN") or ("simulation" if SIMULATION_MODE else None)
         self.ad_account_id = os.getenv("AD_ACCOUNT_ID", "act_283244530805042")
         self.fb_page_id = os.getenv("PAGE_ID", "122106081866003922")
         
         if not self.fb_access_token:
             raise ValueError("FB_ACCESS_TOKEN environment variable is required")
         
-        self.graph_api_base = "https://graph.facebook.com/v21.0"
+        self.graph_api_base = GRAPH_API_BASE
+        self.throttle = AccountThrottle(float(os.getenv("GRAPH_THROTTLE_COOLDOWN", "60")))
+    
+    def _graph_post(self, operation: str, account: str, path: str, payload: dict,
+                    timeout: int = 30, node: Optional[str] = None) -> requests.Response:
+        """POST to an ad account's Graph API edge inside a tracing span
+        
+        With ``node``, the POST updates that object instead of creating one on ``path``.
+        Raises AccountThrottled without calling the API while the account cools down.
+        """
+        url = f"{self.graph_api_base}/{node}" if node else f"{self.graph_api_base}/{account}/{path}"
+        try:
+            self.throttle.check(account)
+        except AccountThrottled:
+            graph_rate_limited.set(17)  # User request limit reached
+            raise
+        with tracing.span(f"graph.{operation}", kind="client", url=url, ad_account_id=account) as span:
+            response = requests.post(url, data=payload, timeout=timeout)
+            span.set(status_code=response.status_code)
+            code = None
+            if response.status_code != 200:
+                span.fail(response.text[:500])
+                code = self._graph_error_code(response)
+                if code in GRAPH_RATE_LIMIT_CODES:
+                    span.set(rate_limited=True, graph_error_code=code)
+                    graph_rate_limited.set(code)
+            self.throttle.observe(account, response, code in GRAPH_RATE_LIMIT_CODES)
+            return response
+    
+    def _graph_error_code(self, response: requests.Response) -> Optional[int]:
+        try:
+            return response.json().get("error", {}).get("code")
+        except (ValueError, AttributeError):
+            return None
     
-    def create_campaign(self, hook_data: HookData) -> Optional[str]:
+    def create_campaign(self, hook_data: HookData, account: Optional[str] = None) -> Optional[str]:
         """Create Meta Ads campaign"""
         try:
-            url = f"{self.graph_api_base}/{self.ad_account_id}/campaigns"
+            account = account or self.ad_account_id
             
             payload = {
                 "name": f"$300 Meta Ads AI Agent - {hook_data.name} - {self._get_timestamp()}",
@@ -55,7 +217,7 @@ class CampaignManagerService:
                 "access_token": self.fb_access_token
             }
             
-            response = requests.post(url, data=payload, timeout=30)
+            response = self._graph_post("create_campaign", account, "campaigns", payload, timeout=30)
             
             if response.status_code == 200:
                 campaign_id = response.json().get("id")
@@ -69,10 +231,11 @@ class CampaignManagerService:
             print(f"❌ Error creating campaign: {str(e)}")
             return None
     
-    def create_adset(self, campaign_id: str, daily_budget: int) -> Optional[str]:
+    def create_adset(self, campaign_id: str, daily_budget: int, account: Optional[str] = None,
+                     status: str = "ACTIVE") -> Optional[str]:
         """Create ad set with targeting"""
         try:
-            url = f"{self.graph_api_base}/{self.ad_account_id}/adsets"
+            account = account or self.ad_account_id
             
             payload = {
                 "name": f"AdSet - {self._get_timestamp()}",
@@ -82,11 +245,11 @@ class CampaignManagerService:
                 "optimization_goal": "LEAD_GENERATION",
                 "bid_strategy": "LOWEST_COST_WITHOUT_CAP",
                 "targeting": str(TARGETING_SPEC),
-                "status": "ACTIVE",
+                "status": status,
                 "access_token": self.fb_access_token
             }
             
-            response = requests.post(url, data=payload, timeout=30)
+            response = self._graph_post("create_adset", account, "adsets", payload, timeout=30)
             
             if response.status_code == 200:
                 adset_id = response.json().get("id")
@@ -100,17 +263,40 @@ class CampaignManagerService:
             print(f"❌ Error creating ad set: {str(e)}")
             return None
     
-    def upload_image(self, image_url: str) -> Optional[str]:
+    def set_status(self, object_id: str, status: str, account: Optional[str] = None) -> bool:
+        """Set a campaign, ad set or ad ACTIVE or PAUSED"""
+        try:
+            account = account or self.ad_account_id
+            
+            payload = {
+                "status": status,
+                "access_token": self.fb_access_token
+            }
+            
+            response = self._graph_post("set_status", account, "", payload, timeout=30, node=object_id)
+            
+            if response.status_code == 200:
+                print(f"✅ {object_id} set {status}")
+                return True
+            else:
+                print(f"❌ Setting {object_id} {status} failed: {response.text}")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Error setting {object_id} {status}: {str(e)}")
+            return False
+    
+    def upload_image(self, image_url: str, account: Optional[str] = None) -> Optional[str]:
         """Upload image to Meta and get hash"""
         try:
-            url = f"{self.graph_api_base}/{self.ad_account_id}/adimages"
+            account = account or self.ad_account_id
             
             payload = {
                 "url": image_url,
                 "access_token": self.fb_access_token
             }
             
-            response = requests.post(url, data=payload, timeout=60)
+            response = self._graph_post("upload_image", account, "adimages", payload, timeout=60)
             
             if response.status_code == 200:
                 data = response.json()
@@ -126,13 +312,14 @@ class CampaignManagerService:
             print(f"❌ Error uploading image: {str(e)}")
             return None
     
-    def create_ad_creative(self, hook_data: HookData, image_url: str) -> Optional[str]:
+    def create_ad_creative(self, hook_data: HookData, image_url: str, account: Optional[str] = None,
+                           page_id: Optional[str] = None) -> Optional[str]:
         """Create ad creative using image URL directly"""
         try:
-            url = f"{self.graph_api_base}/{self.ad_account_id}/adcreatives"
+            account = account or self.ad_account_id
             
             object_story_spec = {
-                "page_id": self.fb_page_id,
+                "page_id": page_id or self.fb_page_id,
                 "link_data": {
                     "picture": image_url,
                     "link": LANDING_PAGE_URL,
@@ -149,7 +336,7 @@ class CampaignManagerService:
                 "access_token": self.fb_access_token
             }
             
-            response = requests.post(url, data=payload, timeout=30)
+            response = self._graph_post("create_ad_creative", account, "adcreatives", payload, timeout=30)
             
             if response.status_code == 200:
                 creative_id = response.json().get("id")
@@ -163,12 +350,12 @@ class CampaignManagerService:
             print(f"❌ Error creating ad creative: {str(e)}")
             return None
     
-    def create_ad(self, adset_id: str, creative_id: str, hook_data: HookData) -> Optional[str]:
+    def create_ad(self, adset_id: str, creative_id: str, hook_data: HookData,
+                  account: Optional[str] = None) -> Optional[str]:
         """Create ad"""
         try:
-            url = f"{self.graph_api_base}/{self.ad_account_id}/ads"
+            account = account or self.ad_account_id
             
-            import json
             payload = {
                 "name": f"Ad - {hook_data.name}",
                 "adset_id": adset_id,
@@ -177,7 +364,7 @@ class CampaignManagerService:
                 "access_token": self.fb_access_token
             }
             
-            response = requests.post(url, data=payload, timeout=30)
+            response = self._graph_post("create_ad", account, "ads", payload, timeout=30)
             
             if response.status_code == 200:
                 ad_id = response.json().get("id")
@@ -191,36 +378,61 @@ class CampaignManagerService:
             print(f"❌ Error creating ad: {str(e)}")
             return None
     
-    def create_full_campaign(self, hook_data: HookData, image_url: str, daily_budget: int = 2000) -> dict:
-        """Create complete campaign (campaign -> adset -> ad)"""
-        print(f"\n🚀 Creating campaign for hook: {hook_data.name}")
-        
+    def create_campaign_with_adset(self, hook_data: HookData, daily_budget: int = 2000,
+                                   account: Optional[str] = None, adset_status: str = "ACTIVE") -> dict:
+        """Create campaign and ad set (campaign -> adset); neither needs the image"""
         # Step 1: Create campaign
-        campaign_id = self.create_campaign(hook_data)
+        campaign_id = self.create_campaign(hook_data, account)
         if not campaign_id:
             return {"success": False, "error": "Failed to create campaign"}
         
         # Step 2: Create ad set
-        adset_id = self.create_adset(campaign_id, daily_budget)
+        adset_id = self.create_adset(campaign_id, daily_budget, account, adset_status)
         if not adset_id:
-            return {"success": False, "error": "Failed to create ad set"}
+            return {"success": False, "campaign_id": campaign_id, "error": "Failed to create ad set"}
         
+        return {"success": True, "campaign_id": campaign_id, "adset_id": adset_id}
+    
+    def create_ad_with_creative(self, hook_data: HookData, image_url: str, adset_id: str,
+                                account: Optional[str] = None, page_id: Optional[str] = None,
+                                activate_adset: bool = False) -> dict:
+        """Create ad creative and ad (creative -> ad) in an existing ad set, then start the ad set"""
         # Step 3: Create ad creative (using image URL directly)
-        creative_id = self.create_ad_creative(hook_data, image_url)
+        creative_id = self.create_ad_creative(hook_data, image_url, account, page_id)
         if not creative_id:
             return {"success": False, "error": "Failed to create ad creative"}
         
-        # Step 5: Create ad
-        ad_id = self.create_ad(adset_id, creative_id, hook_data)
+        # Step 4: Create ad
+        ad_id = self.create_ad(adset_id, creative_id, hook_data, account)
         if not ad_id:
-            return {"success": False, "error": "Failed to create ad"}
+            return {"success": False, "creative_id": creative_id, "error": "Failed to create ad"}
+        
+        # Step 5: Start delivery of an ad set that was held paused until it had an ad
+        if activate_adset and not self.set_status(adset_id, "ACTIVE", account):
+            return {"success": False, "creative_id": creative_id, "ad_id": ad_id,
+                    "error": f"Failed to activate ad set {adset_id}"}
+        
+        return {"success": True, "creative_id": creative_id, "ad_id": ad_id}
+    
+    def create_full_campaign(self, hook_data: HookData, image_url: str, daily_budget: int = 2000,
+                             account: Optional[str] = None, page_id: Optional[str] = None) -> dict:
+        """Create complete campaign (campaign -> adset -> ad)"""
+        print(f"\n🚀 Creating campaign for hook: {hook_data.name}")
+        
+        adset_result = self.create_campaign_with_adset(hook_data, daily_budget, account)
+        if not adset_result["success"]:
+            return {"success": False, "error": adset_result["error"]}
+        
+        ad_result = self.create_ad_with_creative(hook_data, image_url, adset_result["adset_id"], account, page_id)
+        if not ad_result["success"]:
+            return {"success": False, "error": ad_result["error"]}
         
         print(f"✅ Full campaign created successfully!")
         return {
             "success": True,
-            "campaign_id": campaign_id,
-            "adset_id": adset_id,
-            "ad_id": ad_id
+            "campaign_id": adset_result["campaign_id"],
+            "adset_id": adset_result["adset_id"],
+            "ad_id": ad_result["ad_id"]
         }
     
     def _get_timestamp(self) -> str:
@@ -233,14 +445,70 @@ class CampaignManagerService:
 service = CampaignManagerService()
 
 
+def graph_response(result: BaseModel):
+    """Answer 429 when the request failed because the Graph API throttled it,
+    so callers can back off instead of treating it as an ordinary failure"""
+    code = graph_rate_limited.get()
+    if not result.success and code is not None:
+        content = result.model_dump()
+        content["error"] = f"Graph API rate limit (code {code}): {content['error']}"
+        return JSONResponse(status_code=429, content=content)
+    return result
+
+
 @app.post("/create-campaign", response_model=CampaignResponse)
-async def create_campaign(request: CampaignRequest):
+def create_campaign(request: CampaignRequest):
     """Create full Meta Ads campaign"""
     try:
         hook_data = HookData(**request.hook_data)
-        result = service.create_full_campaign(hook_data, request.image_url, request.daily_budget)
+        result = service.create_full_campaign(hook_data, request.image_url, request.daily_budget,
+                                              request.ad_account_id, request.page_id)
+        
+        return graph_response(CampaignResponse(**result))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/create-adset", response_model=AdSetResponse)
+def create_adset(request: AdSetRequest):
+    """Create campaign and ad set ahead of the image"""
+    try:
+        hook_data = HookData(**request.hook_data)
+        result = service.create_campaign_with_adset(hook_data, request.daily_budget, request.ad_account_id,
+                                                    request.status)
+        
+        return graph_response(AdSetResponse(**result))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/create-ad", response_model=AdResponse)
+def create_ad(request: AdRequest):
+    """Create ad creative and ad in an existing ad set"""
+    try:
+        hook_data = HookData(**request.hook_data)
+        result = service.create_ad_with_creative(hook_data, request.image_url, request.adset_id,
+                                                 request.ad_account_id, request.page_id, request.activate_adset)
+        
+        return graph_response(AdResponse(**result))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/activate-adset", response_model=ActivateAdSetResponse)
+def activate_adset(request: ActivateAdSetRequest):
+    """Start an ad set whose ad exists, e.g. after /create-ad could not activate it"""
+    try:
+        if service.set_status(request.adset_id, "ACTIVE", request.ad_account_id):
+            result = {"success": True, "adset_id": request.adset_id}
+        else:
+            result = {"success": False, "adset_id": request.adset_id,
+                      "error": f"Failed to activate ad set {request.adset_id}"}
         
-        return CampaignResponse(**result)
+        return graph_response(ActivateAdSetResponse(**result))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -249,7 +517,8 @@ async def create_campaign(request: CampaignRequest):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "campaign-manager"}
+    return {"status": "healthy", "service": "campaign-manager", "simulation": SIMULATION_MODE,
+            "accounts": service.throttle.to_dict()}
 
 
 if __name__ == "__main__":
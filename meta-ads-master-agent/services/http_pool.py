@@ -0,0 +1,637 @@
+"""
+Pooled HTTP clients for calls between Meta Ads services
+One keep-alive httpx.AsyncClient per downstream service, with connection reuse stats,
+a circuit breaker, jittered retries and an optional adaptive (AIMD) concurrency limit
+whose waiting requests are served from weighted priority lanes
+"""
+
+import os
+import time
+import random
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional
+
+import httpx
+
+import tracing
+
+
+def _env_number(name: str, default, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+# Request outcomes reported to an AdaptiveLimiter
+OK = "ok"
+ERROR = "error"
+OVERLOAD = "overload"
+
+# Responses that mean the downstream (or the API behind it) is shedding load
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# Responses worth retrying for idempotent requests
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Priority lane of the work running in the current task; None means the default lane
+current_lane: contextvars.ContextVar = contextvars.ContextVar("current_lane", default=None)
+DEFAULT_LANE = "default"
+
+
+class LaneScheduler:
+    """Weighted fair queueing between priority lanes (stride scheduling)
+
+    Each item taken from a lane advances that lane's virtual time by 1 / weight, and
+    the waiting lane with the lowest virtual time goes next. With weights 4:1 the
+    first lane gets four grants for every one of the second while both have items
+    waiting, and the second still always makes progress. A lane that sat idle starts
+    from the current virtual time instead of cashing in the turns it skipped.
+    Ties go to the lane listed first in ``weights``.
+    """
+
+    def __init__(self, weights: Dict[str, float], default: Optional[str] = None,
+                 on_wait: Optional[Callable[[str, float], None]] = None, history_size: int = 200):
+        self.weights = {lane: max(float(weight), 0.01) for lane, weight in weights.items()} or {DEFAULT_LANE: 1.0}
+        self.default = default if default in self.weights else next(iter(self.weights))
+        self.on_wait = on_wait
+        self._queues = {lane: deque() for lane in self.weights}
+        self._vtime = {lane: 0.0 for lane in self.weights}
+        self._clock = 0.0
+        self.granted = {lane: 0 for lane in self.weights}
+        self._waits = {lane: deque(maxlen=history_size) for lane in self.weights}
+
+    def lane(self, lane: Optional[str]) -> str:
+        """Known lane name, or the default lane"""
+        return lane if lane in self.weights else self.default
+
+    def push(self, item, lane: Optional[str] = None):
+        lane = self.lane(lane)
+        if not self._queues[lane]:
+            self._vtime[lane] = max(self._vtime[lane], self._clock)
+        self._queues[lane].append((time.monotonic(), item))
+
+    def pop(self, lanes: Optional[Iterable[str]] = None):
+        """Next item by weighted fair order among ``lanes`` (all lanes by default), or None"""
+        lane = self.choose(lane for lane in (lanes or self.weights) if self._queues.get(lane))
+        if lane is None:
+            return None
+        queued_at, item = self._queues[lane].popleft()
+        self.record_wait(lane, time.monotonic() - queued_at)
+        return item
+
+    def choose(self, ready: Iterable[str]) -> Optional[str]:
+        """Grant the next turn to one of the ``ready`` lanes, for items queued elsewhere"""
+        ready = [lane for lane in ready if lane in self.weights]
+        if not ready:
+            return None
+        for name in ready:
+            # Lanes that sat idle rejoin at the current virtual time
+            self._vtime[name] = max(self._vtime[name], self._clock)
+        lane = min(ready, key=lambda name: self._vtime[name])
+        self._clock = self._vtime[lane]
+        self._vtime[lane] += 1 / self.weights[lane]
+        self.granted[lane] += 1
+        return lane
+
+    def record_wait(self, lane: str, waited: float):
+        self._waits[lane].append(waited)
+        if self.on_wait is not None:
+            self.on_wait(lane, waited)
+
+    def pending(self, lanes: Optional[Iterable[str]] = None) -> int:
+        return sum(len(self._queues[lane]) for lane in (lanes or self.weights) if lane in self._queues)
+
+    def to_dict(self) -> Dict:
+        """Weight, queue length and recent wait times per lane"""
+        lanes = {}
+        for lane, weight in self.weights.items():
+            waits = sorted(self._waits[lane])
+            lanes[lane] = {
+                "weight": weight,
+                "queued": len(self._queues[lane]),
+                "granted": self.granted[lane],
+                "wait_avg_seconds": round(sum(waits) / len(waits), 3) if waits else None,
+                "wait_p95_seconds": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None,
+                "wait_max_seconds": round(waits[-1], 3) if waits else None,
+            }
+        return lanes
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} circuit breaker is open, retry in {retry_in:.0f}s")
+        self.service = service
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; after
+    ``reset_timeout`` seconds one half-open probe decides whether to close again"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    def retry_in(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    @property
+    def available(self) -> bool:
+        """Whether a request would be let through right now"""
+        if self.state == self.OPEN:
+            return self.retry_in() == 0
+        if self.state == self.HALF_OPEN:
+            return not self.probe_in_flight
+        return True
+
+    def before_request(self):
+        """Let a request through or raise CircuitOpenError"""
+        if self.state == self.OPEN:
+            if self.retry_in() > 0:
+                raise CircuitOpenError(self.name, self.retry_in())
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self.probe_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self, error: str):
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def to_dict(self) -> Dict:
+        state = self.state
+        if state == self.OPEN and self.retry_in() == 0:
+            state = self.HALF_OPEN
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(self.retry_in(), 1),
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+        }
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one downstream service
+
+    The limit grows by one after each full limit's worth of healthy requests and is
+    multiplied by ``backoff`` on an overload signal (429/503 or a timeout). A window
+    is healthy while its error rate stays under ``max_error_rate`` and recent latency
+    stays within ``latency_tolerance`` times the long-run average. Windows that never
+    filled the limit say nothing about a higher one, so they do not grow it.
+
+    Requests waiting for a slot are queued by ``current_lane`` and granted in
+    ``lanes`` weighted fair order; without lanes they are served first come, first served.
+    """
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0,
+                 max_error_rate: float = 0.1, history_size: int = 200,
+                 lanes: Optional[LaneScheduler] = None):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+
+        self.in_flight = 0
+        self.lanes = lanes or LaneScheduler({DEFAULT_LANE: 1})
+        self._last_decrease = 0.0
+        self._window_requests = 0
+        self._window_errors = 0
+        self._window_peak = 0
+        self.latency_short: Optional[float] = None  # Recent latency (fast EWMA)
+        self.latency_long: Optional[float] = None   # Baseline latency (slow EWMA)
+
+        self.increases = 0
+        self.decreases = 0
+        self.history = deque(maxlen=history_size)
+        self._record("initial")
+
+    @classmethod
+    def from_env(cls, name: str, env_prefix: str, lanes: Optional[LaneScheduler] = None,
+                 **defaults) -> "AdaptiveLimiter":
+        """Build a limiter tunable with <env_prefix>_LIMIT_* and then LIMIT_* variables"""
+        def setting(key, default, cast=float):
+            return _env_number(f"{env_prefix}_{key}", _env_number(key, default, cast), cast)
+
+        return cls(
+            name,
+            initial=setting("LIMIT_INITIAL", defaults.get("initial", 4), int),
+            min_limit=setting("LIMIT_MIN", defaults.get("min_limit", 1), int),
+            max_limit=setting("LIMIT_MAX", defaults.get("max_limit", 32), int),
+            backoff=setting("LIMIT_BACKOFF", defaults.get("backoff", 0.5)),
+            latency_tolerance=setting("LIMIT_LATENCY_TOLERANCE", defaults.get("latency_tolerance", 2.0)),
+            max_error_rate=setting("LIMIT_MAX_ERROR_RATE", defaults.get("max_error_rate", 0.1)),
+            lanes=lanes,
+        )
+
+    async def acquire(self) -> float:
+        """Wait for a slot in the current lane; returns the start time to pass back to release()"""
+        granted = asyncio.get_running_loop().create_future()
+        self.lanes.push(granted, current_lane.get())
+        self._dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # Cancelled right after being granted a slot: hand it on
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+        return time.monotonic()
+
+    def _dispatch(self):
+        """Grant free slots to waiting requests in weighted fair lane order"""
+        while self.in_flight < int(self.limit):
+            granted = self.lanes.pop()
+            if granted is None:
+                return
+            if granted.done():
+                continue  # Waiter was cancelled
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            granted.set_result(None)
+
+    async def release(self, started: float, outcome: str):
+        """Free a slot and adjust the limit from the request's outcome"""
+        latency = time.monotonic() - started
+        self.in_flight -= 1
+        if outcome == OVERLOAD:
+            # Requests already in flight when the limit was cut do not cut it again
+            if started >= self._last_decrease:
+                self._decrease(f"overload after {latency:.1f}s")
+        else:
+            self._observe(latency, outcome == ERROR)
+        self._dispatch()
+
+    def _observe(self, latency: float, failed: bool):
+        if self.latency_short is None:
+            self.latency_short = self.latency_long = latency
+        else:
+            self.latency_short += 0.3 * (latency - self.latency_short)
+            self.latency_long += 0.05 * (latency - self.latency_long)
+
+        self._window_requests += 1
+        self._window_errors += int(failed)
+        if self._window_requests < int(self.limit):
+            return
+
+        error_rate = self._window_errors / self._window_requests
+        slow = self.latency_short > self.latency_long * self.latency_tolerance
+        saturated = self._window_peak >= int(self.limit)
+        self._reset_window()
+        if saturated and error_rate <= self.max_error_rate and not slow and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.increases += 1
+            self._record("healthy window")
+
+    def _decrease(self, reason: str):
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.decreases += 1
+        self._last_decrease = time.monotonic()
+        self._reset_window()
+        self._record(reason)
+
+    def _reset_window(self):
+        self._window_requests = self._window_errors = 0
+        self._window_peak = self.in_flight
+
+    def _record(self, reason: str):
+        self.history.append({"time": time.time(), "limit": int(self.limit), "reason": reason})
+
+    def to_dict(self, history: bool = True) -> Dict:
+        data = {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "latency_recent_seconds": round(self.latency_short, 3) if self.latency_short is not None else None,
+            "latency_baseline_seconds": round(self.latency_long, 3) if self.latency_long is not None else None,
+            "lanes": self.lanes.to_dict(),
+        }
+        if history:
+            data["history"] = list(self.history)
+        return data
+
+
+class ServiceClient:
+    """Keep-alive client for one downstream service
+
+    With ``partition_limiter``, requests made with ``partition=<key>`` go through a
+    separate adaptive limit per key (e.g. per ad account), built on first use, so one
+    throttled partition cannot use up the others' concurrency.
+    """
+
+    def __init__(self, name: str, base_url: str, max_connections: int = 20,
+                 max_keepalive: int = 10, keepalive_expiry: float = 30.0,
+                 connect_timeout: float = 5.0, timeout: float = 30.0,
+                 limiter: Optional[AdaptiveLimiter] = None, retries: int = 2,
+                 retry_backoff: float = 0.5, retry_max_backoff: float = 10.0,
+                 breaker_failures: int = 5, breaker_reset: float = 30.0,
+                 partition_limiter: Optional[Callable[[str], AdaptiveLimiter]] = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limiter = limiter
+        self.partition_limiter = partition_limiter
+        self.partition_limiters: Dict[str, AdaptiveLimiter] = {}
+        self.breaker = CircuitBreaker(name, breaker_failures, breaker_reset)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+
+        # Reuse statistics
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+        self.retried = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.long_polls = 0
+
+    @classmethod
+    def from_env(cls, name: str, base_url: str, env_prefix: str,
+                 limiter: Optional[AdaptiveLimiter] = None,
+                 partition_limiter: Optional[Callable[[str], AdaptiveLimiter]] = None,
+                 **defaults) -> "ServiceClient":
+        """Build a client whose limits can be overridden with <env_prefix>_* variables
+
+        Falls back to HTTP_* variables shared by all services, then to ``defaults``.
+        """
+        def setting(key, default, cast=float):
+            return _env_number(f"{env_prefix}_{key}", _env_number(f"HTTP_{key}", default, cast), cast)
+
+        return cls(
+            name,
+            base_url,
+            max_connections=setting("MAX_CONNECTIONS", defaults.get("max_connections", 20), int),
+            max_keepalive=setting("MAX_KEEPALIVE", defaults.get("max_keepalive", 10), int),
+            keepalive_expiry=setting("KEEPALIVE_EXPIRY", defaults.get("keepalive_expiry", 30.0)),
+            connect_timeout=setting("CONNECT_TIMEOUT", defaults.get("connect_timeout", 5.0)),
+            timeout=setting("TIMEOUT", defaults.get("timeout", 30.0)),
+            limiter=limiter,
+            retries=setting("RETRIES", defaults.get("retries", 2), int),
+            retry_backoff=setting("RETRY_BACKOFF", defaults.get("retry_backoff", 0.5)),
+            retry_max_backoff=setting("RETRY_MAX_BACKOFF", defaults.get("retry_max_backoff", 10.0)),
+            breaker_failures=setting("BREAKER_FAILURES", defaults.get("breaker_failures", 5), int),
+            breaker_reset=setting("BREAKER_RESET", defaults.get("breaker_reset", 30.0)),
+            partition_limiter=partition_limiter,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+        return self._client
+
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def limiter_for(self, partition: Optional[str]) -> Optional[AdaptiveLimiter]:
+        """Adaptive limit of a partition, or the client-wide one"""
+        if partition is None or self.partition_limiter is None:
+            return self.limiter
+        if partition not in self.partition_limiters:
+            self.partition_limiters[partition] = self.partition_limiter(partition)
+        return self.partition_limiters[partition]
+
+    async def request(self, method: str, path: str, retries: Optional[int] = None,
+                      idempotent: Optional[bool] = None, partition: Optional[str] = None,
+                      long_poll: bool = False, **kwargs) -> httpx.Response:
+        """Send a request through the circuit breaker
+
+        Idempotent requests (GET and friends, or ``idempotent=True``) are retried up to
+        ``retries`` times on connection errors, timeouts and 429/502/503/504, with
+        exponential backoff and full jitter. Raises CircuitOpenError while the breaker
+        is open, without calling the service. A ``long_poll`` request, which the service
+        holds open on purpose, takes no adaptive limit slot and is left out of latency.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = 1 + max(0, self.retries if retries is None else retries) if idempotent else 1
+
+        for attempt in range(attempts):
+            try:
+                self.breaker.before_request()
+            except CircuitOpenError:
+                self.rejected += 1
+                raise
+            try:
+                response = await self._attempt(method, path, partition, long_poll, **kwargs)
+            except httpx.HTTPError as e:
+                self.breaker.record_failure(f"{type(e).__name__}: {str(e)}")
+                if attempt + 1 >= attempts:
+                    raise
+            except BaseException:
+                # Cancelled or crashed before an outcome; do not hold the half-open probe
+                self.breaker.probe_in_flight = False
+                raise
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure(f"HTTP {response.status_code}")
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt + 1 >= attempts:
+                    return response
+            self.retried += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform between zero and the capped exponential delay"""
+        return random.uniform(0, min(self.retry_max_backoff, self.retry_backoff * 2 ** attempt))
+
+    async def _attempt(self, method: str, path: str, partition: Optional[str] = None,
+                       long_poll: bool = False, **kwargs) -> httpx.Response:
+        """One request; with a limiter, waits for a slot and reports the outcome"""
+        timeout = kwargs.pop("timeout", None)
+        if isinstance(timeout, (int, float)):
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=self.timeout.connect)
+        elif timeout is not None:
+            kwargs["timeout"] = timeout
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = self._trace
+
+        limiter = self.limiter_for(partition) if not long_poll else None
+        slot = await limiter.acquire() if limiter is not None else None
+        outcome = ERROR
+        self.requests += 1
+        self.long_polls += int(long_poll)
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await self._send(method, path, extensions, **kwargs)
+            if response.status_code in OVERLOAD_STATUS_CODES:
+                outcome = OVERLOAD
+            elif response.status_code < 500:
+                outcome = OK
+            return response
+        except httpx.TimeoutException:
+            self.errors += 1
+            outcome = OVERLOAD
+            raise
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            if not long_poll:
+                self.total_seconds += time.monotonic() - started
+            if slot is not None:
+                await limiter.release(slot, outcome)
+
+    async def _send(self, method: str, path: str, extensions: dict, **kwargs) -> httpx.Response:
+        if tracing.current_span() is None:
+            return await self.client.request(method, path, extensions=extensions, **kwargs)
+        # Inside a trace: record a client span and propagate it downstream
+        with tracing.span(f"HTTP {method} {path}", kind="client", service=self.name) as s:
+            kwargs["headers"] = tracing.inject(kwargs.get("headers"))
+            response = await self.client.request(method, path, extensions=extensions, **kwargs)
+            s.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                s.status = "error"
+            return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Open a streaming response, e.g. an event stream, through the circuit breaker
+
+        Long-lived streams are never retried and do not hold an adaptive limit slot.
+        """
+        try:
+            self.breaker.before_request()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+        self.requests += 1
+        kwargs["headers"] = tracing.inject(kwargs.get("headers"))
+        try:
+            async with self.client.stream(method, path, **kwargs) as response:
+                if response.status_code >= 500:
+                    self.breaker.record_failure(f"HTTP {response.status_code}")
+                else:
+                    self.breaker.record_success()
+                yield response
+        except httpx.HTTPError as e:
+            self.errors += 1
+            self.breaker.record_failure(f"{type(e).__name__}: {str(e)}")
+            raise
+        finally:
+            self.breaker.probe_in_flight = False
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        reused = max(0, self.requests - self.new_connections)
+        timed = self.requests - self.long_polls
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            "errors": self.errors,
+            "retried": self.retried,
+            "rejected_by_breaker": self.rejected,
+            "long_polls": self.long_polls,
+            "avg_seconds": round(self.total_seconds / timed, 3) if timed else None,
+        }
+
+
+class ServicePool:
+    """Registry of pooled clients, one per downstream service"""
+
+    def __init__(self):
+        self.clients: Dict[str, ServiceClient] = {}
+
+    def register(self, name: str, base_url: str, env_prefix: Optional[str] = None,
+                 limiter: Optional[AdaptiveLimiter] = None,
+                 partition_limiter: Optional[Callable[[str], AdaptiveLimiter]] = None,
+                 **defaults) -> ServiceClient:
+        env_prefix = env_prefix or name.upper().replace("-", "_")
+        self.clients[name] = ServiceClient.from_env(name, base_url, env_prefix, limiter=limiter,
+                                                    partition_limiter=partition_limiter, **defaults)
+        return self.clients[name]
+
+    def __getitem__(self, name: str) -> ServiceClient:
+        return self.clients[name]
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+    def stats(self) -> Dict:
+        return {name: client.stats() for name, client in self.clients.items()}
+
+    def breakers(self) -> Dict:
+        return {name: client.breaker.to_dict() for name, client in self.clients.items()}
+
+    def limits(self, history: bool = True) -> Dict:
+        """Adaptive limit state of every client that has one, and of each partition"""
+        limits = {}
+        for name, client in self.clients.items():
+            if client.limiter is not None:
+                limits[name] = client.limiter.to_dict(history)
+            for partition, limiter in client.partition_limiters.items():
+                limits[f"{name}/{partition}"] = limiter.to_dict(history)
+        return limits
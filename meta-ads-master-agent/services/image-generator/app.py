@@ -6,29 +6,104 @@ NOW WITH MULTIPLE CREATIVE STYLES: MrBeast, Meme, Minimalist, Screenshot, etc.
 
 import os
 import sys
-import time
 import json
+import time
 import random
-import requests
-from typing import Optional
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import httpx
+import secrets
+import contextvars
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
 # Add parent directory to path for shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared_models import HookData, CreativeAsset, CreativeType, CREATIVE_STYLE_CONFIGS
+import tracing
+from budget import GENERATION, BudgetExceeded, BudgetGovernor
+from tasks import GenerationTask, TaskState, TaskStatus, TaskTracker
+from polling import AdaptivePollSchedule, CallbackPollSchedule, FixedPollSchedule
 
 app = FastAPI(title="Image Generator Service - Multi-Style")
+tracing.install(app, "image-generator")
+
+# Nano Banana cost per image, settled against the shared generation budget
+IMAGE_COST = float(os.getenv("IMAGE_COST", "0.02"))
+budget = BudgetGovernor.from_env()
+
+# Offline mode: talk to the local Kie.ai simulator instead of api.kie.ai, no key required
+SIMULATION_MODE = os.getenv("SIMULATION_MODE", "false").lower() == "true"
+KIE_API_BASE = os.getenv(
+    "KIE_API_BASE", "http://kie-fake:8101/api/v1" if SIMULATION_MODE else "https://api.kie.ai/api/v1"
+).rstrip("/")
+KIE_POLL_INTERVAL = float(os.getenv("KIE_POLL_INTERVAL", "5"))  # Seconds between status checks until learned
+KIE_POLL_ADAPTIVE = os.getenv("KIE_POLL_ADAPTIVE", "true").lower() == "true"
+KIE_POLL_TICK = float(os.getenv("KIE_POLL_TICK", "0.5"))  # Checks due within one tick go out together
+KIE_MODEL = "google/nano-banana"
+KIE_TASK_TIMEOUT = float(os.getenv("KIE_TASK_TIMEOUT", "300"))   # Give up on a task after this long
+KIE_MAX_STATUS_CHECKS = int(os.getenv("KIE_MAX_STATUS_CHECKS", "20"))  # Concurrent recordInfo calls
+TASK_RETENTION_SECONDS = float(os.getenv("TASK_RETENTION_SECONDS", "3600"))  # Finished tasks stay queryable
+
+# Public URL of POST /kie-callback; when set, Kie.ai pushes completions and polling only reconciles
+KIE_CALLBACK_URL = os.getenv("KIE_CALLBACK_URL", "")
+KIE_CALLBACK_TOKEN = os.getenv("KIE_CALLBACK_TOKEN", "")  # Shared secret Kie.ai echoes back in the URL
+KIE_RECONCILE_INTERVAL = float(os.getenv("KIE_RECONCILE_INTERVAL", "30"))  # Fallback checks with callbacks on
+
+# POST /generate-batch defaults: Kie.ai submissions in flight and per second, retries when throttled
+GENERATE_BATCH_CONCURRENCY = int(os.getenv("GENERATE_BATCH_CONCURRENCY", "8"))
+GENERATE_BATCH_RATE = float(os.getenv("GENERATE_BATCH_RATE", "5"))
+GENERATE_BATCH_MAX_ITEMS = int(os.getenv("GENERATE_BATCH_MAX_ITEMS", "200"))
+GENERATE_BATCH_RETRIES = int(os.getenv("GENERATE_BATCH_RETRIES", "2"))
+GENERATE_BATCH_RETRY_SECONDS = float(os.getenv("GENERATE_BATCH_RETRY_SECONDS", "5"))
+GENERATE_BATCH_HEARTBEAT = 15.0  # Blank line while no result is ready, keeps proxies from closing the stream
+
+# Set when Kie.ai throttles a call made while handling the current request
+kie_rate_limited = contextvars.ContextVar("kie_rate_limited", default=False)
 
 class ImageGenerator:
     def __init__(self):
-        self.kie_api_key = os.getenv("KIE_API_KEY")
+        self.kie_api_key = os.getenv("KIE_API_KEY") or ("simulation" if SIMULATION_MODE else None)
         if not self.kie_api_key:
             raise ValueError("KIE_API_KEY environment variable not set")
         
         # Correct Nano Banana API endpoints
-        self.create_task_url = "https://api.kie.ai/api/v1/jobs/createTask"
-        self.query_task_url = "https://api.kie.ai/api/v1/jobs/recordInfo"
+        self.create_task_url = f"{KIE_API_BASE}/jobs/createTask"
+        self.query_task_url = f"{KIE_API_BASE}/jobs/recordInfo"
+        self.callback_url = KIE_CALLBACK_URL
+        if KIE_CALLBACK_URL and KIE_CALLBACK_TOKEN:
+            separator = "&" if "?" in KIE_CALLBACK_URL else "?"
+            self.callback_url = f"{KIE_CALLBACK_URL}{separator}{urlencode({'token': KIE_CALLBACK_TOKEN})}"
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {self.kie_api_key}"},
+            timeout=30,
+            limits=httpx.Limits(max_connections=KIE_MAX_STATUS_CHECKS + 10)
+        )
+    
+    async def _kie_request(self, operation: str, method: str, url: str, parent=None,
+                           **kwargs) -> httpx.Response:
+        """Call the Kie.ai API inside a tracing span"""
+        with tracing.span(f"kie.{operation}", parent, kind="client", url=url.split("?")[0]) as span:
+            response = await self.client.request(method, url, **kwargs)
+            span.set(status_code=response.status_code)
+            if response.status_code != 200:
+                span.fail(response.text[:500])
+            if self._is_rate_limited(response):
+                span.set(rate_limited=True)
+                kie_rate_limited.set(True)
+            return response
+    
+    def _is_rate_limited(self, response: httpx.Response) -> bool:
+        """Kie.ai signals throttling with HTTP 429 or code 429 in the body"""
+        if response.status_code == 429:
+            return True
+        try:
+            body = response.json()
+        except ValueError:
+            return False
+        return isinstance(body, dict) and body.get("code") == 429
     
     def generate_mrbeast_prompt(self, hook_data: HookData) -> str:
         """Generate MrBeast-style prompt"""
@@ -247,147 +322,345 @@ OUTPUT: High-quality 9:16 vertical question image"""
             # Default to MrBeast style
             return self.generate_mrbeast_prompt(hook_data)
     
-    def generate_image(self, hook_data: HookData) -> Optional[str]:
-        """Generate image using Kie.ai Nano Banana - CORRECT API FORMAT"""
+    async def submit(self, hook_data: HookData) -> Tuple[Optional[str], Optional[str]]:
+        """Create a Nano Banana task; (taskId, None) or (None, error)"""
         prompt = self.generate_prompt(hook_data)
         
-        try:
-            # Create task with CORRECT Nano Banana API format
-            create_payload = {
-                "model": "google/nano-banana",
-                "input": {
-                    "prompt": prompt,
-                    "output_format": "png",
-                    "image_size": "9:16"
-                }
+        # Create task with CORRECT Nano Banana API format
+        create_payload = {
+            "model": KIE_MODEL,
+            "input": {
+                "prompt": prompt,
+                "output_format": "png",
+                "image_size": "9:16"
             }
-            
-            headers = {
-                "Authorization": f"Bearer {self.kie_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            print(f"🔄 Creating Nano Banana task (style: {hook_data.creative_style})...")
-            create_response = requests.post(
-                self.create_task_url,
-                json=create_payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            if create_response.status_code != 200:
-                print(f"❌ Kie.ai API error: {create_response.status_code}")
-                print(f"Response: {create_response.text}")
-                return None
-            
-            task_data = create_response.json()
-            print(f"📝 Create task response: {task_data}")
-            
-            if task_data.get("code") != 200:
-                print(f"❌ Task creation failed: {task_data}")
-                return None
-            
-            task_id = task_data.get("data", {}).get("taskId")
-            if not task_id:
-                print(f"❌ No taskId in response: {task_data}")
-                return None
-            
-            print(f"✅ Task created: {task_id} (style: {hook_data.creative_style})")
-            
-            # Poll for completion using GET with taskId parameter
-            max_attempts = 60
-            for attempt in range(max_attempts):
-                time.sleep(5)
-                
-                query_url = f"{self.query_task_url}?taskId={task_id}"
-                query_response = requests.get(
-                    query_url,
-                    headers=headers,
-                    timeout=30
-                )
-                
-                if query_response.status_code != 200:
-                    print(f"⏳ Attempt {attempt + 1}/{max_attempts}: Status check failed")
-                    continue
-                
-                result = query_response.json()
-                if result.get("code") != 200:
-                    print(f"⏳ Attempt {attempt + 1}/{max_attempts}: Waiting...")
-                    continue
-                
-                data = result.get("data", {})
-                state = data.get("state")
-                
-                if state == "success":
-                    # Parse resultJson to get image URL
-                    result_json_str = data.get("resultJson")
-                    if result_json_str:
-                        result_json = json.loads(result_json_str)
-                        result_urls = result_json.get("resultUrls", [])
-                        if result_urls:
-                            image_url = result_urls[0]
-                            print(f"✅ Image generated: {image_url}")
-                            return image_url
-                
-                elif state == "fail":
-                    fail_msg = data.get("failMsg", "Unknown error")
-                    print(f"❌ Generation failed: {fail_msg}")
-                    return None
-                
-                print(f"⏳ Attempt {attempt + 1}/{max_attempts}: State = {state}")
-            
-            print(f"❌ Timeout after {max_attempts} attempts")
+        }
+        if self.callback_url:
+            create_payload["callBackUrl"] = self.callback_url
+        
+        print(f"🔄 Creating Nano Banana task (style: {hook_data.creative_style})...")
+        create_response = await self._kie_request("createTask", "POST", self.create_task_url, json=create_payload)
+        
+        if create_response.status_code != 200:
+            print(f"❌ Kie.ai API error: {create_response.status_code}")
+            print(f"Response: {create_response.text}")
+            return None, f"Kie.ai API error: {create_response.status_code}"
+        
+        task_data = create_response.json()
+        if task_data.get("code") != 200:
+            print(f"❌ Task creation failed: {task_data}")
+            return None, f"Task creation failed: {task_data.get('msg')}"
+        
+        task_id = (task_data.get("data") or {}).get("taskId")
+        if not task_id:
+            print(f"❌ No taskId in response: {task_data}")
+            return None, "No taskId in Kie.ai response"
+        
+        print(f"✅ Task created: {task_id} (style: {hook_data.creative_style})")
+        tracing.annotate(task_id=task_id, creative_style=hook_data.creative_style)
+        return task_id, None
+    
+    async def check(self, task: GenerationTask) -> Optional[TaskStatus]:
+        """One recordInfo call; None when the status is unavailable"""
+        query_response = await self._kie_request(
+            "recordInfo", "GET", self.query_task_url, task.trace, params={"taskId": task.task_id}
+        )
+        if query_response.status_code != 200:
             return None
-            
-        except Exception as e:
-            print(f"❌ Exception during image generation: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        result = query_response.json()
+        if result.get("code") != 200:
             return None
+        return self.parse_status(result.get("data") or {})
+    
+    def parse_status(self, data: dict) -> TaskStatus:
+        """Task state from a recordInfo ``data`` object"""
+        state = data.get("state")
+        if state == "success":
+            # Parse resultJson to get image URL
+            result_urls = json.loads(data.get("resultJson") or "{}").get("resultUrls", [])
+            return TaskStatus(state, image_url=result_urls[0] if result_urls else None,
+                              duration=self._duration(data))
+        if state == "fail":
+            return TaskStatus(state, error=data.get("failMsg") or "Unknown error")
+        return TaskStatus(state)
+    
+    def _duration(self, data: dict) -> Optional[float]:
+        """Generation time in seconds from Kie.ai's own timestamps (milliseconds)"""
+        if data.get("completeTime") and data.get("createTime"):
+            return max(0.0, (data["completeTime"] - data["createTime"]) / 1000)
+        if data.get("costTime"):
+            return data["costTime"] / 1000
+        return None
+    
+    async def aclose(self):
+        await self.client.aclose()
 
 # Global generator instance
 generator = ImageGenerator()
 
+
+async def task_finished(task: GenerationTask):
+    """Settle the task's budget reservation: the image cost on success, nothing on failure"""
+    if task.image_url:
+        task.cost = IMAGE_COST
+        print(f"✅ Image generated: {task.image_url} ({task.polls} status checks)")
+    else:
+        print(f"❌ Generation failed for task {task.task_id}: {task.error}")
+    if task.reservation_id is not None:
+        try:
+            await asyncio.to_thread(budget.settle, task.reservation_id, task.cost)
+        except Exception as e:
+            print(f"⚠️  Budget settle failed for task {task.task_id}: {str(e)}")
+
+
+if KIE_CALLBACK_URL:
+    poll_schedule = CallbackPollSchedule.from_env(KIE_RECONCILE_INTERVAL)
+elif KIE_POLL_ADAPTIVE:
+    poll_schedule = AdaptivePollSchedule.from_env(KIE_POLL_INTERVAL)
+else:
+    poll_schedule = FixedPollSchedule(KIE_POLL_INTERVAL)
+
+tracker = TaskTracker(
+    generator.check,
+    task_finished,
+    schedule=poll_schedule,
+    timeout=KIE_TASK_TIMEOUT,
+    tick=KIE_POLL_TICK,
+    max_concurrent_checks=KIE_MAX_STATUS_CHECKS,
+    retention=TASK_RETENTION_SECONDS
+)
+
+
+@app.on_event("startup")
+async def start_tracker():
+    tracker.start()
+
+
+@app.on_event("shutdown")
+async def stop_tracker():
+    await tracker.stop()
+    await generator.aclose()
+
+
 @app.get("/health")
-def health_check():
-    return {"status": "healthy", "service": "image-generator-multi-style"}
+async def health_check():
+    return {"status": "healthy", "service": "image-generator-multi-style", "simulation": SIMULATION_MODE,
+            "callbacks": bool(KIE_CALLBACK_URL), "tasks": tracker.to_dict()}
 
 class GenerateRequest(BaseModel):
     hook_data: dict
+    reservation_id: Optional[str] = None  # Budget reservation made by the caller
 
-@app.post("/generate")
-def generate_image(request: GenerateRequest):
-    """Generate image for a hook"""
+async def start_generation(hook: dict, reservation_id: Optional[str]) -> Tuple[Optional[GenerationTask], int, str]:
+    """Reserve budget (unless the caller did), submit the Kie.ai task and start tracking it
+    
+    Returns (task, 202, "") or, when nothing was submitted, (None, HTTP status, error):
+    402 over budget, 429 Kie.ai rate limit, 200 any other failure. A caller's own
+    reservation stays open after a 429, so a retry can reuse it; the caller releases it
+    if it gives up.
+    """
+    owned = reservation_id is None
+    if owned:
+        try:
+            reservation_id = await asyncio.to_thread(
+                budget.reserve, GENERATION, IMAGE_COST, owner="image-generator"
+            )
+        except BudgetExceeded as e:
+            return None, 402, str(e)
+    
+    kie_rate_limited.set(False)
     try:
         # Convert dict to HookData object
-        hook_data = HookData(**request.hook_data)
-        
-        # Generate image
-        image_url = generator.generate_image(hook_data)
-        
-        if image_url:
-            return {
-                "success": True,
-                "image_url": image_url,
-                "cost": 0.02,  # Nano Banana cost
-                "creative_style": hook_data.creative_style
-            }
-        else:
-            return {
-                "success": False,
-                "error": "Failed to generate image"
-            }
-    
+        hook_data = HookData(**hook)
+        task_id, error = await generator.submit(hook_data)
     except Exception as e:
         print(f"❌ Error in generate endpoint: {str(e)}")
         import traceback
         traceback.print_exc()
-        return {
-            "success": False,
-            "error": str(e)
-        }
+        task_id, error = None, str(e)
+    
+    if task_id is None:
+        rate_limited = kie_rate_limited.get()
+        if owned or not rate_limited:
+            await asyncio.to_thread(budget.settle, reservation_id, 0.0)
+        if rate_limited:
+            return None, 429, "Kie.ai rate limit reached"
+        return None, 200, error
+    
+    active = tracing.current_span()
+    task = GenerationTask(
+        task_id=task_id,
+        hook_name=hook_data.name,
+        creative_style=hook_data.creative_style,
+        model=KIE_MODEL,
+        reservation_id=reservation_id,
+        trace=active.context if active is not None else None
+    )
+    tracker.add(task)
+    return task, 202, ""
+
+@app.post("/generate", status_code=202)
+async def generate_image(request: GenerateRequest):
+    """Submit an image generation for a hook and return its task handle right away
+    
+    Follow the task at GET /tasks/{task_id}. Callers that reserved budget pass their
+    reservation; otherwise one is made here, so direct calls cannot overshoot the
+    generation caps either. The reservation is settled when the task finishes.
+    """
+    task, status, error = await start_generation(request.hook_data, request.reservation_id)
+    if task is None:
+        # 429 lets the master back off its concurrency towards Kie.ai
+        return JSONResponse(status_code=status, content={"success": False, "error": error})
+    return {"success": True, "task_id": task.task_id, "status": task.state, "status_url": f"/tasks/{task.task_id}"}
+
+class SubmitPacer:
+    """Spaces submissions at least 1/rate seconds apart; rate 0 means unpaced"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+    
+    async def wait(self):
+        now = time.monotonic()
+        at = max(now, self._next)
+        self._next = at + self.interval
+        await asyncio.sleep(at - now)
+    
+    def pause(self, seconds: float):
+        """Hold every later submission back, e.g. after Kie.ai rate-limited one"""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+class GenerateBatchRequest(BaseModel):
+    hooks: List[dict] = Field(..., min_length=1, max_length=GENERATE_BATCH_MAX_ITEMS)
+    reservation_ids: Optional[List[Optional[str]]] = None  # One per hook, from a caller that reserved budget
+    concurrency: int = Field(GENERATE_BATCH_CONCURRENCY, ge=1, le=100)  # Submissions in flight at once
+    rate: float = Field(GENERATE_BATCH_RATE, ge=0)  # Submissions per second, 0 = unpaced
+
+@app.post("/generate-batch")
+async def generate_batch(request: GenerateBatchRequest):
+    """Submit many generations and stream each result as NDJSON as soon as it finishes
+    
+    Submissions go out ``concurrency`` at a time and at most ``rate`` per second. A
+    Kie.ai rate limit pauses submitting for GENERATE_BATCH_RETRY_SECONDS and retries
+    the item up to GENERATE_BATCH_RETRIES times. Each hook gets one ``result`` line,
+    tagged with its ``index``, in completion order: the task on success or failure,
+    or the submission error when nothing was submitted. A ``summary`` line ends the
+    stream. Closing the stream stops further submissions; submitted tasks finish anyway.
+    """
+    reservation_ids = request.reservation_ids or [None] * len(request.hooks)
+    if len(reservation_ids) != len(request.hooks):
+        raise HTTPException(status_code=422, detail="reservation_ids must have one entry per hook")
+    
+    started = time.time()
+    submitting = asyncio.Semaphore(request.concurrency)
+    pacer = SubmitPacer(request.rate)
+    results: asyncio.Queue = asyncio.Queue()
+    
+    def failure(index: int, hook: dict, status: int, error: str) -> dict:
+        return {"type": "result", "index": index, "success": False, "status": TaskState.FAILED,
+                "hook_name": hook.get("name"), "http_status": status, "error": error}
+    
+    async def run(index: int, hook: dict, reservation_id: Optional[str]):
+        # Every worker puts exactly one result, or the stream would wait for it forever
+        result = failure(index, hook, 500, "Batch worker stopped")
+        try:
+            task, status, error = None, 200, ""
+            async with submitting:
+                for attempt in range(GENERATE_BATCH_RETRIES + 1):
+                    await pacer.wait()
+                    try:
+                        # Shielded so a closed stream cannot cut a submission off halfway
+                        task, status, error = await asyncio.shield(start_generation(hook, reservation_id))
+                    except Exception as e:
+                        task, status, error = None, 500, str(e)
+                    if status != 429:
+                        break
+                    pacer.pause(GENERATE_BATCH_RETRY_SECONDS)
+            if task is None:
+                result = failure(index, hook, status, error)
+                if status == 429 and reservation_id is not None:
+                    # Kept open for the retries, which are used up now
+                    try:
+                        await asyncio.to_thread(budget.release, reservation_id)
+                    except Exception as e:
+                        print(f"⚠️  Budget release failed for batch item {index}: {str(e)}")
+                return
+            await task.done.wait()
+            result = {"type": "result", "index": index, **task.to_dict()}
+        except Exception as e:
+            result = failure(index, hook, 500, str(e))
+        finally:
+            results.put_nowait(result)
+    
+    async def body():
+        workers = [asyncio.create_task(run(index, hook, reservation_id))
+                   for index, (hook, reservation_id) in enumerate(zip(request.hooks, reservation_ids))]
+        succeeded = 0
+        try:
+            for _ in workers:
+                while True:
+                    try:
+                        result = await asyncio.wait_for(results.get(), GENERATE_BATCH_HEARTBEAT)
+                        break
+                    except asyncio.TimeoutError:
+                        yield "\n"
+                succeeded += bool(result["success"])
+                yield json.dumps(result, default=str) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "total": len(workers),
+                "succeeded": succeeded,
+                "failed": len(workers) - succeeded,
+                "elapsed_seconds": round(time.time() - started, 3),
+            }) + "\n"
+        finally:
+            for worker in workers:
+                worker.cancel()
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/kie-callback")
+async def kie_callback(request: Request, token: Optional[str] = None):
+    """Completion notice from Kie.ai for a task created with ``callBackUrl``
+    
+    Only the taskId is taken from the body, and only for tasks this service submitted
+    and still tracks; with KIE_CALLBACK_TOKEN set the URL must also carry the token.
+    The task's result comes from an immediate recordInfo call, so a forged callback
+    cannot finish a task with an image of its choosing. Its waiters wake as soon as
+    that call reports it done; callbacks for finished tasks are no-ops.
+    """
+    if KIE_CALLBACK_TOKEN and not secrets.compare_digest(token or "", KIE_CALLBACK_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid callback token")
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Callback body is not JSON")
+    data = (body.get("data") if isinstance(body, dict) else None) or {}
+    task = tracker.get(str(data.get("taskId") or ""))
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task {data.get('taskId')}")
+    tracing.annotate(task_id=task.task_id)
+    await tracker.confirm(task)
+    return {"received": True, "task_id": task.task_id, "status": task.state}
+
+@app.get("/poll-stats")
+async def poll_stats():
+    """Status-check volume, detection lag and the learned completion-time distributions"""
+    return tracker.poll_stats()
+
+@app.get("/tasks/{task_id}")
+async def get_task(task_id: str, wait: float = Query(0, ge=0, le=300)):
+    """Status of a generation task; with ``wait``, blocks up to that many seconds for it to finish
+    
+    ``success`` is null while the task is pending.
+    """
+    task = tracker.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    await tracker.wait(task, wait)
+    return task.to_dict()
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
-
@@ -0,0 +1,168 @@
+"""
+Kie.ai status-check scheduling
+Learns how long generations take per model and creative style and places each task's
+recordInfo checks around its likely completion window instead of on a fixed interval
+"""
+
+import os
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class FixedPollSchedule:
+    """A status check every ``interval`` seconds, the first one ``interval`` after submission"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+
+    def first_check(self, task) -> float:
+        return task.created_at + self.interval
+
+    def next_check(self, task, now: float) -> float:
+        return now + self.interval
+
+    def observe(self, task, duration: float):
+        pass
+
+    def to_dict(self) -> Dict:
+        return {"adaptive": False, "interval": self.interval}
+
+
+class CompletionStats:
+    """Recent completion times of one model and creative style"""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[List[float]] = None
+
+    def add(self, duration: float):
+        self.samples.append(duration)
+        self._sorted = None
+
+    def quantile(self, q: float) -> float:
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(len(self._sorted) - 1, max(0, math.ceil(q * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    def to_dict(self) -> Dict:
+        if not self.samples:
+            return {"samples": 0}
+        return {
+            "samples": len(self.samples),
+            "mean": round(sum(self.samples) / len(self.samples), 2),
+            "p10": round(self.quantile(0.1), 2),
+            "p50": round(self.quantile(0.5), 2),
+            "p90": round(self.quantile(0.9), 2),
+            "max": round(max(self.samples), 2),
+        }
+
+
+class AdaptivePollSchedule:
+    """Schedules checks from the completion times seen for the task's model and style
+
+    Until a model and style has ``min_samples`` completions, the model's pooled times are
+    used, and before that the fixed ``interval``. With a distribution, the first check goes
+    out at its ``first_quantile``, so the early checks that could only say "waiting" are
+    skipped. After that checks are a ``steps``-th of the p10-p90 spread apart, between
+    ``min_interval`` and ``interval`` seconds, so they are dense where most tasks finish.
+    A task still running past the 95th percentile is checked at a widening interval, half
+    its overrun, up to ``max_interval``.
+    """
+
+    def __init__(self, interval: float = 5.0, min_interval: float = 1.0, max_interval: float = 5.0,
+                 first_quantile: float = 0.2, steps: int = 4, min_samples: int = 5, history_size: int = 200):
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(interval, max_interval)
+        self.first_quantile = min(max(first_quantile, 0.0), 0.9)
+        self.steps = max(1, steps)
+        self.min_samples = max(1, min_samples)
+        self.history_size = history_size
+        self.stats: Dict[Tuple[str, str], CompletionStats] = {}
+        self.model_stats: Dict[str, CompletionStats] = {}
+
+    @classmethod
+    def from_env(cls, interval: float) -> "AdaptivePollSchedule":
+        return cls(
+            interval=interval,
+            min_interval=float(os.getenv("KIE_POLL_MIN_INTERVAL", "1")),
+            max_interval=float(os.getenv("KIE_POLL_MAX_INTERVAL", str(interval))),
+            first_quantile=float(os.getenv("KIE_POLL_FIRST_QUANTILE", "0.2")),
+            steps=int(os.getenv("KIE_POLL_STEPS", "4")),
+            min_samples=int(os.getenv("KIE_POLL_MIN_SAMPLES", "5")),
+            history_size=int(os.getenv("KIE_POLL_HISTORY", "200")),
+        )
+
+    def _distribution(self, task) -> Optional[CompletionStats]:
+        for stats in (self.stats.get((task.model, task.creative_style)), self.model_stats.get(task.model)):
+            if stats is not None and len(stats.samples) >= self.min_samples:
+                return stats
+        return None
+
+    def first_check(self, task) -> float:
+        stats = self._distribution(task)
+        if stats is None:
+            return task.created_at + self.interval
+        return task.created_at + max(self.min_interval, stats.quantile(self.first_quantile))
+
+    def next_check(self, task, now: float) -> float:
+        stats = self._distribution(task)
+        if stats is None:
+            return now + self.interval
+        spread = stats.quantile(0.9) - stats.quantile(0.1)
+        step = min(self.interval, max(self.min_interval, spread / self.steps))
+        overrun = now - task.created_at - stats.quantile(0.95)
+        if overrun > 0:
+            step = min(self.max_interval, max(step, overrun / 2))
+        return now + step
+
+    def observe(self, task, duration: float):
+        """Record how long a successful task took, as measured by Kie.ai"""
+        for stats, key in ((self.stats, (task.model, task.creative_style)), (self.model_stats, task.model)):
+            if key not in stats:
+                stats[key] = CompletionStats(self.history_size)
+            stats[key].add(duration)
+
+    def to_dict(self) -> Dict:
+        return {
+            "adaptive": True,
+            "interval": self.interval,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "first_quantile": self.first_quantile,
+            "steps": self.steps,
+            "min_samples": self.min_samples,
+            "distributions": {
+                f"{model}/{style}": stats.to_dict() for (model, style), stats in sorted(self.stats.items())
+            },
+            "models": {model: stats.to_dict() for model, stats in sorted(self.model_stats.items())},
+        }
+
+
+class CallbackPollSchedule(AdaptivePollSchedule):
+    """Reconciliation checks for when Kie.ai pushes completions to a callback URL
+
+    The callback normally finishes a task, so it is only checked once it has outlived the
+    95th percentile of its learned completion times (or ``interval`` seconds, whichever is
+    later), then every ``interval`` seconds, to catch callbacks that never arrived.
+    """
+
+    def first_check(self, task) -> float:
+        stats = self._distribution(task)
+        expected = stats.quantile(0.95) if stats is not None else 0.0
+        return task.created_at + max(self.interval, expected)
+
+    def next_check(self, task, now: float) -> float:
+        return now + self.interval
+
+    def to_dict(self) -> Dict:
+        learned = super().to_dict()
+        return {
+            "callbacks": True,
+            "reconcile_interval": self.interval,
+            "min_samples": self.min_samples,
+            "distributions": learned["distributions"],
+            "models": learned["models"],
+        }
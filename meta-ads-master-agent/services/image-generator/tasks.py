@@ -0,0 +1,243 @@
+"""
+In-flight Kie.ai generation tasks
+/generate registers each submitted task and returns its ID right away; one background
+loop checks the status of every pending task (or a Kie.ai callback reports it) and wakes
+whoever waits on GET /tasks/{id}
+"""
+
+import math
+import time
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from polling import FixedPollSchedule
+
+
+class TaskState:
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    FINISHED = (SUCCEEDED, FAILED)
+
+
+@dataclass
+class GenerationTask:
+    """One image generation, identified by its Kie.ai taskId"""
+    task_id: str
+    hook_name: str
+    creative_style: str
+    model: str
+    reservation_id: Optional[str] = None  # Budget reservation settled when the task finishes
+    trace: Optional[Any] = field(default=None, repr=False)  # SpanContext of the submitting request
+    state: str = TaskState.PENDING
+    image_url: Optional[str] = None
+    cost: float = 0.0
+    error: Optional[str] = None
+    polls: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    next_check: float = 0.0
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in TaskState.FINISHED
+
+    def to_dict(self) -> Dict:
+        return {
+            "task_id": self.task_id,
+            "status": self.state,
+            "success": self.state == TaskState.SUCCEEDED if self.finished else None,
+            "image_url": self.image_url,
+            "cost": self.cost,
+            "creative_style": self.creative_style,
+            "hook_name": self.hook_name,
+            "model": self.model,
+            "error": self.error,
+            "polls": self.polls,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+
+@dataclass
+class TaskStatus:
+    """One reading of a Kie.ai task"""
+    state: str  # "waiting", "success" or "fail"
+    image_url: Optional[str] = None
+    error: Optional[str] = None
+    duration: Optional[float] = None  # Seconds from creation to completion, by Kie.ai's clock
+
+
+# None when the status could not be read this time
+StatusCheck = Callable[[GenerationTask], Awaitable[Optional[TaskStatus]]]
+
+
+class TaskTracker:
+    """Polls all pending tasks from a single loop
+
+    ``schedule`` decides when each task is checked next. Check times are rounded up to
+    ``tick`` seconds, so checks that fall due close together go out as one batch, at most
+    ``max_concurrent_checks`` at a time. A task fails once it has been pending for
+    ``timeout`` seconds. A completion callback triggers an immediate check through
+    ``confirm``, in which case the schedule's checks only reconcile lost callbacks. ``on_finish`` runs once
+    per task when it succeeds or fails.
+    """
+
+    def __init__(self, check: StatusCheck, on_finish: Callable[[GenerationTask], Awaitable[None]],
+                 schedule=None, timeout: float = 300.0, tick: float = 0.5,
+                 max_concurrent_checks: int = 20, retention: float = 3600.0):
+        self.check = check
+        self.on_finish = on_finish
+        self.schedule = schedule or FixedPollSchedule()
+        self.timeout = timeout
+        self.tick = tick
+        self.retention = retention
+        self.tasks: Dict[str, GenerationTask] = {}
+        self.status_checks = 0
+        self.ticks = 0
+        self.finished = 0
+        self.finished_checks = 0  # Status checks spent on tasks that finished
+        self.detection_lag = 0.0  # Summed delay between completion and noticing it
+        self.detected = 0
+        self.callbacks = 0  # Tasks finished by a completion callback rather than a status check
+        self._checks = asyncio.Semaphore(max(1, max_concurrent_checks))
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.Task] = None
+
+    def add(self, task: GenerationTask):
+        task.next_check = self._on_tick(self.schedule.first_check(task))
+        self.tasks[task.task_id] = task
+        self._wakeup.set()
+
+    def _on_tick(self, at: float) -> float:
+        return math.ceil(at / self.tick) * self.tick if self.tick > 0 else at
+
+    def get(self, task_id: str) -> Optional[GenerationTask]:
+        return self.tasks.get(task_id)
+
+    def pending(self) -> List[GenerationTask]:
+        return [task for task in self.tasks.values() if not task.finished]
+
+    async def wait(self, task: GenerationTask, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the task to finish; True once it has"""
+        if not task.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(task.done.wait()), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return task.finished
+
+    async def finish(self, task: GenerationTask, image_url: Optional[str] = None, error: Optional[str] = None):
+        if task.finished:
+            return
+        task.state = TaskState.SUCCEEDED if image_url else TaskState.FAILED
+        task.image_url = image_url
+        task.error = None if image_url else (error or "Unknown error")
+        task.finished_at = time.time()
+        self.finished += 1
+        self.finished_checks += task.polls
+        try:
+            await self.on_finish(task)
+        finally:
+            task.done.set()
+
+    def start(self):
+        if self._loop is None:
+            self._loop = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop is not None:
+            self._loop.cancel()
+            await asyncio.gather(self._loop, return_exceptions=True)
+            self._loop = None
+
+    async def _run(self):
+        while True:
+            pending = self.pending()
+            now = time.time()
+            due = [task for task in pending if task.next_check <= now]
+            if due:
+                self.ticks += 1
+                await asyncio.gather(*(self._check(task) for task in due))
+                continue
+            self._purge(now)
+            delay = min((task.next_check for task in pending), default=now + 60) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(delay, 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _read(self, task: GenerationTask) -> Optional[TaskStatus]:
+        """One status check, counted against the task"""
+        async with self._checks:
+            try:
+                status = await self.check(task)
+            except Exception as e:
+                print(f"⚠️  Status check failed for task {task.task_id}: {str(e)}")
+                status = None
+        self.status_checks += 1
+        task.polls += 1
+        return status
+
+    async def _check(self, task: GenerationTask):
+        status = await self._read(task)
+        now = time.time()
+        task.next_check = self._on_tick(self.schedule.next_check(task, now))
+        if status is not None:
+            await self.resolve(task, status)
+        if not task.finished and time.time() - task.created_at >= self.timeout:
+            await self.finish(task, error=f"Timed out after {self.timeout:.0f}s ({task.polls} status checks)")
+
+    async def confirm(self, task: GenerationTask):
+        """Check a task right away because a completion callback named it
+
+        The callback body is not trusted: the task only finishes from what the status
+        check reports. A check that still says waiting leaves it to the schedule.
+        """
+        if task.finished:
+            return
+        status = await self._read(task)
+        if status is not None:
+            await self.resolve(task, status, pushed=True)
+
+    async def resolve(self, task: GenerationTask, status: TaskStatus, pushed: bool = False):
+        """Finish the task if ``status`` says it is done; ``pushed`` when it came from a callback"""
+        if task.finished or status.state not in ("success", "fail"):
+            return
+        if pushed:
+            self.callbacks += 1
+        if status.state == "success" and status.image_url:
+            if status.duration is not None:
+                self.schedule.observe(task, status.duration)
+                self.detection_lag += max(0.0, time.time() - task.created_at - status.duration)
+                self.detected += 1
+            await self.finish(task, image_url=status.image_url)
+        else:
+            await self.finish(task, error=status.error or "Generation returned no image")
+
+    def _purge(self, now: float):
+        for task_id in [t for t, task in self.tasks.items()
+                        if task.finished and task.finished_at < now - self.retention]:
+            del self.tasks[task_id]
+
+    def to_dict(self) -> Dict:
+        return {"pending": len(self.pending()), "tracked": len(self.tasks), "status_checks": self.status_checks}
+
+    def poll_stats(self) -> Dict:
+        """Status-check volume and how quickly completions are noticed, plus the schedule's state"""
+        return {
+            **self.to_dict(),
+            "finished": self.finished,
+            "checks_per_task": round(self.finished_checks / self.finished, 2) if self.finished else None,
+            "mean_detection_lag_seconds": round(self.detection_lag / self.detected, 3) if self.detected else None,
+            "callbacks": self.callbacks,
+            "ticks": self.ticks,
+            "checks_per_tick": round(self.status_checks / self.ticks, 2) if self.ticks else None,
+            "schedule": self.schedule.to_dict(),
+        }
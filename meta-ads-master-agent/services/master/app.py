@@ -6,16 +6,33 @@ Coordinates all microservices for Meta Ads AI Agent
 import os
 import sys
 import time
-import requests
+import uuid
+import asyncio
 import logging
+import sqlite3
 from datetime import datetime
-from typing import Optional
-from fastapi import FastAPI, BackgroundTasks
+from typing import Dict, List, Literal, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Add parent directory to path for shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared_models import HookData
+from http_pool import AdaptiveLimiter, LaneScheduler, ServicePool, current_lane
+import tracing
+from jobs import AdProgress, AdStage, Job, JobManager, JobStatus, Priority
+from job_queue import queue_from_env
+from checkpoints import CheckpointStore
+import metrics
+from pipeline import Stage, StagePipeline, run_task_graph
+from batching import MicroBatcher
+from scheduler import MisfirePolicy, Scheduler, ScheduleStore
+from idempotency import IdempotencyConflict, IdempotencyStore
+import events
+from events import EventType
+import budget
+from budget import BudgetExceeded, BudgetGovernor
 
 # Configure logging
 logging.basicConfig(
@@ -25,11 +42,31 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Meta Ads Master Orchestrator")
+tracing.install(app, "master")
+
+
+class ExecutionMode:
+    CONCURRENT = "concurrent"  # Whole ads in parallel, capped by max_concurrency
+    PIPELINE = "pipeline"      # One worker group and bounded queue per stage
+
+
+class AccountTarget(BaseModel):
+    """Ad account (and page) a cycle creates its campaigns in"""
+    ad_account_id: str
+    page_id: Optional[str] = None        # Defaults to the campaign manager's PAGE_ID
+    ads_to_create: Optional[int] = None  # Defaults to the request's ads_to_create
+    daily_budget: Optional[int] = None   # Defaults to the request's daily_budget
 
 
 class ExecutionRequest(BaseModel):
     ads_to_create: int = 1
     daily_budget: int = 500
+    max_concurrency: Optional[int] = None  # Defaults to MAX_CONCURRENT_ADS
+    mode: Literal["concurrent", "pipeline"] = ExecutionMode.CONCURRENT
+    stage_workers: Optional[Dict[str, int]] = None  # Pipeline mode overrides, e.g. {"generate": 8}
+    priority: Literal["interactive", "batch"] = Priority.INTERACTIVE
+    targets: Optional[List[AccountTarget]] = None  # One parallel cycle per account; AD_ACCOUNT_ID when omitted
+    idempotency_key: Optional[str] = None  # Same as the Idempotency-Key header
 
 
 class ExecutionResponse(BaseModel):
@@ -37,6 +74,59 @@ class ExecutionResponse(BaseModel):
     ads_created: int
     total_cost: float
     errors: list = []
+    stage_stats: Optional[dict] = None  # Pipeline mode only
+    accounts: Optional[Dict[str, dict]] = None  # Per-account results when the request had targets
+
+
+class ResumeRequest(BaseModel):
+    job_id: Optional[str] = None  # Cycle to resume; all resumable cycles when omitted
+    max_concurrency: Optional[int] = None
+
+
+class JobSubmissionResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    replayed: bool = False  # True when an idempotency key matched an earlier request
+    result: Optional[dict] = None  # Stored outcome when the matched job already finished
+
+
+class ScheduleRequest(BaseModel):
+    name: str
+    cron: str  # e.g. "*/15 * * * *" or "@hourly"
+    timezone: str = "UTC"
+    ads_to_create: int = 1
+    daily_budget: int = 500
+    mode: Literal["concurrent", "pipeline"] = ExecutionMode.CONCURRENT
+    max_concurrency: Optional[int] = None
+    stage_workers: Optional[Dict[str, int]] = None
+    priority: Literal["interactive", "batch"] = Priority.BATCH
+    targets: Optional[List[AccountTarget]] = None
+    jitter_seconds: int = 0  # Random delay added to each start time
+    misfire_policy: Literal["run_once", "skip", "run_all"] = MisfirePolicy.RUN_ONCE
+    misfire_grace_seconds: int = 300  # Lateness still treated as on time
+    enabled: bool = True
+
+
+class ScheduleUpdate(BaseModel):
+    name: Optional[str] = None
+    cron: Optional[str] = None
+    timezone: Optional[str] = None
+    ads_to_create: Optional[int] = None
+    daily_budget: Optional[int] = None
+    mode: Optional[Literal["concurrent", "pipeline"]] = None
+    max_concurrency: Optional[int] = None
+    stage_workers: Optional[Dict[str, int]] = None
+    priority: Optional[Literal["interactive", "batch"]] = None
+    targets: Optional[List[AccountTarget]] = None
+    jitter_seconds: Optional[int] = None
+    misfire_policy: Optional[Literal["run_once", "skip", "run_all"]] = None
+    misfire_grace_seconds: Optional[int] = None
+    enabled: Optional[bool] = None
+
+
+# Schedule fields passed through to each execution job as cycle parameters
+SCHEDULE_EXECUTION_FIELDS = ("mode", "max_concurrency", "stage_workers", "priority", "targets")
 
 
 class MasterOrchestrator:
@@ -47,134 +137,142 @@ class MasterOrchestrator:
         self.performance_service_url = os.getenv("PERFORMANCE_SERVICE_URL", "http://performance-analyzer:8003")
         self.campaign_service_url = os.getenv("CAMPAIGN_SERVICE_URL", "http://campaign-manager:8004")
         
+        # Maximum number of ads built at the same time within one cycle
+        self.max_concurrency = int(os.getenv("MAX_CONCURRENT_ADS", "3"))
+        
+        # Pipeline mode: workers per stage and bounded queue size in front of each stage
+        self.stage_workers = parse_stage_workers(
+            os.getenv("PIPELINE_STAGE_WORKERS",
+                      "select_hook:1,create_campaign:2,generate:4,create_ad:2,save_creative:1")
+        )
+        self.pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+        
+        # Constraints on the hooks planned for a cycle
+        self.unique_hooks = os.getenv("HOOK_PLAN_UNIQUE", "false").lower() == "true"
+        self.min_exploration = float(os.getenv("HOOK_MIN_EXPLORATION", "0"))
+        
+        # Keep-alive connection pools, one per downstream service, each behind an
+        # adaptive concurrency limit that backs off when Kie.ai or the Graph API throttle.
+        # Calls waiting for a slot are served from weighted priority lanes.
+        adaptive = os.getenv("ADAPTIVE_LIMITS", "true").lower() == "true"
+        
+        def limiter(name, env_prefix, **defaults):
+            if not adaptive:
+                return None
+            return AdaptiveLimiter.from_env(name, env_prefix, lanes=priority_lanes(name), **defaults)
+        
+        self.http = ServicePool()
+        self.http.register("image-generator", self.image_service_url, env_prefix="IMAGE_SERVICE",
+                           limiter=limiter("image-generator", "IMAGE_SERVICE", initial=4, max_limit=32))
+        self.http.register("performance-analyzer", self.performance_service_url, env_prefix="PERFORMANCE_SERVICE",
+                           limiter=limiter("performance-analyzer", "PERFORMANCE_SERVICE", initial=8, max_limit=32))
+        # The Graph API rate-limits each ad account separately, so each account gets its own limit
+        self.http.register("campaign-manager", self.campaign_service_url, env_prefix="CAMPAIGN_SERVICE",
+                           limiter=limiter("campaign-manager", "CAMPAIGN_SERVICE", initial=2, max_limit=16),
+                           partition_limiter=(lambda account: limiter(f"campaign-manager/{account}", "CAMPAIGN_SERVICE",
+                                                                      initial=2, max_limit=16)) if adaptive else None)
+        
+        # Durable per-ad progress, used to resume failed or interrupted cycles
+        self.checkpoints = CheckpointStore(os.getenv("CHECKPOINT_DB_PATH", "/data/master_checkpoints.db"))
+        self.max_resume_attempts = int(os.getenv("MAX_RESUME_ATTEMPTS", "3"))
+        
+        # Creative records are written to the performance database in batches
+        self.creative_saves = MicroBatcher(
+            "save-creatives", self._flush_creatives,
+            max_size=int(os.getenv("SAVE_BATCH_SIZE", "20")),
+            max_wait=float(os.getenv("SAVE_BATCH_WINDOW", "0.5"))
+        )
+        
+        # Generation and ad spend caps shared with the image generator and other workers
+        self.budget = BudgetGovernor.from_env()
+        self.image_cost = float(os.getenv("IMAGE_COST", "0.02"))
+        self.image_task_wait = float(os.getenv("IMAGE_TASK_WAIT", "25"))  # Long-poll per GET /tasks/{id}
+        
         logger.info("🚀 Master Orchestrator initialized")
         logger.info(f"   Image Service: {self.image_service_url}")
         logger.info(f"   Performance Service: {self.performance_service_url}")
         logger.info(f"   Campaign Service: {self.campaign_service_url}")
+        logger.info(f"   Max Concurrent Ads: {self.max_concurrency}")
+        logger.info(f"   Pipeline Stage Workers: {self.stage_workers}")
+    
+    @property
+    def stages(self) -> list:
+        """Ad creation steps in pipeline order, as (stage name, step) pairs"""
+        return [
+            (AdStage.SELECT_HOOK, self._select_hook),
+            (AdStage.CREATE_CAMPAIGN, self._create_campaign),
+            (AdStage.GENERATE, self._generate_image),
+            (AdStage.CREATE_AD, self._create_ad),
+            (AdStage.SAVE_CREATIVE, self._save_creative),
+        ]
     
-    def execute_ad_creation_cycle(self, ads_to_create: int = 1, daily_budget: int = 500) -> dict:
-        """Execute complete ad creation cycle"""
+    async def execute_ad_creation_cycle(self, ads_to_create: int = 1, daily_budget: int = 500,
+                                        max_concurrency: Optional[int] = None,
+                                        mode: str = ExecutionMode.CONCURRENT,
+                                        stage_workers: Optional[Dict[str, int]] = None,
+                                        ads: Optional[List[AdProgress]] = None,
+                                        stage_stats: Optional[dict] = None,
+                                        cycle_id: Optional[str] = None,
+                                        resume_ads: Optional[List[AdProgress]] = None,
+                                        target: Optional[Dict] = None) -> dict:
+        """Execute complete ad creation cycle
+        
+        In concurrent mode up to max_concurrency ads run all steps at once.
+        In pipeline mode every step has its own worker group and bounded queue.
+        Pass ``ads`` / ``stage_stats`` to observe progress while the cycle runs; the
+        cycle's ads are appended to ``ads``, so several cycles can share one list.
+        Pass ``resume_ads`` (from CheckpointStore.claim_for_resume) to continue a
+        previous cycle; steps an ad already completed are skipped.
+        ``target`` (an AccountTarget dict) selects the ad account and page; the
+        campaign manager's defaults are used without one.
+        """
+        account = (target or {}).get("ad_account_id")
+        page = (target or {}).get("page_id")
+        observed = ads
+        if resume_ads is not None:
+            ads = resume_ads
+            for ad in ads:
+                ad.ad_account_id, ad.page_id = account, page
+        else:
+            cycle_id = cycle_id or uuid.uuid4().hex
+            ads = [AdProgress(index=i, cycle_id=cycle_id, ad_account_id=account, page_id=page)
+                   for i in range(ads_to_create)]
+            params = {"mode": mode, "max_concurrency": max_concurrency, "stage_workers": stage_workers,
+                      "target": target}
+            await self._checkpoint(self.checkpoints.start_cycle, cycle_id, ads_to_create, daily_budget, params, ads)
+        if observed is not None:
+            observed.extend(ads)
+        
         logger.info("=" * 80)
         logger.info("🚀 META ADS MASTER AGENT - EXECUTION CYCLE")
+        logger.info(f"   Ads: {len(ads)} | Mode: {mode}" + (f" | Account: {account}" if account else "")
+                    + (" | Resuming" if resume_ads is not None else ""))
         logger.info("=" * 80)
         
-        ads_created = 0
-        total_cost = 0.0
-        errors = []
+        started = time.monotonic()
+        await self._plan_hooks(ads, ads_to_create)
+        stats = None
+        if mode == ExecutionMode.PIPELINE:
+            stats = await self._run_pipeline(ads, ads_to_create, daily_budget, stage_workers, stage_stats)
+        else:
+            await self._run_concurrent(ads, ads_to_create, daily_budget, max_concurrency)
         
-        for i in range(ads_to_create):
-            logger.info(f"\n🎯 Creating Ad {i + 1}/{ads_to_create}")
-            
-            try:
-                # Step 1: Select hook intelligently
-                logger.info("📊 Step 1: Selecting hook...")
-                hook_response = requests.post(
-                    f"{self.performance_service_url}/select-hook",
-                    timeout=30
-                )
-                
-                if hook_response.status_code != 200:
-                    error_msg = f"Failed to select hook: {hook_response.text}"
-                    logger.error(f"❌ {error_msg}")
-                    errors.append(error_msg)
-                    continue
-                
-                hook_data_dict = hook_response.json()["hook_data"]
-                hook_data = HookData(**hook_data_dict)
-                logger.info(f"✅ Selected hook: {hook_data.name}")
-                
-                # Step 2: Generate image
-                logger.info("🎨 Step 2: Generating image...")
-                image_response = requests.post(
-                    f"{self.image_service_url}/generate",
-                    json={"hook_data": hook_data_dict},
-                    timeout=300
-                )
-                
-                if image_response.status_code != 200:
-                    error_msg = f"Failed to generate image: {image_response.text}"
-                    logger.error(f"❌ {error_msg}")
-                    errors.append(error_msg)
-                    continue
-                
-                image_result = image_response.json()
-                if not image_result.get("success"):
-                    error_msg = f"Image generation failed: {image_result.get('error')}"
-                    logger.error(f"❌ {error_msg}")
-                    errors.append(error_msg)
-                    continue
-                
-                image_url = image_result["image_url"]
-                image_cost = image_result.get("cost", 0.02)
-                total_cost += image_cost
-                logger.info(f"✅ Image generated: {image_url} (cost: ${image_cost})")
-                
-                # Step 3: Create campaign
-                logger.info("📢 Step 3: Creating Meta Ads campaign...")
-                campaign_response = requests.post(
-                    f"{self.campaign_service_url}/create-campaign",
-                    json={
-                        "hook_data": hook_data_dict,
-                        "image_url": image_url,
-                        "daily_budget": daily_budget
-                    },
-                    timeout=120
-                )
-                
-                if campaign_response.status_code != 200:
-                    error_msg = f"Failed to create campaign: {campaign_response.text}"
-                    logger.error(f"❌ {error_msg}")
-                    errors.append(error_msg)
-                    continue
-                
-                campaign_result = campaign_response.json()
-                if not campaign_result.get("success"):
-                    error_msg = f"Campaign creation failed: {campaign_result.get('error')}"
-                    logger.error(f"❌ {error_msg}")
-                    errors.append(error_msg)
-                    continue
-                
-                campaign_id = campaign_result["campaign_id"]
-                adset_id = campaign_result["adset_id"]
-                ad_id = campaign_result["ad_id"]
-                logger.info(f"✅ Campaign created:")
-                logger.info(f"   Campaign ID: {campaign_id}")
-                logger.info(f"   Ad Set ID: {adset_id}")
-                logger.info(f"   Ad ID: {ad_id}")
-                
-                # Step 4: Save creative to database
-                logger.info("💾 Step 4: Saving creative to database...")
-                save_response = requests.post(
-                    f"{self.performance_service_url}/save-creative",
-                    params={
-                        "hook_name": hook_data.name,
-                        "hook_text": hook_data.hook,
-                        "image_path": image_url,
-                        "ad_id": ad_id,
-                        "ad_set_id": adset_id,
-                        "campaign_id": campaign_id
-                    },
-                    timeout=30
-                )
-                
-                if save_response.status_code == 200:
-                    creative_id = save_response.json().get("creative_id")
-                    logger.info(f"✅ Creative saved with ID: {creative_id}")
-                else:
-                    logger.warning(f"⚠️  Failed to save creative: {save_response.text}")
-                
-                ads_created += 1
-                logger.info(f"✅ Ad {i + 1} created successfully!")
-                
-            except Exception as e:
-                error_msg = f"Error creating ad {i + 1}: {str(e)}"
-                logger.error(f"❌ {error_msg}")
-                errors.append(error_msg)
-                continue
+        for ad in ads:
+            self._end_trace(ad)
+        
+        ads_created = sum(1 for ad in ads if ad.succeeded)
+        total_cost = sum(ad.cost for ad in ads)
+        errors = [ad.error for ad in ads if ad.error]
+        
+        metrics.CYCLE_DURATION.observe(time.monotonic() - started, mode=mode)
+        metrics.CYCLES.inc(mode=mode, outcome="success" if ads_created > 0 else "failure")
+        metrics.ADS.inc(ads_created, outcome="success")
+        metrics.ADS.inc(len(ads) - ads_created, outcome="failure")
+        metrics.CYCLE_COST.inc(total_cost)
         
         logger.info("=" * 80)
         logger.info(f"✅ EXECUTION CYCLE COMPLETED")
-        logger.info(f"   Ads Created: {ads_created}/{ads_to_create}")
+        logger.info(f"   Ads Created: {ads_created}/{len(ads)}")
         logger.info(f"   Total Cost: ${total_cost:.2f}")
         logger.info(f"   Errors: {len(errors)}")
         logger.info("=" * 80)
@@ -183,44 +281,966 @@ class MasterOrchestrator:
             "success": ads_created > 0,
             "ads_created": ads_created,
             "total_cost": total_cost,
-            "errors": errors
+            "errors": errors,
+            "stage_stats": stats
+        }
+    
+    async def _run_concurrent(self, ads: List[AdProgress], ads_to_create: int, daily_budget: int,
+                              max_concurrency: Optional[int]):
+        """Run whole ads in parallel, at most max_concurrency at a time"""
+        concurrency = max(1, min(max_concurrency or self.max_concurrency, max(len(ads), 1)))
+        semaphore = asyncio.Semaphore(concurrency)
+        logger.info(f"   Concurrency: {concurrency}")
+        
+        async def run_one(ad: AdProgress):
+            async with semaphore:
+                await self.create_single_ad(ad, ads_to_create, daily_budget)
+        
+        await asyncio.gather(*(run_one(ad) for ad in ads))
+    
+    async def _run_pipeline(self, ads: List[AdProgress], ads_to_create: int, daily_budget: int,
+                            stage_workers: Optional[Dict[str, int]], stage_stats: Optional[dict]) -> dict:
+        """Run ads through a pipeline with one worker group per step"""
+        workers = {**self.stage_workers, **(stage_workers or {})}
+        logger.info(f"   Stage Workers: {workers}")
+        
+        last_stage = self.stages[-1][0]
+        
+        def handler(name, step):
+            async def handle(ad: AdProgress) -> bool:
+                ok = await self._run_step(name, step, ad, ads_to_create, daily_budget)
+                if not ok:
+                    await self._abandon(ad, ads_to_create)
+                if not ok or name == last_stage:
+                    self._end_trace(ad)
+                return ok
+            return handle
+        
+        pipeline = StagePipeline(
+            [
+                Stage(name, handler(name, step), workers=max(1, workers.get(name, 1)),
+                      queue_size=self.pipeline_queue_size)
+                for name, step in self.stages
+            ],
+            stats=stage_stats
+        )
+        stats = await pipeline.run(ads)
+        
+        for name, stage in stats.items():
+            logger.info(f"   📈 {name}: processed={stage['processed']} dropped={stage['dropped']} "
+                        f"max_depth={stage['max_queue_depth']} utilization={stage['utilization']:.0%}")
+        return stats
+    
+    async def create_single_ad(self, ad: AdProgress, ads_to_create: int, daily_budget: int):
+        """Run one ad's steps as a dependency graph
+        
+        Campaign and ad set creation do not need the image, so they run while the
+        image generates; both branches join at the creative/ad step.
+        """
+        label = self._label(ad, ads_to_create)
+        logger.info(f"\n🎯 {label} Creating ad")
+        steps = dict(self.stages)
+        
+        def node(name, track_stage=True):
+            return lambda: self._run_step(name, steps[name], ad, ads_to_create, daily_budget,
+                                          track_stage=track_stage)
+        
+        await run_task_graph({
+            name: (deps, node(name, track_stage=name != AdStage.CREATE_CAMPAIGN))
+            for name, deps in AD_DEPENDENCIES.items()
+        })
+        
+        if not ad.succeeded:
+            # Every branch has finished, so nothing can still settle what is left reserved
+            await self._abandon(ad, ads_to_create)
+        self._end_trace(ad)
+    
+    def _trace(self, ad: AdProgress) -> tracing.Span:
+        """Root span of an ad's trace, started on its first step"""
+        if ad.span is None:
+            ad.span = tracing.start_span("ad", cycle_id=ad.cycle_id, ad_index=ad.index)
+            ad.trace_id = ad.span.trace_id
+        return ad.span
+    
+    def _end_trace(self, ad: AdProgress):
+        if ad.span is None:
+            return
+        ad.span.set(stage=ad.stage, hook=ad.hook_name, ad_id=ad.ad_id, cost=ad.cost)
+        if not ad.succeeded:
+            ad.span.fail(ad.error or ad.stage)
+        ad.span.end()
+    
+    async def _run_step(self, name: str, step, ad: AdProgress, ads_to_create: int,
+                        daily_budget: int, track_stage: bool = True) -> bool:
+        """Run one step for an ad; False means the ad failed and stops here
+        
+        track_stage=False keeps ad.stage on the critical path for side branches.
+        Steps the ad already completed in an earlier attempt are skipped.
+        """
+        if name in ad.completed:
+            return True
+        if track_stage and ad.stage != AdStage.FAILED:
+            ad.stage = name
+        started = time.monotonic()
+        outcome = "success"
+        with tracing.span(f"stage.{name}", self._trace(ad).context, ad_index=ad.index) as span:
+            blocked = self._unavailable_services(ad)
+            if blocked:
+                # Fail before spending anything the ad could not finish using
+                ok = self._fail(ad, ads_to_create, f"Skipped at {name}: circuit breaker open for "
+                                                   f"{', '.join(blocked)}")
+                outcome = "skipped"
+            else:
+                try:
+                    await self._reserve_budget(ad, daily_budget)
+                    ok = await step(ad, ads_to_create, daily_budget)
+                except BudgetExceeded as e:
+                    ok = self._fail(ad, ads_to_create, f"Skipped at {name}: {str(e)}")
+                    outcome = "over_budget"
+                except Exception as e:
+                    ok = self._fail(ad, ads_to_create, f"Error creating ad {ad.index + 1}: {str(e)}")
+                if not ok and outcome == "success":
+                    outcome = "failure"
+            if not ok:
+                span.fail(ad.error)
+        metrics.STAGE_DURATION.observe(time.monotonic() - started, stage=name)
+        metrics.STAGE_RESULTS.inc(stage=name, outcome=outcome)
+        if ok:
+            ad.completed.append(name)
+            if name in ad.reservations:
+                await self._settle_budget(ad, name, self._step_cost(name, ad, daily_budget))
+        else:
+            # Only this step's reservation: a parallel branch may still be running and
+            # settles its own; whatever no branch will use is released once the ad ends
+            await self._settle_budget(ad, name, None)
+        await self._checkpoint(self.checkpoints.save, ad)
+        return ok
+    
+    def _step_cost(self, name: str, ad: AdProgress, daily_budget: int) -> float:
+        """Expected (before) or actual (after) spend of a paid step in dollars"""
+        if name == AdStage.GENERATE:
+            return ad.cost if AdStage.GENERATE in ad.completed else self.image_cost
+        return daily_budget / 100  # Ad set daily budget, in cents
+    
+    async def _reserve_budget(self, ad: AdProgress, daily_budget: int):
+        """Reserve every paid step the ad still has to run, all or nothing
+        
+        Reserving before the ad's first step keeps it from creating a campaign it
+        cannot afford an image for, and vice versa. Raises BudgetExceeded.
+        """
+        if ad.stage == AdStage.FAILED:
+            return
+        pending = [
+            name for name in STEP_BUDGETS
+            if name not in ad.completed and name not in ad.reservations
+        ]
+        for name in pending:
+            try:
+                ad.reservations[name] = await asyncio.to_thread(
+                    self.budget.reserve, STEP_BUDGETS[name], self._step_cost(name, ad, daily_budget),
+                    f"{ad.cycle_id}:{ad.index}"
+                )
+            except BudgetExceeded:
+                for reserved in list(ad.reservations):
+                    await self._settle_budget(ad, reserved, None)
+                raise
+    
+    async def _abandon(self, ad: AdProgress, ads_to_create: int):
+        """Clean up after a failed ad: release the reservations of steps it will never run"""
+        if ad.adset_id and not ad.ad_id:
+            logger.warning(f"⚠️  {self._label(ad, ads_to_create)} Campaign {ad.campaign_id} / ad set "
+                           f"{ad.adset_id} were created but have no ad; the ad set stays paused")
+        elif ad.ad_id and AdStage.CREATE_AD not in ad.completed:
+            logger.warning(f"⚠️  {self._label(ad, ads_to_create)} Ad {ad.ad_id} exists but ad set "
+                           f"{ad.adset_id} is still paused; resume the cycle to activate it")
+        if not ad.reservations:
+            return
+        for reserved in list(ad.reservations):
+            await self._settle_budget(ad, reserved, None)
+        await self._checkpoint(self.checkpoints.save, ad)
+    
+    async def _settle_budget(self, ad: AdProgress, name: str, actual: Optional[float]):
+        """Settle a step's reservation with its actual cost, or release it when None"""
+        reservation_id = ad.reservations.pop(name, None)
+        if reservation_id is None:
+            return  # Already settled by a parallel step of the same ad
+        try:
+            if actual is None:
+                await asyncio.to_thread(self.budget.release, reservation_id)
+            else:
+                await asyncio.to_thread(self.budget.settle, reservation_id, actual)
+        except Exception as e:
+            logger.warning(f"⚠️  Budget update failed for {name}: {str(e)}")
+    
+    def _unavailable_services(self, ad: AdProgress) -> List[str]:
+        """Services with an open circuit breaker that the ad's remaining steps need"""
+        needed = {
+            STEP_SERVICES[name] for name, _ in self.stages
+            if name not in ad.completed and name not in OPTIONAL_STEPS
         }
+        return sorted(name for name in needed if not self.http[name].breaker.available)
+    
+    async def _checkpoint(self, method, *args):
+        """Write a checkpoint off the event loop; a failed write never fails the ad"""
+        try:
+            await asyncio.to_thread(method, *args)
+        except Exception as e:
+            logger.warning(f"⚠️  Checkpoint write failed: {str(e)}")
+    
+    def _label(self, ad: AdProgress, ads_to_create: int) -> str:
+        return f"[Ad {ad.index + 1}/{ads_to_create}]"
+    
+    def _fail(self, ad: AdProgress, ads_to_create: int, error_msg: str) -> bool:
+        """Mark an ad as failed and log why"""
+        events.emit(EventType.FAILED, ad, stage=ad.stage, error=error_msg)
+        ad.stage = AdStage.FAILED
+        ad.error = f"{ad.error}; {error_msg}" if ad.error else error_msg
+        logger.error(f"❌ {self._label(ad, ads_to_create)} {error_msg}")
+        return False
+    
+    async def _plan_hooks(self, ads: List[AdProgress], ads_to_create: int):
+        """Select the hooks of every ad that still needs one with a single call
+        
+        Ads keep hook_data None when planning fails and select their own hook instead.
+        """
+        pending = [ad for ad in ads if AdStage.SELECT_HOOK not in ad.completed and ad.hook_data is None]
+        if not pending:
+            return
+        try:
+            response = await self.http["performance-analyzer"].post(
+                "/select-hooks",
+                params={"n": len(pending)},
+                json={"unique": self.unique_hooks, "min_exploration": self.min_exploration},
+                timeout=30,
+                idempotent=True
+            )
+            if response.status_code != 200:
+                raise Exception(response.text)
+            selections = response.json()["selections"]
+        except Exception as e:
+            logger.warning(f"⚠️  Hook planning failed, ads select hooks one by one: {str(e)}")
+            return
+        for ad, selection in zip(pending, selections):
+            ad.hook_data = selection["hook_data"]
+        logger.info(f"📊 Planned hooks for {len(pending)} ad(s): "
+                    f"{', '.join(selection['hook_data']['name'] for selection in selections)}")
+    
+    async def _select_hook(self, ad: AdProgress, ads_to_create: int, daily_budget: int) -> bool:
+        """Step 1: Select hook intelligently, unless the cycle's plan already chose one"""
+        label = self._label(ad, ads_to_create)
+        if ad.hook_data is None:
+            logger.info(f"📊 {label} Step 1: Selecting hook...")
+            hook_response = await self.http["performance-analyzer"].post(
+                "/select-hook",
+                timeout=30,
+                idempotent=True
+            )
+            
+            if hook_response.status_code != 200:
+                return self._fail(ad, ads_to_create, f"Failed to select hook: {hook_response.text}")
+            
+            ad.hook_data = hook_response.json()["hook_data"]
+        ad.hook_name = HookData(**ad.hook_data).name
+        logger.info(f"✅ {label} Selected hook: {ad.hook_name}")
+        events.emit(EventType.HOOK_SELECTED, ad, hook=ad.hook_name, hook_data=ad.hook_data)
+        return True
+    
+    async def _generate_image(self, ad: AdProgress, ads_to_create: int, daily_budget: int) -> bool:
+        """Step 2: Generate image"""
+        label = self._label(ad, ads_to_create)
+        logger.info(f"🎨 {label} Step 2: Generating image...")
+        events.emit(EventType.IMAGE_STARTED, ad, hook=ad.hook_name)
+        image_response = await self.http["image-generator"].post(
+            "/generate",
+            json={"hook_data": ad.hook_data, "reservation_id": ad.reservations.get(AdStage.GENERATE)},
+            timeout=30
+        )
+        
+        if image_response.status_code not in (200, 202):
+            return self._fail(ad, ads_to_create, f"Failed to generate image: {image_response.text}")
+        
+        image_result = image_response.json()
+        if not image_result.get("success"):
+            return self._fail(ad, ads_to_create, f"Image generation failed: {image_result.get('error')}")
+        
+        # The image generator returns a task handle at once; long-poll it until it finishes
+        task_url = image_result["status_url"]
+        while image_result.get("status") not in ("succeeded", "failed"):
+            task_response = await self.http["image-generator"].get(
+                task_url, params={"wait": self.image_task_wait}, timeout=self.image_task_wait + 30,
+                long_poll=True  # Waiting on the task must not hold a slot /generate calls need
+            )
+            if task_response.status_code != 200:
+                return self._fail(ad, ads_to_create, f"Failed to get image task: {task_response.text}")
+            image_result = task_response.json()
+        if not image_result.get("success"):
+            return self._fail(ad, ads_to_create, f"Image generation failed: {image_result.get('error')}")
+        
+        ad.image_url = image_result["image_url"]
+        ad.cost = image_result.get("cost", self.image_cost)
+        logger.info(f"✅ {label} Image generated: {ad.image_url} (cost: ${ad.cost})")
+        events.emit(EventType.IMAGE_READY, ad, image_url=ad.image_url, cost=ad.cost)
+        return True
+    
+    async def _create_campaign(self, ad: AdProgress, ads_to_create: int, daily_budget: int) -> bool:
+        """Step 3a: Create campaign and a paused ad set (independent of the image)"""
+        label = self._label(ad, ads_to_create)
+        logger.info(f"📢 {label} Step 3a: Creating Meta Ads campaign and ad set...")
+        adset_response = await self.http["campaign-manager"].post(
+            "/create-adset",
+            json={
+                "hook_data": ad.hook_data,
+                "daily_budget": daily_budget,
+                "ad_account_id": ad.ad_account_id,
+                "status": "PAUSED"  # Started by the ad step, so a failed image leaves nothing spending
+            },
+            timeout=120,
+            partition=ad.ad_account_id
+        )
+        
+        if adset_response.status_code != 200:
+            return self._fail(ad, ads_to_create, f"Failed to create campaign: {adset_response.text}")
+        
+        adset_result = adset_response.json()
+        ad.campaign_id = adset_result.get("campaign_id")
+        if not adset_result.get("success"):
+            return self._fail(ad, ads_to_create, f"Campaign creation failed: {adset_result.get('error')}")
+        
+        ad.adset_id = adset_result["adset_id"]
+        logger.info(f"✅ {label} Campaign created:")
+        logger.info(f"   Campaign ID: {ad.campaign_id}")
+        logger.info(f"   Ad Set ID: {ad.adset_id}")
+        events.emit(EventType.CAMPAIGN_CREATED, ad, campaign_id=ad.campaign_id, adset_id=ad.adset_id)
+        return True
+    
+    async def _create_ad(self, ad: AdProgress, ads_to_create: int, daily_budget: int) -> bool:
+        """Step 3b: Create ad creative and ad once image and ad set exist, then start the ad set
+        
+        An ad whose ad set could not be started keeps its ad_id, so a resume only
+        retries the activation instead of creating a second ad.
+        """
+        label = self._label(ad, ads_to_create)
+        if ad.ad_id:
+            return await self._activate_adset(ad, ads_to_create)
+        
+        logger.info(f"🧩 {label} Step 3b: Creating ad creative and ad...")
+        ad_response = await self.http["campaign-manager"].post(
+            "/create-ad",
+            json={
+                "hook_data": ad.hook_data,
+                "image_url": ad.image_url,
+                "adset_id": ad.adset_id,
+                "ad_account_id": ad.ad_account_id,
+                "page_id": ad.page_id,
+                "activate_adset": True
+            },
+            timeout=120,
+            partition=ad.ad_account_id
+        )
+        
+        if ad_response.status_code not in (200, 429):
+            return self._fail(ad, ads_to_create, f"Failed to create ad: {ad_response.text}")
+        
+        ad_result = ad_response.json()
+        ad.ad_creative_id = ad_result.get("creative_id") or ad.ad_creative_id
+        ad.ad_id = ad_result.get("ad_id")
+        if ad.ad_id:
+            logger.info(f"✅ {label} Ad ID: {ad.ad_id}")
+            events.emit(EventType.AD_CREATED, ad, ad_id=ad.ad_id)
+        if not ad_result.get("success"):
+            if ad.ad_id:
+                return self._fail(ad, ads_to_create, f"Ad set activation failed: {ad_result.get('error')}")
+            return self._fail(ad, ads_to_create, f"Ad creation failed: {ad_result.get('error')}")
+        return True
+    
+    async def _activate_adset(self, ad: AdProgress, ads_to_create: int) -> bool:
+        """Start the ad set of an ad created by an earlier attempt"""
+        logger.info(f"▶️  {self._label(ad, ads_to_create)} Step 3b: Activating ad set {ad.adset_id} "
+                    f"of existing ad {ad.ad_id}...")
+        response = await self.http["campaign-manager"].post(
+            "/activate-adset",
+            json={"adset_id": ad.adset_id, "ad_account_id": ad.ad_account_id},
+            timeout=60,
+            idempotent=True,
+            partition=ad.ad_account_id
+        )
+        if response.status_code not in (200, 429):
+            return self._fail(ad, ads_to_create, f"Failed to activate ad set: {response.text}")
+        result = response.json()
+        if not result.get("success"):
+            return self._fail(ad, ads_to_create, f"Ad set activation failed: {result.get('error')}")
+        return True
+    
+    async def _flush_creatives(self, creatives: List[Dict]) -> List[int]:
+        """Write a batch of creative records in one request and one transaction"""
+        response = await self.http["performance-analyzer"].post(
+            "/save-creatives",
+            json={"creatives": creatives},
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise Exception(response.text)
+        metrics.BATCH_SIZE.observe(len(creatives), batcher="save_creatives")
+        logger.info(f"💾 Saved {len(creatives)} creative(s) in one batch")
+        return response.json()["creative_ids"]
+    
+    async def _save_creative(self, ad: AdProgress, ads_to_create: int, daily_budget: int) -> bool:
+        """Step 4: Save creative to database"""
+        label = self._label(ad, ads_to_create)
+        logger.info(f"💾 {label} Step 4: Saving creative to database...")
+        try:
+            ad.creative_id = await self.creative_saves.submit({
+                "hook_name": ad.hook_name,
+                "hook_text": ad.hook_data["hook"],
+                "image_path": ad.image_url,
+                "ad_id": ad.ad_id,
+                "ad_set_id": ad.adset_id,
+                "campaign_id": ad.campaign_id
+            })
+        except Exception as e:
+            # The ad is live; only its performance record is missing
+            logger.warning(f"⚠️  {label} Failed to save creative: {str(e)}")
+        else:
+            logger.info(f"✅ {label} Creative saved with ID: {ad.creative_id}")
+        
+        ad.stage = AdStage.DONE
+        logger.info(f"✅ {label} Ad created successfully!")
+        events.emit(EventType.SAVED, ad, creative_id=ad.creative_id, ad_id=ad.ad_id)
+        return True
+
+
+# Per-ad dependency graph: step -> steps it waits for, in dependency order
+AD_DEPENDENCIES = {
+    AdStage.SELECT_HOOK: [],
+    AdStage.CREATE_CAMPAIGN: [AdStage.SELECT_HOOK],
+    AdStage.GENERATE: [AdStage.SELECT_HOOK],
+    AdStage.CREATE_AD: [AdStage.GENERATE, AdStage.CREATE_CAMPAIGN],
+    AdStage.SAVE_CREATIVE: [AdStage.CREATE_AD],
+}
+
+# Downstream service each step calls
+STEP_SERVICES = {
+    AdStage.SELECT_HOOK: "performance-analyzer",
+    AdStage.CREATE_CAMPAIGN: "campaign-manager",
+    AdStage.GENERATE: "image-generator",
+    AdStage.CREATE_AD: "campaign-manager",
+    AdStage.SAVE_CREATIVE: "performance-analyzer",
+}
+
+# Steps whose failure does not fail the ad
+OPTIONAL_STEPS = {AdStage.SAVE_CREATIVE}
+
+# Paid steps and the budget they are reserved against before the ad starts
+STEP_BUDGETS = {
+    AdStage.CREATE_CAMPAIGN: budget.AD_SPEND,
+    AdStage.GENERATE: budget.GENERATION,
+}
+
+
+def priority_lanes(queue: str) -> LaneScheduler:
+    """Weighted fair lanes for one queue, weights from PRIORITY_WEIGHTS"""
+    weights = parse_stage_workers(os.getenv("PRIORITY_WEIGHTS", "interactive:4,batch:1"))
+    return LaneScheduler(
+        {lane: weights.get(lane, 1) for lane in Priority.ALL},
+        default=Priority.BATCH,
+        on_wait=lambda lane, waited: metrics.QUEUE_WAIT.observe(waited, queue=queue, lane=lane)
+    )
+
+
+def parse_stage_workers(spec: str) -> Dict[str, int]:
+    """Parse "stage:workers,stage:workers" into a dict"""
+    workers = {}
+    for part in spec.split(","):
+        if ":" in part:
+            name, count = part.split(":", 1)
+            workers[name.strip()] = int(count)
+    return workers
 
 
 # Initialize orchestrator
 orchestrator = MasterOrchestrator()
 
 
-@app.post("/execute", response_model=ExecutionResponse)
-async def execute_cycle(request: ExecutionRequest, background_tasks: BackgroundTasks):
-    """Execute ad creation cycle"""
-    try:
-        result = orchestrator.execute_ad_creation_cycle(
-            ads_to_create=request.ads_to_create,
-            daily_budget=request.daily_budget
+async def run_execution_job(job: Job) -> dict:
+    """Run a queued /execute or /resume job, recording per-ad progress on the job"""
+    params = dict(job.params)
+    # Every downstream call of this cycle waits in the job's priority lane
+    current_lane.set(params.get("priority") or Priority.BATCH)
+    ads_to_create = params["ads_to_create"]
+    daily_budget = params["daily_budget"]
+    cycle_id = params.get("resume_cycle_id")
+    resume_ads = None
+    done_before = 0
+    
+    if params.get("targets") and not cycle_id:
+        return await run_account_cycles(job, params)
+    
+    if not cycle_id:
+        resume_ads, done_before = await redelivered_cycle(job, job.job_id)
+    else:
+        cycle, resume_ads = await asyncio.to_thread(
+            orchestrator.checkpoints.claim_for_resume, cycle_id, orchestrator.max_resume_attempts
         )
-        return ExecutionResponse(**result)
+        if cycle is None:
+            raise ValueError(f"No checkpoints for cycle {cycle_id}")
+        # Resume with the original cycle's settings unless overridden
+        ads_to_create = cycle["ads_to_create"]
+        daily_budget = cycle["daily_budget"]
+        params = {**cycle["params"], **{k: v for k, v in params.items() if v is not None}}
     
-    except Exception as e:
-        logger.error(f"❌ Execution failed: {str(e)}")
-        return ExecutionResponse(
-            success=False,
-            ads_created=0,
-            total_cost=0.0,
-            errors=[str(e)]
+    result = await orchestrator.execute_ad_creation_cycle(
+        ads_to_create=ads_to_create,
+        daily_budget=daily_budget,
+        max_concurrency=params.get("max_concurrency"),
+        mode=params.get("mode") or ExecutionMode.CONCURRENT,
+        stage_workers=params.get("stage_workers"),
+        ads=job.ads,
+        stage_stats=job.stage_stats,
+        cycle_id=cycle_id or job.job_id,
+        resume_ads=resume_ads,
+        target=params.get("target")
+    )
+    if done_before:
+        result["ads_created"] += done_before
+        result["success"] = True
+    return ExecutionResponse(**result).model_dump()
+
+
+async def redelivered_cycle(job: Job, cycle_id: str) -> Tuple[Optional[List[AdProgress]], int]:
+    """Unfinished ads, and the number already finished, of a cycle that an earlier
+    lease of a re-delivered job started
+    
+    Returns (None, 0) on a job's first attempt, or when the earlier lease ended
+    before the cycle was checkpointed.
+    """
+    if job.attempts <= 1:
+        return None, 0
+    cycle = await asyncio.to_thread(orchestrator.checkpoints.get_cycle, cycle_id)
+    if cycle is None:
+        return None, 0
+    _, resume_ads = await asyncio.to_thread(
+        orchestrator.checkpoints.claim_for_resume, cycle_id, orchestrator.max_resume_attempts
+    )
+    done = sum(1 for ad in cycle["ads"] if ad["stage"] == AdStage.DONE)
+    logger.info(f"🔁 Job {job.job_id} re-delivered (attempt {job.attempts}): cycle {cycle_id} "
+                f"resumes {len(resume_ads)} ad(s), {done} already done")
+    return resume_ads, done
+
+
+async def run_account_cycles(job: Job, params: Dict) -> dict:
+    """Run one cycle per ad account target in parallel and aggregate results per account
+    
+    Each account's cycle is checkpointed as ``<job_id>:<ad_account_id>``.
+    """
+    async def run_target(target: Dict) -> dict:
+        cycle_id = f"{job.job_id}:{target['ad_account_id']}"
+        resume_ads, done_before = await redelivered_cycle(job, cycle_id)
+        result = await orchestrator.execute_ad_creation_cycle(
+            ads_to_create=target.get("ads_to_create") or params["ads_to_create"],
+            daily_budget=target.get("daily_budget") or params["daily_budget"],
+            max_concurrency=params.get("max_concurrency"),
+            mode=params.get("mode") or ExecutionMode.CONCURRENT,
+            stage_workers=params.get("stage_workers"),
+            ads=job.ads,
+            cycle_id=cycle_id,
+            resume_ads=resume_ads,
+            target=target
+        )
+        if done_before:
+            result["ads_created"] += done_before
+            result["success"] = True
+        return result
+    
+    targets = params["targets"]
+    results = await asyncio.gather(*(run_target(target) for target in targets))
+    accounts = {
+        target["ad_account_id"]: {
+            "success": result["success"],
+            "ads_created": result["ads_created"],
+            "total_cost": result["total_cost"],
+            "errors": result["errors"],
+        }
+        for target, result in zip(targets, results)
+    }
+    return ExecutionResponse(
+        success=any(result["success"] for result in results),
+        ads_created=sum(result["ads_created"] for result in results),
+        total_cost=sum(result["total_cost"] for result in results),
+        errors=[error for result in results for error in result["errors"]],
+        accounts=accounts
+    ).model_dump()
+
+
+idempotency = IdempotencyStore(
+    os.getenv("IDEMPOTENCY_DB_PATH", "/data/master_idempotency.db"),
+    ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+)
+
+
+def record_idempotent_result(job: Job):
+    """Keep a finished keyed job's outcome for duplicates that arrive later"""
+    key = job.params.get("idempotency_key")
+    if key:
+        idempotency.complete(key, job.status, job.summary())
+
+
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+job_manager = JobManager(
+    run_execution_job,
+    # Shared by every master replica
+    queue_from_env(),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    on_finish=record_idempotent_result,
+    lanes=priority_lanes("jobs"),
+    # Interactive cycles never wait for a long batch cycle to finish
+    reserved_workers={Priority.INTERACTIVE: int(os.getenv("INTERACTIVE_JOB_WORKERS", "1"))},
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+    heartbeat_seconds=float(os.getenv("JOB_HEARTBEAT_SECONDS", "5")),
+    poll_seconds=float(os.getenv("JOB_POLL_SECONDS", "1"))
+)
+
+# Job counts come from the queue database; /metrics refreshes them off the event loop before rendering
+job_counts = {"queued": 0, "active": 0}
+metrics.registry.gauge("master_jobs_queued", "Execution jobs waiting for a worker", lambda: job_counts["queued"])
+metrics.registry.gauge("master_jobs_active", "Execution jobs queued or running", lambda: job_counts["active"])
+
+
+def count_jobs() -> Dict[str, int]:
+    return {"queued": job_manager.queue_depth(), "active": job_manager.active_count()}
+
+
+def submit_resume_jobs(cycle_id: Optional[str] = None, max_concurrency: Optional[int] = None) -> List[Job]:
+    """Queue one resume job per cycle with unfinished ads, skipping cycles queued or running on any replica"""
+    active = set()
+    for record in job_manager.active():
+        active.add(record["params"].get("resume_cycle_id") or record["job_id"])
+        active.update(
+            f"{record['job_id']}:{target['ad_account_id']}" for target in record["params"].get("targets") or []
+        )
+    jobs = []
+    for cycle in orchestrator.checkpoints.resumable_cycles(cycle_id, orchestrator.max_resume_attempts):
+        if cycle["cycle_id"] in active:
+            continue
+        jobs.append(job_manager.submit({
+            "resume_cycle_id": cycle["cycle_id"],
+            "ads_to_create": cycle["unfinished"],
+            "daily_budget": cycle["daily_budget"],
+            "max_concurrency": max_concurrency
+        }))
+    return jobs
+
+
+def submit_execution(params: Dict, idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+    """Queue a cycle, or find the one already started with the same idempotency key
+    
+    Returns (job_id, replayed). Raises IdempotencyConflict if the key was used
+    with different parameters.
+    """
+    if not idempotency_key:
+        return job_manager.submit(params).job_id, False
+    
+    job_id = uuid.uuid4().hex
+    record = idempotency.claim(idempotency_key, IdempotencyStore.fingerprint(params), job_id)
+    if record["job_id"] != job_id:
+        logger.info(f"🔁 Idempotency key {idempotency_key} matches job {record['job_id']}")
+        return record["job_id"], True
+    try:
+        job_manager.submit({**params, "idempotency_key": idempotency_key}, job_id=job_id)
+    except BaseException:
+        # Otherwise every retry with this key would get a job ID that never runs
+        idempotency.release(idempotency_key, job_id)
+        raise
+    return job_id, False
+
+
+def check_targets(targets: Optional[List[AccountTarget]]):
+    """Each ad account may appear once per execution"""
+    accounts = [target.ad_account_id for target in targets or []]
+    duplicates = sorted({account for account in accounts if accounts.count(account) > 1})
+    if duplicates:
+        raise HTTPException(status_code=422, detail=f"Duplicate ad account targets: {', '.join(duplicates)}")
+
+
+def job_is_active(job_id: str) -> bool:
+    job = job_manager.queue.get(job_id)
+    return job is not None and job["status"] not in JobStatus.FINISHED
+
+
+scheduler = Scheduler(
+    ScheduleStore(os.getenv("SCHEDULE_DB_PATH", "/data/master_schedules.db")),
+    # One key per scheduled time, so a time can never start two cycles
+    submit=lambda params: submit_execution(
+        params, f"schedule-{params['schedule_id']}-{params['scheduled_for']}"
+    )[0],
+    is_active=job_is_active,
+    max_catchup=int(os.getenv("SCHEDULER_MAX_CATCHUP", "10"))
+)
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_manager.start()
+    if os.getenv("RESUME_ON_STARTUP", "false").lower() == "true":
+        jobs = submit_resume_jobs()
+        logger.info(f"🔁 Resuming {len(jobs)} interrupted cycle(s) from checkpoints")
+    if os.getenv("SCHEDULER_ENABLED", "true").lower() == "true":
+        await scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await scheduler.stop()
+    await job_manager.stop()
+    await orchestrator.creative_saves.aclose()
+    await orchestrator.http.aclose()
+
+
+@app.post("/execute", response_model=JobSubmissionResponse, status_code=202)
+async def execute_cycle(request: ExecutionRequest, response: Response,
+                        idempotency_key: Optional[str] = Header(None)):
+    """Queue an ad creation cycle and return its job ID immediately
+    
+    With an idempotency key (Idempotency-Key header or body field), a duplicate
+    request gets the original job: the running one while it is in progress, or
+    its stored result (200) once finished, for IDEMPOTENCY_TTL_SECONDS.
+    """
+    check_targets(request.targets)
+    key = idempotency_key or request.idempotency_key
+    try:
+        job_id, replayed = await asyncio.to_thread(
+            submit_execution, request.model_dump(exclude={"idempotency_key"}), key
         )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    submission = JobSubmissionResponse(job_id=job_id, status=JobStatus.QUEUED,
+                                       status_url=f"/jobs/{job_id}", replayed=replayed)
+    if not replayed:
+        return submission
+    
+    response.headers["Idempotent-Replayed"] = "true"
+    job = await job_manager.describe(job_id)
+    record = await asyncio.to_thread(idempotency.get, key)
+    if job is not None:
+        submission.status = job["status"]
+        submission.result = job["result"]
+    elif record and record["status"]:
+        submission.status = record["status"]
+        submission.result = record["result"].get("result")
+    else:
+        # Started before a restart and never finished
+        submission.status = JobStatus.INTERRUPTED
+        submission.status_url = f"/checkpoints/{job_id}"
+    if submission.status in JobStatus.FINISHED or submission.status == JobStatus.INTERRUPTED:
+        response.status_code = 200
+    return submission
+
+
+@app.post("/resume", status_code=202)
+async def resume_cycles(request: ResumeRequest):
+    """Resume failed or interrupted ads from their last completed step"""
+    jobs = await asyncio.to_thread(submit_resume_jobs, request.job_id, request.max_concurrency)
+    return {
+        "jobs": [
+            JobSubmissionResponse(job_id=job.job_id, status=job.status, status_url=f"/jobs/{job.job_id}")
+            for job in jobs
+        ]
+    }
+
+
+@app.get("/checkpoints/{cycle_id}")
+async def get_checkpoints(cycle_id: str):
+    """Durable per-ad checkpoints of a cycle (the cycle ID is the original job ID)"""
+    cycle = await asyncio.to_thread(orchestrator.checkpoints.get_cycle, cycle_id)
+    if not cycle:
+        raise HTTPException(status_code=404, detail=f"No checkpoints for cycle {cycle_id}")
+    return cycle
+
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent execution jobs, newest first"""
+    return {
+        "queue_depth": await asyncio.to_thread(job_manager.queue_depth),
+        "jobs": await job_manager.list(status=status, limit=limit)
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status, per-ad progress, cost and errors of an execution job
+    
+    Jobs running on another replica report the progress saved at their last heartbeat.
+    """
+    job = await job_manager.describe(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, format: Literal["sse", "ndjson"] = "sse", after: int = 0,
+                            last_event_id: Optional[int] = Header(None)):
+    """Stream a job's progress events until it finishes
+    
+    Server-Sent Events by default, or one JSON object per line with format=ndjson.
+    Past events are replayed first; reconnecting clients resume after Last-Event-ID
+    (or ``after``). Idle streams get a keep-alive every EVENT_HEARTBEAT_SECONDS.
+    Events of a job running on another replica arrive with its heartbeats.
+    """
+    if await job_manager.describe(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    formatter = events.format_sse if format == "sse" else events.format_ndjson
+    
+    async def body():
+        async for event in job_manager.subscribe(job_id, after=last_event_id or after,
+                                                 heartbeat=EVENT_HEARTBEAT_SECONDS):
+            yield formatter(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/schedules", status_code=201)
+async def create_schedule(request: ScheduleRequest):
+    """Add a recurring execution schedule"""
+    check_targets(request.targets)
+    spec = request.model_dump()
+    spec["params"] = {field: spec.pop(field) for field in SCHEDULE_EXECUTION_FIELDS}
+    try:
+        schedule = scheduler.add(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return scheduler.describe(schedule)
+
+
+@app.get("/schedules")
+async def list_schedules():
+    """All schedules with their next run time and run counts"""
+    return {"schedules": [scheduler.describe(schedule) for schedule in scheduler.store.list()]}
+
+
+@app.get("/schedules/{schedule_id}")
+async def get_schedule(schedule_id: str):
+    schedule = scheduler.store.get(schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail=f"Schedule {schedule_id} not found")
+    return scheduler.describe(schedule)
+
+
+@app.patch("/schedules/{schedule_id}")
+async def update_schedule(schedule_id: str, request: ScheduleUpdate):
+    """Change a schedule, e.g. {"enabled": false} to pause it"""
+    schedule = scheduler.store.get(schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail=f"Schedule {schedule_id} not found")
+    check_targets(request.targets)
+    changes = request.model_dump(exclude_unset=True)
+    params = {field: changes.pop(field) for field in SCHEDULE_EXECUTION_FIELDS if field in changes}
+    if params:
+        changes["params"] = {**schedule["params"], **params}
+    try:
+        schedule = scheduler.update(schedule_id, changes)
+    except (ValueError, sqlite3.IntegrityError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return scheduler.describe(schedule)
+
+
+@app.delete("/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    if not scheduler.remove(schedule_id):
+        raise HTTPException(status_code=404, detail=f"Schedule {schedule_id} not found")
+    return {"deleted": schedule_id}
+
+
+@app.post("/schedules/{schedule_id}/run", response_model=JobSubmissionResponse, status_code=202)
+async def run_schedule_now(schedule_id: str):
+    """Start a schedule's cycle now; its regular next run is unchanged"""
+    try:
+        job_id = scheduler.run_now(schedule_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Schedule {schedule_id} not found")
+    if job_id is None:
+        raise HTTPException(status_code=409, detail="The schedule's previous run is still in progress")
+    return JobSubmissionResponse(job_id=job_id, status=JobStatus.QUEUED, status_url=f"/jobs/{job_id}")
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, with the circuit breaker of each downstream service"""
+    breakers = orchestrator.http.breakers()
+    degraded = any(breaker["state"] != "closed" for breaker in breakers.values())
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "service": "master-orchestrator",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "worker": job_manager.worker_name,
+        "jobs_running": sorted(job_manager.running),
+        "circuit_breakers": breakers
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, outcomes and cost"""
+    try:
+        job_counts.update(await asyncio.to_thread(count_jobs))
+    except Exception as e:
+        logger.warning(f"⚠️  Job counts unavailable: {str(e)}")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces")
+async def query_traces(name: Optional[str] = None, min_duration_ms: Optional[float] = None, limit: int = 50):
+    """Slowest spans across all services, optionally filtered by span name prefix"""
+    return await asyncio.to_thread(
+        tracing.load_spans, name=name, min_duration_ms=min_duration_ms, limit=limit
+    )
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Every span of one trace across all services, in start order"""
+    spans = await asyncio.to_thread(tracing.load_spans, trace_id=trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+
+@app.get("/pool-stats")
+async def pool_stats():
+    """Connection reuse statistics for each downstream service pool"""
+    return orchestrator.http.stats()
+
+
+@app.get("/limits")
+async def concurrency_limits(history: bool = True):
+    """Current adaptive concurrency limit per downstream service and how it changed"""
+    return orchestrator.http.limits(history)
+
+
+@app.get("/lanes")
+async def priority_lane_stats():
+    """Queue length and wait times per priority lane, for job workers and each downstream service"""
+    return {
+        "jobs": job_manager.lanes.to_dict(),
+        "services": {
+            name: limits["lanes"] for name, limits in orchestrator.http.limits(history=False).items()
+        },
     }
 
 
+@app.get("/budget")
+async def budget_headroom():
+    """Generation and ad spend caps with settled, reserved and remaining amounts"""
+    return await asyncio.to_thread(orchestrator.budget.headroom)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -230,6 +1250,18 @@ async def root():
         "description": "Multi-agent microservices architecture for Meta Ads automation",
         "endpoints": {
             "execute": "/execute",
+            "jobs": "/jobs",
+            "job_status": "/jobs/{job_id}",
+            "job_events": "/jobs/{job_id}/events",
+            "pool_stats": "/pool-stats",
+            "limits": "/limits",
+            "budget": "/budget",
+            "lanes": "/lanes",
+            "metrics": "/metrics",
+            "traces": "/traces",
+            "resume": "/resume",
+            "checkpoints": "/checkpoints/{cycle_id}",
+            "schedules": "/schedules",
             "health": "/health"
         }
     }
@@ -0,0 +1,72 @@
+"""
+Micro-batching of small downstream writes
+Callers submit one item each and await its own result; items travel together once the
+batch is full or its time window closes
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class MicroBatcher:
+    """Collects items into batches of up to ``max_size`` and sends each batch at most
+    ``max_wait`` seconds after its first item arrived
+
+    ``flush`` receives the items in submission order and returns one result per item.
+    When it raises, every caller in that batch gets the exception.
+    """
+
+    def __init__(self, name: str, flush: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_size: int = 20, max_wait: float = 0.5):
+        self.name = name
+        self.flush = flush
+        self.max_size = max(1, max_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue ``item`` for the next batch and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._send_now()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._send_later())
+        return await future
+
+    async def _send_later(self):
+        await asyncio.sleep(self.max_wait)
+        self._timer = None
+        self._send_now()
+
+    def _send_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.flush([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def aclose(self):
+        """Send whatever is still waiting and wait for batches in flight"""
+        self._send_now()
+        await asyncio.gather(*self._sending, return_exceptions=True)
@@ -0,0 +1,228 @@
+"""
+Durable per-ad checkpoints for the Master Orchestrator
+Records each ad's progress on the shared /data volume so failed or
+interrupted cycles can resume without regenerating paid images
+"""
+
+import json
+import sqlite3
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from jobs import AdProgress, AdStage
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """Initialize checkpoint tables"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # One row per execution cycle, with the parameters needed to resume it
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cycles (
+                cycle_id TEXT PRIMARY KEY,
+                ads_to_create INTEGER NOT NULL,
+                daily_budget INTEGER NOT NULL,
+                params TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # One row per ad, updated after every step
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ad_checkpoints (
+                cycle_id TEXT NOT NULL,
+                ad_index INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                completed TEXT NOT NULL DEFAULT '[]',
+                hook_name TEXT,
+                hook_data TEXT,
+                image_url TEXT,
+                cost REAL DEFAULT 0.0,
+                campaign_id TEXT,
+                adset_id TEXT,
+                ad_id TEXT,
+                ad_creative_id TEXT,
+                creative_id INTEGER,
+                error TEXT,
+                attempts INTEGER DEFAULT 1,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (cycle_id, ad_index),
+                FOREIGN KEY (cycle_id) REFERENCES cycles(cycle_id)
+            )
+        ''')
+
+        # Added after the table: databases created before it get the column here
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(ad_checkpoints)')}
+        if "ad_creative_id" not in columns:
+            cursor.execute('ALTER TABLE ad_checkpoints ADD COLUMN ad_creative_id TEXT')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ad_checkpoints_stage ON ad_checkpoints(stage)
+        ''')
+
+        conn.commit()
+        conn.close()
+        logger.info(f"✅ Checkpoint database initialized ({self.db_path})")
+
+    def start_cycle(self, cycle_id: str, ads_to_create: int, daily_budget: int,
+                    params: Dict, ads: List[AdProgress]):
+        """Record a new cycle and a pending checkpoint for each of its ads"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO cycles (cycle_id, ads_to_create, daily_budget, params)
+            VALUES (?, ?, ?, ?)
+        ''', (cycle_id, ads_to_create, daily_budget, json.dumps(params)))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO ad_checkpoints (cycle_id, ad_index, stage)
+            VALUES (?, ?, ?)
+        ''', [(cycle_id, ad.index, ad.stage) for ad in ads])
+        conn.commit()
+        conn.close()
+
+    def save(self, ad: AdProgress):
+        """Persist an ad's current progress
+
+        Cost keeps the highest value seen, so a resumed ad that skips generation
+        does not erase the cost already paid for its image.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE ad_checkpoints
+            SET stage = ?, completed = ?, hook_name = ?, hook_data = ?, image_url = ?,
+                cost = MAX(cost, ?), campaign_id = ?, adset_id = ?, ad_id = ?,
+                ad_creative_id = ?, creative_id = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE cycle_id = ? AND ad_index = ?
+        ''', (
+            ad.stage,
+            json.dumps(ad.completed),
+            ad.hook_name,
+            json.dumps(ad.hook_data) if ad.hook_data else None,
+            ad.image_url,
+            ad.cost,
+            ad.campaign_id,
+            ad.adset_id,
+            ad.ad_id,
+            ad.ad_creative_id,
+            ad.creative_id,
+            ad.error,
+            ad.cycle_id,
+            ad.index
+        ))
+        conn.commit()
+        conn.close()
+
+    def get_cycle(self, cycle_id: str) -> Optional[Dict]:
+        """Cycle parameters and every ad checkpoint"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM cycles WHERE cycle_id = ?', (cycle_id,))
+        cycle = cursor.fetchone()
+        if not cycle:
+            conn.close()
+            return None
+        cursor.execute('''
+            SELECT * FROM ad_checkpoints WHERE cycle_id = ? ORDER BY ad_index
+        ''', (cycle_id,))
+        rows = cursor.fetchall()
+        conn.close()
+
+        result = dict(cycle)
+        result["params"] = json.loads(result["params"] or "{}")
+        result["ads"] = [self._row_to_dict(row) for row in rows]
+        return result
+
+    def resumable_cycles(self, cycle_id: Optional[str] = None, max_attempts: int = 3) -> List[Dict]:
+        """Cycles that still have unfinished ads under the attempt limit
+        
+        ``cycle_id`` also matches the per-account cycles (``<cycle_id>:<ad_account_id>``)
+        of a multi-account job.
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        query = '''
+            SELECT c.cycle_id, c.ads_to_create, c.daily_budget, c.params, COUNT(*) AS unfinished
+            FROM cycles c
+            JOIN ad_checkpoints a ON a.cycle_id = c.cycle_id
+            WHERE a.stage != ? AND a.attempts < ?
+        '''
+        args = [AdStage.DONE, max_attempts]
+        if cycle_id:
+            query += ' AND (c.cycle_id = ? OR c.cycle_id LIKE ?)'
+            args += [cycle_id, f"{cycle_id}:%"]
+        query += ' GROUP BY c.cycle_id ORDER BY c.created_at'
+        cursor.execute(query, args)
+        rows = cursor.fetchall()
+        conn.close()
+
+        cycles = []
+        for row in rows:
+            cycle = dict(row)
+            cycle["params"] = json.loads(cycle["params"] or "{}")
+            cycles.append(cycle)
+        return cycles
+
+    def claim_for_resume(self, cycle_id: str, max_attempts: int = 3) -> Tuple[Optional[Dict], List[AdProgress]]:
+        """Load a cycle's unfinished ads for another attempt and count that attempt"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM cycles WHERE cycle_id = ?', (cycle_id,))
+        cycle = cursor.fetchone()
+        if not cycle:
+            conn.close()
+            return None, []
+
+        cursor.execute('''
+            SELECT * FROM ad_checkpoints
+            WHERE cycle_id = ? AND stage != ? AND attempts < ?
+            ORDER BY ad_index
+        ''', (cycle_id, AdStage.DONE, max_attempts))
+        rows = cursor.fetchall()
+        cursor.execute('''
+            UPDATE ad_checkpoints SET attempts = attempts + 1
+            WHERE cycle_id = ? AND stage != ? AND attempts < ?
+        ''', (cycle_id, AdStage.DONE, max_attempts))
+        conn.commit()
+        conn.close()
+
+        # Cost is left at zero so only new spend counts towards the resumed cycle
+        ads = []
+        for row in rows:
+            ads.append(AdProgress(
+                index=row["ad_index"],
+                cycle_id=cycle_id,
+                hook_name=row["hook_name"],
+                hook_data=json.loads(row["hook_data"]) if row["hook_data"] else None,
+                image_url=row["image_url"],
+                campaign_id=row["campaign_id"],
+                adset_id=row["adset_id"],
+                ad_id=row["ad_id"],
+                ad_creative_id=row["ad_creative_id"],
+                creative_id=row["creative_id"],
+                completed=json.loads(row["completed"]),
+            ))
+
+        params = dict(cycle)
+        params["params"] = json.loads(params["params"] or "{}")
+        return params, ads
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        data["completed"] = json.loads(data["completed"])
+        data["hook_data"] = json.loads(data["hook_data"]) if data["hook_data"] else None
+        return data
@@ -0,0 +1,110 @@
+"""
+Progress events for execution jobs
+Each job keeps an ordered event log that any number of subscribers can replay and follow,
+backing the SSE / NDJSON stream at GET /jobs/{job_id}/events
+"""
+
+import json
+import asyncio
+import contextvars
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# Event log of the job running in the current task
+current_stream: contextvars.ContextVar = contextvars.ContextVar("current_event_stream", default=None)
+
+
+class EventType:
+    JOB_STARTED = "job_started"
+    HOOK_SELECTED = "hook_selected"
+    IMAGE_STARTED = "image_started"
+    IMAGE_READY = "image_ready"
+    CAMPAIGN_CREATED = "campaign_created"
+    AD_CREATED = "ad_created"
+    SAVED = "saved"
+    FAILED = "failed"
+    JOB_FINISHED = "job_finished"
+
+
+class JobEventStream:
+    """Append-only event log of one job with live subscribers"""
+
+    def __init__(self, job_id: str, max_events: int = 1000, history: Optional[List[Dict]] = None):
+        self.job_id = job_id
+        self.max_events = max_events
+        # Events of earlier attempts at the job, so IDs keep counting up across workers
+        self.events: List[Dict] = list(history or [])[-max_events:]
+        self.closed = False
+        self._next_id = self.events[-1]["id"] + 1 if self.events else 1
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event_type: str, **data) -> Dict:
+        event = {
+            "id": self._next_id,
+            "type": event_type,
+            "job_id": self.job_id,
+            "time": datetime.now().isoformat(),
+            **data,
+        }
+        self._next_id += 1
+        self.events.append(event)
+        if len(self.events) > self.max_events:
+            del self.events[0]
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+        return event
+
+    def close(self):
+        """End every subscription once it has delivered the events published so far"""
+        self.closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self, after: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict]]:
+        """Events with an ID above ``after``, then live ones until the job finishes
+
+        Yields None after ``heartbeat`` idle seconds so callers can keep the connection alive.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = [event for event in self.events if event["id"] > after]
+        if not self.closed:
+            self._subscribers.append(queue)
+        try:
+            for event in backlog:
+                yield event
+            if self.closed:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+
+
+def emit(event_type: str, ad: Any = None, **data):
+    """Publish an event to the current job's stream, if any, tagged with the ad"""
+    stream = current_stream.get()
+    if stream is None:
+        return
+    if ad is not None:
+        data = {"ad_index": ad.index, "cycle_id": ad.cycle_id, "ad_account_id": ad.ad_account_id, **data}
+    stream.publish(event_type, **data)
+
+
+def format_sse(event: Optional[Dict]) -> str:
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def format_ndjson(event: Optional[Dict]) -> str:
+    if event is None:
+        return "\n"
+    return json.dumps(event, default=str) + "\n"
@@ -0,0 +1,102 @@
+"""
+Idempotency keys for execution cycles
+Maps a client-supplied key to the job it started, so retried requests attach to that
+job or get its stored result instead of paying for another cycle
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a request with different parameters"""
+
+
+class IdempotencyStore:
+    def __init__(self, db_path: str, ttl_seconds: float = 86400):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Initialize idempotency key table"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                status TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+        logger.info(f"✅ Idempotency database initialized ({self.db_path})")
+
+    @staticmethod
+    def fingerprint(params: Dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+    def claim(self, key: str, fingerprint: str, job_id: str) -> Dict:
+        """Bind ``key`` to ``job_id`` unless a live binding exists; returns the binding
+
+        The returned job ID differs from ``job_id`` when the key was already taken.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute('DELETE FROM idempotency_keys WHERE expires_at < ?', (now,))
+        conn.execute('''
+            INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, job_id, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, fingerprint, job_id, now, now + self.ttl_seconds))
+        conn.commit()
+        row = conn.execute('SELECT * FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+        conn.close()
+
+        record = self._row_to_dict(row)
+        if record["fingerprint"] != fingerprint:
+            raise IdempotencyConflict(
+                f"Idempotency key {key!r} was already used with different parameters (job {record['job_id']})"
+            )
+        return record
+
+    def release(self, key: str, job_id: str):
+        """Drop the key's binding to ``job_id``, e.g. when that job could not be queued"""
+        conn = self._connect()
+        conn.execute('DELETE FROM idempotency_keys WHERE key = ? AND job_id = ?', (key, job_id))
+        conn.commit()
+        conn.close()
+
+    def complete(self, key: str, status: str, result: Dict):
+        """Store a finished job's outcome for later duplicates"""
+        conn = self._connect()
+        conn.execute('UPDATE idempotency_keys SET status = ?, result = ? WHERE key = ?',
+                     (status, json.dumps(result, default=str), key))
+        conn.commit()
+        conn.close()
+
+    def get(self, key: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM idempotency_keys WHERE key = ? AND expires_at >= ?',
+                           (key, time.time())).fetchone()
+        conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return data
@@ -0,0 +1,329 @@
+"""
+Durable execution job queue shared by master replicas
+Workers lease a job for a visibility timeout and renew the lease with heartbeats;
+a job whose worker stops heartbeating is delivered again to the next worker
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from jobs import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue(ABC):
+    """Job queue backend interface
+
+    Jobs move queued -> running (leased) -> completed / failed. A running job whose
+    lease expired counts as queued again; every lease raises ``attempts``.
+    Lease operations take the token returned by ``lease`` and do nothing once the
+    lease has moved on to another worker.
+    """
+
+    @abstractmethod
+    def enqueue(self, job_id: str, params: Dict, lane: str) -> Dict:
+        """Add a queued job to ``lane`` and return its record"""
+
+    @abstractmethod
+    def ready_lanes(self, lanes: Iterable[str]) -> List[str]:
+        """Lanes among ``lanes`` with a job available to lease"""
+
+    @abstractmethod
+    def lease(self, lane: str, worker: str, lease_seconds: float) -> Optional[Dict]:
+        """Oldest available job of ``lane`` leased to ``worker``, or None"""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, token: str, lease_seconds: float,
+                  snapshot: Optional[Dict] = None, events: Iterable[Dict] = ()) -> bool:
+        """Extend a lease and save progress; False when the lease was lost"""
+
+    @abstractmethod
+    def release(self, job_id: str, token: str):
+        """Give a leased job back for immediate re-delivery"""
+
+    @abstractmethod
+    def finish(self, job_id: str, token: str, status: str, snapshot: Dict,
+               events: Iterable[Dict] = ()) -> bool:
+        """Record the outcome of a leased job; False when the lease was lost"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """A job's record, or None"""
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first"""
+
+    @abstractmethod
+    def active(self) -> List[Dict]:
+        """Jobs that are queued or running"""
+
+    @abstractmethod
+    def count_active(self) -> int:
+        """Number of jobs that are queued or running"""
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Jobs waiting for a worker"""
+
+    @abstractmethod
+    def events(self, job_id: str, after: int = 0) -> List[Dict]:
+        """Saved progress events of a job with an ID above ``after``"""
+
+
+class SqliteJobQueue(JobQueue):
+    """JobQueue in a SQLite database, shared by replicas through the /data volume
+
+    Leases are taken under an immediate write lock, so two workers can never hold
+    the same job. A job whose lease expired ``max_attempts`` times is failed
+    instead of being delivered again.
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = 3, retention_seconds: float = 7 * 86400):
+        self.db_path = db_path
+        self.max_attempts = max(1, max_attempts)
+        self.retention_seconds = retention_seconds
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so lease() can hold an explicit write lock
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Initialize job and event tables"""
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                lane TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_token TEXT,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                snapshot TEXT,
+                error TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, lane, created_at)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                event_id INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, event_id)
+            )
+        ''')
+        conn.close()
+        logger.info(f"✅ Job queue database initialized ({self.db_path})")
+
+    def enqueue(self, job_id: str, params: Dict, lane: str) -> Dict:
+        now = time.time()
+        conn = self._connect()
+        conn.execute('''
+            INSERT INTO jobs (job_id, params, lane, status, created_at) VALUES (?, ?, ?, ?, ?)
+        ''', (job_id, json.dumps(params, default=str), lane, JobStatus.QUEUED, now))
+        self._purge(conn, now)
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._row_to_dict(row)
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        cutoff = now - self.retention_seconds
+        conn.execute('''
+            DELETE FROM job_events WHERE job_id IN (
+                SELECT job_id FROM jobs WHERE finished_at < ?
+            )
+        ''', (cutoff,))
+        conn.execute('DELETE FROM jobs WHERE finished_at < ?', (cutoff,))
+
+    def ready_lanes(self, lanes: Iterable[str]) -> List[str]:
+        lanes = list(lanes)
+        if not lanes:
+            return []
+        conn = self._connect()
+        rows = conn.execute(f'''
+            SELECT DISTINCT lane FROM jobs
+            WHERE lane IN ({",".join("?" * len(lanes))})
+              AND (status = ? OR (status = ? AND lease_expires_at < ?))
+        ''', (*lanes, JobStatus.QUEUED, JobStatus.RUNNING, time.time())).fetchall()
+        conn.close()
+        return [row["lane"] for row in rows]
+
+    def lease(self, lane: str, worker: str, lease_seconds: float) -> Optional[Dict]:
+        now = time.time()
+        token = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            # One writer at a time across every replica sharing the database
+            conn.execute('BEGIN IMMEDIATE')
+            # Jobs that keep killing their workers are not delivered again
+            conn.execute('''
+                UPDATE jobs SET status = ?, finished_at = ?, lease_token = NULL,
+                    error = 'Lease expired ' || attempts || ' time(s); giving up'
+                WHERE status = ? AND lease_expires_at < ? AND attempts >= ?
+            ''', (JobStatus.FAILED, now, JobStatus.RUNNING, now, self.max_attempts))
+            row = conn.execute('''
+                SELECT job_id FROM jobs
+                WHERE lane = ? AND (status = ? OR (status = ? AND lease_expires_at < ?))
+                ORDER BY created_at LIMIT 1
+            ''', (lane, JobStatus.QUEUED, JobStatus.RUNNING, now)).fetchone()
+            if row is not None:
+                conn.execute('''
+                    UPDATE jobs SET status = ?, attempts = attempts + 1, lease_token = ?, lease_owner = ?,
+                        lease_expires_at = ?, started_at = COALESCE(started_at, ?)
+                    WHERE job_id = ?
+                ''', (JobStatus.RUNNING, token, worker, now + lease_seconds, now, row["job_id"]))
+                row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (row["job_id"],)).fetchone()
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row is not None else None
+
+    def _save_events(self, conn: sqlite3.Connection, job_id: str, events: Iterable[Dict]):
+        conn.executemany('''
+            INSERT OR IGNORE INTO job_events (job_id, event_id, event) VALUES (?, ?, ?)
+        ''', [(job_id, event["id"], json.dumps(event, default=str)) for event in events])
+
+    def heartbeat(self, job_id: str, token: str, lease_seconds: float,
+                  snapshot: Optional[Dict] = None, events: Iterable[Dict] = ()) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            updated = conn.execute('''
+                UPDATE jobs SET lease_expires_at = ?, snapshot = COALESCE(?, snapshot)
+                WHERE job_id = ? AND lease_token = ? AND status = ?
+            ''', (time.time() + lease_seconds, json.dumps(snapshot, default=str) if snapshot else None,
+                  job_id, token, JobStatus.RUNNING)).rowcount
+            if updated:
+                self._save_events(conn, job_id, events)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return bool(updated)
+
+    def release(self, job_id: str, token: str):
+        conn = self._connect()
+        conn.execute('''
+            UPDATE jobs SET status = ?, lease_token = NULL, lease_owner = NULL, lease_expires_at = NULL
+            WHERE job_id = ? AND lease_token = ? AND status = ?
+        ''', (JobStatus.QUEUED, job_id, token, JobStatus.RUNNING))
+        conn.close()
+
+    def finish(self, job_id: str, token: str, status: str, snapshot: Dict,
+               events: Iterable[Dict] = ()) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            updated = conn.execute('''
+                UPDATE jobs SET status = ?, snapshot = ?, finished_at = ?,
+                    lease_token = NULL, lease_expires_at = NULL
+                WHERE job_id = ? AND lease_token = ? AND status = ?
+            ''', (status, json.dumps(snapshot, default=str), time.time(),
+                  job_id, token, JobStatus.RUNNING)).rowcount
+            if updated:
+                self._save_events(conn, job_id, events)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return bool(updated)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        conn = self._connect()
+        if status:
+            rows = conn.execute('''
+                SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?
+            ''', (status, limit)).fetchall()
+        else:
+            rows = conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        conn.close()
+        return [self._row_to_dict(row) for row in rows]
+
+    def active(self) -> List[Dict]:
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at
+        ''', (JobStatus.QUEUED, JobStatus.RUNNING)).fetchall()
+        conn.close()
+        return [self._row_to_dict(row) for row in rows]
+
+    def count_active(self) -> int:
+        conn = self._connect()
+        count = conn.execute('''
+            SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)
+        ''', (JobStatus.QUEUED, JobStatus.RUNNING)).fetchone()[0]
+        conn.close()
+        return count
+
+    def depth(self) -> int:
+        conn = self._connect()
+        count = conn.execute('''
+            SELECT COUNT(*) FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?)
+        ''', (JobStatus.QUEUED, JobStatus.RUNNING, time.time())).fetchone()[0]
+        conn.close()
+        return count
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict]:
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT event FROM job_events WHERE job_id = ? AND event_id > ? ORDER BY event_id
+        ''', (job_id, after)).fetchall()
+        conn.close()
+        return [json.loads(row["event"]) for row in rows]
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        record["params"] = json.loads(record["params"])
+        record["snapshot"] = json.loads(record["snapshot"]) if record["snapshot"] else None
+        return record
+
+
+# Queue backends by JOB_QUEUE_BACKEND name
+BACKENDS = {
+    "sqlite": SqliteJobQueue,
+}
+
+
+def queue_from_env() -> JobQueue:
+    """Job queue backend named by JOB_QUEUE_BACKEND (default sqlite on /data)"""
+    backend = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JOB_QUEUE_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "sqlite":
+        return SqliteJobQueue(
+            os.getenv("JOB_QUEUE_DB_PATH", "/data/master_jobs.db"),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+        )
+    return BACKENDS[backend]()
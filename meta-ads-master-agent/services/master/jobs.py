@@ -0,0 +1,392 @@
+"""
+Execution job tracking for the Master Orchestrator
+Worker pool behind POST /execute that leases jobs from the durable queue shared by all
+master replicas, with weighted priority lanes
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from http_pool import LaneScheduler
+from events import EventType, JobEventStream, current_stream
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    INTERRUPTED = "interrupted"  # Lost to a restart; resume it from its checkpoints
+
+    FINISHED = (COMPLETED, FAILED)
+
+
+class Priority:
+    INTERACTIVE = "interactive"  # Someone is waiting for it, e.g. the dashboard chat
+    BATCH = "batch"              # Schedules and resumes
+
+    ALL = (INTERACTIVE, BATCH)
+
+
+class AdStage:
+    PENDING = "pending"
+    SELECT_HOOK = "select_hook"
+    GENERATE = "generate"
+    CREATE_CAMPAIGN = "create_campaign"  # Campaign + ad set
+    CREATE_AD = "create_ad"              # Ad creative + ad
+    SAVE_CREATIVE = "save_creative"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class AdProgress:
+    """Progress of a single ad within an execution cycle"""
+    index: int
+    cycle_id: Optional[str] = None
+    ad_account_id: Optional[str] = None  # Campaign manager default account when None
+    page_id: Optional[str] = None
+    stage: str = AdStage.PENDING
+    completed: List[str] = field(default_factory=list)  # Steps already done, skipped on resume
+    hook_name: Optional[str] = None
+    hook_data: Optional[Dict] = None
+    image_url: Optional[str] = None
+    campaign_id: Optional[str] = None
+    adset_id: Optional[str] = None
+    ad_id: Optional[str] = None
+    ad_creative_id: Optional[str] = None  # Meta ad creative
+    creative_id: Optional[int] = None     # Performance analyzer record
+    cost: float = 0.0
+    error: Optional[str] = None
+    trace_id: Optional[str] = None
+    reservations: Dict[str, str] = field(default_factory=dict)  # Paid step -> open budget reservation
+    span: Optional[Any] = field(default=None, repr=False, compare=False)  # Root tracing span
+
+    @property
+    def succeeded(self) -> bool:
+        return self.stage == AdStage.DONE
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "span"}
+
+
+@dataclass
+class Job:
+    """An execution cycle submitted through POST /execute"""
+    job_id: str
+    params: Dict
+    status: str = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    ads: List[AdProgress] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    result: Optional[Dict] = None
+    stage_stats: Dict = field(default_factory=dict)  # Live StageStats in pipeline mode
+    attempts: int = 0  # Leases taken so far; above 1 the job was re-delivered
+    worker: Optional[str] = None
+    events: Optional[JobEventStream] = field(default=None, repr=False, compare=False)  # Progress stream
+    lease: Optional[str] = field(default=None, repr=False, compare=False)  # Token of the current lease
+    saved_event_id: int = field(default=0, repr=False, compare=False)  # Last event written to the queue
+
+    @property
+    def ads_created(self) -> int:
+        return sum(1 for ad in self.ads if ad.succeeded)
+
+    @property
+    def ads_total(self) -> int:
+        targets = self.params.get("targets")
+        if targets:
+            return sum(target.get("ads_to_create") or self.params["ads_to_create"] for target in targets)
+        return self.params.get("ads_to_create", len(self.ads))
+
+    @property
+    def total_cost(self) -> float:
+        return sum(ad.cost for ad in self.ads)
+
+    def summary(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "attempts": self.attempts,
+            "worker": self.worker,
+            "ads_created": self.ads_created,
+            "ads_total": self.ads_total,
+            "total_cost": self.total_cost,
+            "errors": self.errors + [ad.error for ad in self.ads if ad.error],
+            "result": self.result,
+        }
+
+    def to_dict(self) -> Dict:
+        data = self.summary()
+        data["ads"] = [ad.to_dict() for ad in self.ads]
+        if self.stage_stats:
+            data["stage_stats"] = {name: stats.to_dict() for name, stats in self.stage_stats.items()}
+        return data
+
+
+JobRunner = Callable[[Job], Awaitable[Dict]]
+
+
+class JobManager:
+    """Runs execution jobs from a durable JobQueue on a fixed pool of asyncio workers
+
+    Any number of master replicas can share one queue. A worker leases a job for
+    ``lease_seconds`` and renews the lease every ``heartbeat_seconds`` while it runs,
+    saving the job's progress and events so every replica can report on it. If the
+    worker dies its lease runs out and another worker takes the job again with
+    ``attempts`` raised, which the runner uses to resume from checkpoints. A worker
+    that loses its lease (e.g. stalled past the timeout) cancels its own run, so a
+    job never runs in two places at once.
+
+    Jobs wait in the priority lane named by their ``priority`` parameter and shared
+    workers take them in ``lanes`` weighted fair order. ``reserved_workers`` adds
+    workers that only take jobs from one lane, so that lane never waits for a
+    long job in another to finish.
+    """
+
+    def __init__(self, runner: JobRunner, queue: "JobQueue", workers: int = 2,
+                 on_finish: Optional[Callable[[Job], None]] = None,
+                 lanes: Optional[LaneScheduler] = None,
+                 reserved_workers: Optional[Dict[str, int]] = None,
+                 lease_seconds: float = 60, heartbeat_seconds: float = 5, poll_seconds: float = 1,
+                 worker_name: Optional[str] = None):
+        self.runner = runner
+        self.queue = queue
+        self.on_finish = on_finish
+        self.workers = max(1, workers)
+        self.lanes = lanes or LaneScheduler({Priority.BATCH: 1})
+        self.reserved_workers = {
+            lane: count for lane, count in (reserved_workers or {}).items()
+            if lane in self.lanes.weights and count > 0
+        }
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = min(heartbeat_seconds, lease_seconds / 3)
+        self.poll_seconds = poll_seconds
+        self.worker_name = worker_name or f"{socket.gethostname()}:{os.getpid()}"
+        self.running: Dict[str, Job] = {}  # Jobs leased by this replica
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        for lane, count in self.reserved_workers.items():
+            self._tasks += [
+                asyncio.create_task(self._worker(len(self._tasks) + n, [lane])) for n in range(count)
+            ]
+        logger.info(f"🧵 Job worker pool {self.worker_name} started "
+                    f"({self.workers} workers, reserved: {self.reserved_workers})")
+
+    async def stop(self):
+        """Cancel all workers; jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, params: Dict, job_id: Optional[str] = None) -> Job:
+        """Queue a new job for any replica and return it immediately
+
+        Safe to call from a worker thread, e.g. the scheduler's.
+        """
+        job = Job(job_id=job_id or uuid.uuid4().hex, params=params)
+        self.queue.enqueue(job.job_id, params, self.lanes.lane(params.get("priority")))
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        logger.info(f"📥 Job {job.job_id} queued ({params})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job running on this replica"""
+        return self.running.get(job_id)
+
+    async def describe(self, job_id: str) -> Optional[Dict]:
+        """Status, progress and result of a job on any replica"""
+        job = self.running.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        record = await asyncio.to_thread(self.queue.get, job_id)
+        return self._record_to_dict(record) if record else None
+
+    async def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Summaries of the most recent jobs first, optionally filtered by status"""
+        summaries = []
+        for record in await asyncio.to_thread(self.queue.list, status=status, limit=limit):
+            job = self.running.get(record["job_id"])
+            if job is not None:
+                summaries.append(job.summary())
+                continue
+            data = self._record_to_dict(record)
+            data.pop("ads", None)
+            data.pop("stage_stats", None)
+            summaries.append(data)
+        return summaries
+
+    def active(self) -> List[Dict]:
+        """Queue records of jobs that are queued or running on any replica"""
+        return self.queue.active()
+
+    def queue_depth(self) -> int:
+        return self.queue.depth()
+
+    def active_count(self) -> int:
+        return self.queue.count_active()
+
+    @staticmethod
+    def _record_to_dict(record: Dict) -> Dict:
+        data = record["snapshot"] or Job(
+            job_id=record["job_id"], params=record["params"],
+            created_at=datetime.fromtimestamp(record["created_at"])
+        ).to_dict()
+        data.update(status=record["status"], attempts=record["attempts"], worker=record["lease_owner"])
+        if record["error"]:
+            data["errors"] = data["errors"] + [record["error"]]
+        return data
+
+    async def subscribe(self, job_id: str, after: int = 0,
+                        heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict]]:
+        """Progress events of a job on any replica until it finishes
+
+        Live from the job's stream while it runs here, otherwise polled from the queue.
+        """
+        idle = 0.0
+        while True:
+            job = self.running.get(job_id)
+            if job is not None:
+                async for event in job.events.subscribe(after=after, heartbeat=heartbeat):
+                    yield event
+                return
+            record = await asyncio.to_thread(self.queue.get, job_id)
+            saved = await asyncio.to_thread(self.queue.events, job_id, after)
+            for event in saved:
+                yield event
+                after = event["id"]
+            if record is None or record["status"] in JobStatus.FINISHED:
+                return
+            idle = 0.0 if saved else idle + self.poll_seconds
+            if heartbeat is not None and idle >= heartbeat:
+                idle = 0.0
+                yield None
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _next_job(self, worker: str, lanes: Optional[List[str]]) -> Job:
+        while True:
+            self._wakeup.clear()
+            record, history = None, []
+            try:
+                ready = await asyncio.to_thread(self.queue.ready_lanes, lanes or list(self.lanes.weights))
+                lane = self.lanes.choose(ready)
+                if lane is not None:
+                    record = await asyncio.to_thread(self.queue.lease, lane, worker, self.lease_seconds)
+                    history = await asyncio.to_thread(self.queue.events, record["job_id"]) if record else []
+            except Exception as e:
+                logger.warning(f"⚠️  Job queue unavailable: {str(e)}")
+                lane = None
+            if record is not None:
+                self.lanes.record_wait(lane, max(0.0, time.time() - record["created_at"]))
+                job = Job(job_id=record["job_id"], params=record["params"], status=JobStatus.RUNNING,
+                          created_at=datetime.fromtimestamp(record["created_at"]), started_at=datetime.now(),
+                          attempts=record["attempts"], worker=worker)
+                job.lease = record["lease_token"]
+                job.events = JobEventStream(job.job_id, history=history)
+                job.saved_event_id = history[-1]["id"] if history else 0
+                return job
+            if lane is not None:
+                continue  # Another worker leased it first
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, worker_id: int, lanes: Optional[List[str]] = None):
+        worker = f"{self.worker_name}/{worker_id}"
+        while True:
+            job = await self._next_job(worker, lanes)
+            await self._run(job)
+
+    def _unsaved_events(self, job: Job) -> List[Dict]:
+        return [event for event in job.events.events if event["id"] > job.saved_event_id]
+
+    async def _heartbeat(self, job: Job, run: asyncio.Task):
+        """Keep the lease alive and save progress until the run ends or the lease is lost"""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            events = self._unsaved_events(job)
+            try:
+                alive = await asyncio.to_thread(
+                    self.queue.heartbeat, job.job_id, job.lease, self.lease_seconds, job.to_dict(), events
+                )
+            except Exception as e:
+                logger.warning(f"⚠️  Heartbeat for job {job.job_id} failed: {str(e)}")
+                continue
+            if not alive:
+                logger.warning(f"⚠️  Lost the lease on job {job.job_id}; stopping so it is not run twice")
+                job.lease = None
+                run.cancel()
+                return
+            if events:
+                job.saved_event_id = events[-1]["id"]
+
+    async def _run(self, job: Job):
+        logger.info(f"▶️  {job.worker} running job {job.job_id} (attempt {job.attempts})")
+        self.running[job.job_id] = job
+        current_stream.set(job.events)
+        job.events.publish(EventType.JOB_STARTED, params=job.params, attempt=job.attempts)
+        run = asyncio.create_task(self.runner(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, run))
+        try:
+            job.result = await run
+            job.status = JobStatus.COMPLETED if job.result.get("success") else JobStatus.FAILED
+        except asyncio.CancelledError:
+            if job.lease is not None:
+                # Shutting down: hand the job to the next worker right away
+                await asyncio.to_thread(self.queue.release, job.job_id, job.lease)
+                job.events.close()
+                raise
+            job.events.close()
+            return
+        except Exception as e:
+            logger.error(f"❌ Job {job.job_id} crashed: {str(e)}")
+            job.errors.append(str(e))
+            job.status = JobStatus.FAILED
+        finally:
+            heartbeat.cancel()
+            self.running.pop(job.job_id, None)
+
+        job.finished_at = datetime.now()
+        job.events.publish(EventType.JOB_FINISHED, status=job.status, ads_created=job.ads_created,
+                           total_cost=job.total_cost, errors=job.summary()["errors"])
+        job.events.close()
+        try:
+            recorded = await asyncio.to_thread(
+                self.queue.finish, job.job_id, job.lease, job.status, job.to_dict(), self._unsaved_events(job)
+            )
+        except Exception as e:
+            logger.error(f"❌ Could not record job {job.job_id}: {str(e)}")
+            recorded = False
+        if not recorded:
+            logger.warning(f"⚠️  Job {job.job_id} finished after its lease was lost; outcome not recorded")
+            return
+        logger.info(f"⏹️  Job {job.job_id} {job.status}")
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                logger.warning(f"⚠️  Job {job.job_id} finish hook failed: {str(e)}")
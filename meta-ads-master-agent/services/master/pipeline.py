@@ -0,0 +1,158 @@
+"""
+Stage pipeline for the Master Orchestrator
+Bounded per-stage queues across ads and a dependency graph within one ad
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of input for one worker
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline stage; the handler returns False to drop the item"""
+    name: str
+    handler: Callable[[Any], Awaitable[bool]]
+    workers: int = 1
+    queue_size: int = 0
+
+
+class StageStats:
+    """Live counters for one stage"""
+
+    def __init__(self, stage: Stage, queue: asyncio.Queue):
+        self.stage = stage
+        self.queue = queue
+        self.processed = 0
+        self.dropped = 0
+        self.busy_workers = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def observe_depth(self):
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def utilization(self) -> float:
+        """Fraction of worker time spent handling items"""
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, self.busy_seconds / (elapsed * self.stage.workers))
+
+    def to_dict(self) -> Dict:
+        return {
+            "workers": self.stage.workers,
+            "queue_size": self.stage.queue_size,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "busy_workers": self.busy_workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(self.utilization(), 3),
+        }
+
+
+class StagePipeline:
+    """Feeds items through stages so different items occupy different stages at once"""
+
+    def __init__(self, stages: List[Stage], stats: Optional[Dict[str, StageStats]] = None):
+        self.stages = stages
+        self.stats = stats if stats is not None else {}
+
+    async def run(self, items: Iterable[Any]) -> Dict[str, Dict]:
+        """Run all items through every stage and return per-stage stats"""
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        for stage, queue in zip(self.stages, queues):
+            self.stats[stage.name] = StageStats(stage, queue)
+        remaining = [stage.workers for stage in self.stages]
+
+        async def worker(position: int):
+            stage = self.stages[position]
+            stats = self.stats[stage.name]
+            queue = queues[position]
+            next_queue = queues[position + 1] if position + 1 < len(queues) else None
+
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+
+                stats.busy_workers += 1
+                started = time.monotonic()
+                try:
+                    passed = await stage.handler(item)
+                except Exception as e:
+                    logger.error(f"❌ Stage {stage.name} crashed: {str(e)}")
+                    passed = False
+                finally:
+                    stats.busy_seconds += time.monotonic() - started
+                    stats.busy_workers -= 1
+
+                if not passed:
+                    stats.dropped += 1
+                    continue
+                stats.processed += 1
+                if next_queue is not None:
+                    await next_queue.put(item)
+                    self.stats[self.stages[position + 1].name].observe_depth()
+
+            # The last worker out closes the next stage
+            remaining[position] -= 1
+            if remaining[position] == 0:
+                stats.finished_at = time.monotonic()
+                if next_queue is not None:
+                    for _ in range(self.stages[position + 1].workers):
+                        await next_queue.put(_DONE)
+
+        async def feed():
+            first = self.stats[self.stages[0].name]
+            for item in items:
+                await queues[0].put(item)
+                first.observe_depth()
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        tasks = [asyncio.create_task(feed())]
+        for position, stage in enumerate(self.stages):
+            tasks += [asyncio.create_task(worker(position)) for _ in range(stage.workers)]
+        await asyncio.gather(*tasks)
+
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+
+async def run_task_graph(nodes: Dict[str, Tuple[List[str], Callable[[], Awaitable[bool]]]]) -> Dict[str, bool]:
+    """Run each node as soon as all of its dependencies have succeeded
+
+    ``nodes`` maps name -> (dependency names, coroutine factory) and must be listed
+    in dependency order. A node whose dependency failed is skipped and counts as failed.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(name: str) -> bool:
+        deps, factory = nodes[name]
+        if not all(await asyncio.gather(*(tasks[dep] for dep in deps))):
+            return False
+        return await factory()
+
+    seen = set()
+    for name, (deps, _) in nodes.items():
+        missing = [dep for dep in deps if dep not in seen]
+        if missing:
+            raise ValueError(f"Node {name} depends on {missing}, which must be listed before it")
+        seen.add(name)
+
+    for name in nodes:
+        tasks[name] = asyncio.create_task(run(name))
+
+    results = await asyncio.gather(*tasks.values())
+    return dict(zip(tasks.keys(), results))
@@ -0,0 +1,449 @@
+"""
+Recurring execution schedules for the Master Orchestrator
+Cron schedules stored on the shared /data volume and fired by one asyncio loop,
+with overlap prevention, start-time jitter and a misfire policy per schedule
+"""
+
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+class MisfirePolicy:
+    """What to do when a run is later than its grace period (downtime, overlap)"""
+    RUN_ONCE = "run_once"  # Run once now, however many times were missed
+    SKIP = "skip"          # Drop the missed runs and wait for the next time
+    RUN_ALL = "run_all"    # Run every missed time back to back, up to max_catchup
+    ALL = (RUN_ONCE, SKIP, RUN_ALL)
+
+
+class CronExpression:
+    """Five-field cron expression: minute hour day-of-month month day-of-week
+
+    Supports ``*``, lists, ranges, steps, month/weekday names and the @hourly,
+    @daily, @weekly, @monthly and @yearly macros. As in cron, when both day fields
+    are restricted a day matches if either does.
+    """
+
+    MACROS = {
+        "@hourly": "0 * * * *",
+        "@daily": "0 0 * * *",
+        "@midnight": "0 0 * * *",
+        "@weekly": "0 0 * * 0",
+        "@monthly": "0 0 1 * *",
+        "@yearly": "0 0 1 1 *",
+        "@annually": "0 0 1 1 *",
+    }
+    MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])}
+    WEEKDAY_NAMES = {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = self.MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {len(fields)}: {expression!r}")
+
+        self.minutes = self._parse_field(fields[0], 0, 59)
+        self.hours = self._parse_field(fields[1], 0, 23)
+        self.days = self._parse_field(fields[2], 1, 31)
+        self.months = self._parse_field(fields[3], 1, 12, self.MONTH_NAMES)
+        self.weekdays = {day % 7 for day in self._parse_field(fields[4], 0, 7, self.WEEKDAY_NAMES)}
+        self.days_restricted = not fields[2].startswith("*")
+        self.weekdays_restricted = not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int, names: Optional[Dict[str, int]] = None) -> Set[int]:
+        def value(token: str) -> int:
+            token = token.lower()
+            if names and token in names:
+                return names[token]
+            if not token.isdigit():
+                raise ValueError(f"Invalid cron value {token!r}")
+            return int(token)
+
+        values = set()
+        for item in field.split(","):
+            span, _, step = item.partition("/")
+            step = value(step) if step else 1
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start, end = (value(part) for part in span.split("-", 1))
+            else:
+                start = value(span)
+                end = high if "/" in item else start
+            if not (low <= start <= end <= high) or step < 1:
+                raise ValueError(f"Cron field {item!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = moment.isoweekday() % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return in_days or in_weekdays
+        if self.days_restricted:
+            return in_days
+        if self.weekdays_restricted:
+            return in_weekdays
+        return True
+
+    def next_after(self, timestamp: float, tz: str = "UTC") -> float:
+        """First matching minute strictly after ``timestamp``, in wall-clock time of ``tz``"""
+        zone = ZoneInfo(tz)
+        moment = datetime.fromtimestamp(timestamp, zone).replace(tzinfo=None, second=0, microsecond=0)
+        moment += timedelta(minutes=1)
+        horizon = moment + timedelta(days=366 * 5)
+
+        while moment < horizon:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                # A wall time repeated when clocks go back is taken at its first
+                # occurrence, or its second when ``timestamp`` is already past the first
+                for fold in (0, 1):
+                    fires_at = moment.replace(tzinfo=zone, fold=fold).timestamp()
+                    if fires_at > timestamp:
+                        return fires_at
+                moment += timedelta(minutes=1)
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+
+class ScheduleStore:
+    """Persistent schedules and their run state"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Initialize schedule table"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # next_fire_at is the cron time, next_run_at the same time plus jitter
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedules (
+                schedule_id TEXT PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                cron TEXT NOT NULL,
+                timezone TEXT NOT NULL DEFAULT 'UTC',
+                ads_to_create INTEGER NOT NULL,
+                daily_budget INTEGER NOT NULL,
+                params TEXT,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                jitter_seconds INTEGER NOT NULL DEFAULT 0,
+                misfire_policy TEXT NOT NULL DEFAULT 'run_once',
+                misfire_grace_seconds INTEGER NOT NULL DEFAULT 300,
+                next_fire_at REAL,
+                next_run_at REAL,
+                last_run_at REAL,
+                last_job_id TEXT,
+                runs INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                catchup_runs INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+        logger.info(f"✅ Schedule database initialized ({self.db_path})")
+
+    def create(self, schedule: Dict) -> Dict:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO schedules (schedule_id, name, cron, timezone, ads_to_create, daily_budget,
+                                   params, enabled, jitter_seconds, misfire_policy,
+                                   misfire_grace_seconds, next_fire_at, next_run_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            schedule["schedule_id"], schedule["name"], schedule["cron"], schedule["timezone"],
+            schedule["ads_to_create"], schedule["daily_budget"], json.dumps(schedule["params"]),
+            int(schedule["enabled"]), schedule["jitter_seconds"], schedule["misfire_policy"],
+            schedule["misfire_grace_seconds"], schedule["next_fire_at"], schedule["next_run_at"]
+        ))
+        conn.commit()
+        conn.close()
+        return self.get(schedule["schedule_id"])
+
+    def get(self, schedule_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM schedules WHERE schedule_id = ?', (schedule_id,)).fetchone()
+        conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def list(self) -> List[Dict]:
+        conn = self._connect()
+        rows = conn.execute('SELECT * FROM schedules ORDER BY created_at, name').fetchall()
+        conn.close()
+        return [self._row_to_dict(row) for row in rows]
+
+    def due(self, now: float) -> List[Dict]:
+        """Enabled schedules whose next run time has passed"""
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT * FROM schedules WHERE enabled = 1 AND next_run_at <= ? ORDER BY next_run_at
+        ''', (now,)).fetchall()
+        conn.close()
+        return [self._row_to_dict(row) for row in rows]
+
+    def next_wakeup(self) -> Optional[float]:
+        conn = self._connect()
+        row = conn.execute('SELECT MIN(next_run_at) FROM schedules WHERE enabled = 1').fetchone()
+        conn.close()
+        return row[0]
+
+    def update(self, schedule_id: str, **fields) -> Optional[Dict]:
+        if "params" in fields:
+            fields["params"] = json.dumps(fields["params"])
+        if "enabled" in fields:
+            fields["enabled"] = int(fields["enabled"])
+        if fields:
+            conn = self._connect()
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            conn.execute(f'UPDATE schedules SET {assignments} WHERE schedule_id = ?',
+                         (*fields.values(), schedule_id))
+            conn.commit()
+            conn.close()
+        return self.get(schedule_id)
+
+    def delete(self, schedule_id: str) -> bool:
+        conn = self._connect()
+        cursor = conn.execute('DELETE FROM schedules WHERE schedule_id = ?', (schedule_id,))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        data["params"] = json.loads(data["params"] or "{}")
+        data["enabled"] = bool(data["enabled"])
+        return data
+
+
+class Scheduler:
+    """Fires due schedules as execution jobs
+
+    ``submit`` queues a job from execution params and returns its ID; ``is_active``
+    tells whether a job is still queued or running. A schedule never starts while
+    its previous job is active; the late run is then handled by its misfire policy.
+    """
+
+    # Schedule fields that change when the next run happens
+    TIMING_FIELDS = ("cron", "timezone", "jitter_seconds", "enabled")
+
+    def __init__(self, store: ScheduleStore, submit: Callable[[Dict], str],
+                 is_active: Callable[[str], bool], max_catchup: int = 10, max_sleep: float = 30.0):
+        self.store = store
+        self.submit = submit
+        self.is_active = is_active
+        self.max_catchup = max(1, max_catchup)
+        self.max_sleep = max_sleep
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the scheduling loop on the running event loop"""
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"⏰ Scheduler started ({len(self.store.list())} schedules)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Re-check schedules now, e.g. after one was added or changed"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def add(self, spec: Dict) -> Dict:
+        """Validate and store a new schedule"""
+        cron = self._validate(spec)
+        schedule = dict(spec)
+        schedule["schedule_id"] = uuid.uuid4().hex
+        schedule["next_fire_at"] = cron.next_after(time.time(), spec["timezone"])
+        schedule["next_run_at"] = self._jittered(schedule["next_fire_at"], spec["jitter_seconds"])
+        try:
+            created = self.store.create(schedule)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A schedule named {spec['name']!r} already exists")
+        logger.info(f"⏰ Schedule {created['name']} added ({created['cron']})")
+        self.wake()
+        return created
+
+    def update(self, schedule_id: str, changes: Dict) -> Optional[Dict]:
+        """Change a schedule; timing changes recompute its next run from now"""
+        schedule = self.store.get(schedule_id)
+        if schedule is None:
+            return None
+        merged = {**schedule, **changes}
+        cron = self._validate(merged)
+        if any(field in changes for field in self.TIMING_FIELDS):
+            changes["next_fire_at"] = cron.next_after(time.time(), merged["timezone"])
+            changes["next_run_at"] = self._jittered(changes["next_fire_at"], merged["jitter_seconds"])
+            changes["catchup_runs"] = 0
+        updated = self.store.update(schedule_id, **changes)
+        self.wake()
+        return updated
+
+    def remove(self, schedule_id: str) -> bool:
+        return self.store.delete(schedule_id)
+
+    def run_now(self, schedule_id: str) -> Optional[str]:
+        """Fire a schedule immediately without moving its next run; None if it is still running"""
+        schedule = self.store.get(schedule_id)
+        if schedule is None:
+            raise KeyError(schedule_id)
+        if schedule["last_job_id"] and self.is_active(schedule["last_job_id"]):
+            return None
+        job_id = self._fire(schedule, time.time())
+        self.store.update(schedule_id, last_run_at=time.time(), last_job_id=job_id, runs=schedule["runs"] + 1)
+        return job_id
+
+    def describe(self, schedule: Dict, upcoming: int = 3) -> Dict:
+        """Schedule with readable times, whether it is running and its next cron times"""
+        zone = ZoneInfo(schedule["timezone"])
+
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp, zone).isoformat() if timestamp else None
+
+        data = dict(schedule)
+        for field in ("next_fire_at", "next_run_at", "last_run_at"):
+            data[field] = iso(schedule[field])
+        data["running"] = bool(schedule["last_job_id"]) and self.is_active(schedule["last_job_id"])
+
+        times, cursor = [], schedule["next_fire_at"] or time.time()
+        if schedule["enabled"]:
+            cron = CronExpression(schedule["cron"])
+            for _ in range(upcoming):
+                times.append(iso(cursor))
+                cursor = cron.next_after(cursor, schedule["timezone"])
+        data["upcoming"] = times
+        return data
+
+    async def _loop(self):
+        while True:
+            try:
+                delay = await self.tick()
+            except Exception as e:
+                logger.error(f"❌ Scheduler tick failed: {str(e)}")
+                delay = self.max_sleep
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def tick(self) -> float:
+        """Fire every due schedule; returns seconds until the next check"""
+        now = time.time()
+        for schedule in await asyncio.to_thread(self.store.due, now):
+            # is_active and submit query the job and idempotency databases
+            changes = await asyncio.to_thread(self._advance, schedule, now)
+            if changes:
+                await asyncio.to_thread(self.store.update, schedule["schedule_id"], **changes)
+
+        next_run = await asyncio.to_thread(self.store.next_wakeup)
+        if next_run is None:
+            return self.max_sleep
+        return min(self.max_sleep, max(1.0, next_run - time.time()))
+
+    def _advance(self, schedule: Dict, now: float) -> Dict:
+        """Decide whether a due schedule runs now and when it runs next"""
+        if schedule["last_job_id"] and self.is_active(schedule["last_job_id"]):
+            # Never overlap: wait for the previous run, then apply the misfire policy
+            return {}
+
+        cron = CronExpression(schedule["cron"])
+        tz = schedule["timezone"]
+        fire_at = schedule["next_fire_at"]
+        late = now - schedule["next_run_at"]
+        policy = schedule["misfire_policy"]
+        changes = {}
+
+        if late <= schedule["misfire_grace_seconds"]:
+            run, next_fire, catchup = True, cron.next_after(fire_at, tz), 0
+        elif policy == MisfirePolicy.SKIP:
+            missed = self._count_missed(cron, fire_at, now, tz)
+            logger.warning(f"⏭️  Schedule {schedule['name']} skipped {missed} missed run(s)")
+            run, next_fire, catchup = False, cron.next_after(now, tz), 0
+            changes["skipped"] = schedule["skipped"] + missed
+        elif policy == MisfirePolicy.RUN_ALL and schedule["catchup_runs"] < self.max_catchup:
+            run, next_fire, catchup = True, cron.next_after(fire_at, tz), schedule["catchup_runs"] + 1
+        else:
+            # RUN_ONCE, or RUN_ALL past its catch-up limit: one run now for everything missed
+            missed = self._count_missed(cron, fire_at, now, tz)
+            run, next_fire, catchup = True, cron.next_after(now, tz), 0
+            changes["skipped"] = schedule["skipped"] + missed - 1
+            if missed > 1:
+                logger.warning(f"⏰ Schedule {schedule['name']} missed {missed} runs, running once")
+
+        if run:
+            changes["last_job_id"] = self._fire(schedule, fire_at)
+            changes["last_run_at"] = now
+            changes["runs"] = schedule["runs"] + 1
+        changes["next_fire_at"] = next_fire
+        changes["next_run_at"] = self._jittered(next_fire, schedule["jitter_seconds"])
+        changes["catchup_runs"] = catchup
+        return changes
+
+    def _fire(self, schedule: Dict, fire_at: float) -> str:
+        params = {
+            "ads_to_create": schedule["ads_to_create"],
+            "daily_budget": schedule["daily_budget"],
+            **schedule["params"],
+            "schedule_id": schedule["schedule_id"],
+            "scheduled_for": datetime.fromtimestamp(fire_at, ZoneInfo(schedule["timezone"])).isoformat(),
+        }
+        job_id = self.submit(params)
+        logger.info(f"⏰ Schedule {schedule['name']} started job {job_id}")
+        return job_id
+
+    def _count_missed(self, cron: CronExpression, fire_at: float, now: float, tz: str, limit: int = 10000) -> int:
+        missed = 0
+        while fire_at <= now and missed < limit:
+            missed += 1
+            fire_at = cron.next_after(fire_at, tz)
+        return missed
+
+    @staticmethod
+    def _validate(spec: Dict) -> CronExpression:
+        try:
+            ZoneInfo(spec["timezone"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone {spec['timezone']!r}")
+        if spec["misfire_policy"] not in MisfirePolicy.ALL:
+            raise ValueError(f"misfire_policy must be one of {', '.join(MisfirePolicy.ALL)}")
+        if spec["jitter_seconds"] < 0 or spec["misfire_grace_seconds"] < 0:
+            raise ValueError("jitter_seconds and misfire_grace_seconds cannot be negative")
+        return CronExpression(spec["cron"])
+
+    @staticmethod
+    def _jittered(fire_at: float, jitter_seconds: int) -> float:
+        return fire_at + random.uniform(0, jitter_seconds) if jitter_seconds else fire_at
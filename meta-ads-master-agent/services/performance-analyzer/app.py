@@ -6,17 +6,20 @@ Tracks and analyzes ad performance from Meta Ads API
 import os
 import sys
 import sqlite3
+import math
 import random
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 
 # Add parent directory to path for shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared_models import HookData, PerformanceMetrics, HOOK_VARIATIONS
+import tracing
 
 app = FastAPI(title="Performance Analyzer Service")
+tracing.install(app, "performance-analyzer")
 
 
 class HookSelectionResponse(BaseModel):
@@ -25,6 +28,28 @@ class HookSelectionResponse(BaseModel):
     performance_score: Optional[float] = None
 
 
+class HookBatchRequest(BaseModel):
+    unique: bool = False  # No hook more than once in the batch
+    min_exploration: float = 0.0  # Minimum share of exploration picks, 0-1
+
+
+class HookBatchResponse(BaseModel):
+    selections: List[HookSelectionResponse]
+
+
+class CreativeRecord(BaseModel):
+    hook_name: str
+    hook_text: str
+    image_path: Optional[str] = None
+    ad_id: Optional[str] = None
+    ad_set_id: Optional[str] = None
+    campaign_id: Optional[str] = None
+
+
+class SaveCreativesRequest(BaseModel):
+    creatives: List[CreativeRecord]
+
+
 class PerformanceUpdateRequest(BaseModel):
     creative_id: int
     impressions: int = 0
@@ -116,20 +141,45 @@ class PerformanceAnalyzerService:
     
     def select_hook_intelligently(self) -> HookData:
         """Select hook based on performance data or randomly if no data"""
-        top_hooks = self.get_top_performing_hooks(limit=2)
-        
-        # 70% exploitation, 30% exploration
-        if top_hooks and random.random() < 0.7:
-            selected = random.choice(top_hooks)
-            hook = next((h for h in HOOK_VARIATIONS if h.name == selected["name"]), None)
-            if hook:
-                print(f"🎯 Selected TOP PERFORMER: {hook.name} (score: {selected['score']:.2f})")
-                return hook, "exploitation", selected["score"]
-        
-        # Exploration: select randomly
-        hook = random.choice(HOOK_VARIATIONS)
-        print(f"🎲 Selected for EXPLORATION: {hook.name}")
-        return hook, "exploration", None
+        return self.select_hooks(1)[0]
+    
+    def select_hooks(self, n: int, unique: bool = False, min_exploration: float = 0.0) -> List[tuple]:
+        """Select n hooks from one performance ranking
+        
+        Each pick exploits a top performer 70% of the time and explores otherwise.
+        ``min_exploration`` raises the share of exploration picks to at least that
+        fraction of n; ``unique`` never repeats a hook within the batch.
+        """
+        if unique and n > len(HOOK_VARIATIONS):
+            raise ValueError(f"Only {len(HOOK_VARIATIONS)} hooks exist, cannot pick {n} without repeats")
+        top_hooks = [
+            (hook, top["score"])
+            for top in self.get_top_performing_hooks(limit=2)
+            for hook in HOOK_VARIATIONS if hook.name == top["name"]
+        ]
+        
+        # 70% exploitation, 30% exploration, topped up to the minimum exploration share
+        explore = [not top_hooks or random.random() >= 0.7 for _ in range(n)]
+        missing = math.ceil(min(max(min_exploration, 0.0), 1.0) * n) - sum(explore)
+        if missing > 0:
+            for i in random.sample([i for i, e in enumerate(explore) if not e], missing):
+                explore[i] = True
+        
+        used = set()
+        selections = []
+        for exploring in explore:
+            candidates = [(hook, score) for hook, score in top_hooks if not unique or hook.name not in used]
+            if not exploring and candidates:
+                hook, score = random.choice(candidates)
+                print(f"🎯 Selected TOP PERFORMER: {hook.name} (score: {score:.2f})")
+                selections.append((hook, "exploitation", score))
+            else:
+                # Exploration: select randomly
+                hook = random.choice([h for h in HOOK_VARIATIONS if not unique or h.name not in used])
+                print(f"🎲 Selected for EXPLORATION: {hook.name}")
+                selections.append((hook, "exploration", None))
+            used.add(hook.name)
+        return selections
     
     def update_performance(self, creative_id: int, metrics: PerformanceMetrics):
         """Update performance metrics for a creative"""
@@ -176,6 +226,30 @@ class PerformanceAnalyzerService:
         conn.close()
         
         return creative_id
+    
+    def save_creatives(self, creatives: List[Dict]) -> List[int]:
+        """Save many creatives in one transaction and return their IDs in order"""
+        if not creatives:
+            return []
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        creative_ids = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for c in creatives:
+                cursor = conn.execute('''
+                    INSERT INTO creatives (hook_name, hook_text, image_path, ad_id, ad_set_id, campaign_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (c["hook_name"], c["hook_text"], c.get("image_path"), c.get("ad_id"),
+                      c.get("ad_set_id"), c.get("campaign_id")))
+                creative_ids.append(cursor.lastrowid)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        return creative_ids
 
 
 # Initialize service
@@ -196,6 +270,22 @@ async def select_hook():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/select-hooks", response_model=HookBatchResponse)
+async def select_hooks(n: int = Query(1, ge=1, le=100), request: Optional[HookBatchRequest] = None):
+    """Select hooks for a whole cycle from a single performance ranking"""
+    request = request or HookBatchRequest()
+    try:
+        selections = service.select_hooks(n, unique=request.unique, min_exploration=request.min_exploration)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return HookBatchResponse(selections=[
+        HookSelectionResponse(hook_data=hook.to_dict(), selection_type=selection_type, performance_score=score)
+        for hook, selection_type, score in selections
+    ])
+
+
 @app.post("/update-performance")
 async def update_performance(request: PerformanceUpdateRequest):
     """Update performance metrics for a creative"""
@@ -226,6 +316,16 @@ async def save_creative(hook_name: str, hook_text: str, image_path: str = None,
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/save-creatives")
+async def save_creatives(request: SaveCreativesRequest):
+    """Save many creatives in a single transaction; IDs come back in request order"""
+    try:
+        creative_ids = service.save_creatives([creative.model_dump() for creative in request.creatives])
+        return {"success": True, "creative_ids": creative_ids}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
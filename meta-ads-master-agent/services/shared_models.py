@@ -400,6 +400,7 @@ CREATIVE_STYLE_CONFIGS = {
         "background": "Split screen - red/dull left side, green/bright right side",
         "layout": "Split screen - before on left, after on right",
         "labels": "BEFORE / AFTER labels",
+        "font": "Bold sans-serif labels",
         "colors": "Red/dull for before, green/bright for after",
         "style_notes": "Visual transformation, clear contrast"
     },
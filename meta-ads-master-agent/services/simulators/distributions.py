@@ -0,0 +1,49 @@
+"""
+Latency and completion-time distributions for the upstream simulators
+Specs are "<kind>:<params>" strings so they fit in environment variables:
+
+    fixed:20            always 20 seconds
+    uniform:10,30       anywhere between 10 and 30 seconds
+    normal:20,5         mean 20, standard deviation 5
+    lognormal:20,0.4    median 20, shape 0.4 (long right tail, like real generation times)
+    exponential:15      mean 15
+"""
+
+import math
+import random
+from typing import List
+
+
+class Distribution:
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind: str, params: List[float]):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown distribution {kind!r}, expected one of {', '.join(self.KINDS)}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"{kind} takes {self.KINDS[kind]} parameter(s), got {len(params)}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        kind, _, params = spec.strip().partition(":")
+        return cls(kind.strip(), [float(p) for p in params.split(",") if p.strip()])
+
+    def sample(self) -> float:
+        """One draw in seconds, never negative"""
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = random.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = random.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = random.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = random.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
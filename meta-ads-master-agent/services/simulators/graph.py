@@ -0,0 +1,218 @@
+"""
+Meta Graph API Simulator
+Local stand-in for the Marketing API edges the campaign manager uses (campaigns, adsets,
+adimages, adcreatives, ads, insights, status updates) with configurable latency, errors and per ad
+account rate limiting, so the stack can run without an FB_ACCESS_TOKEN
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import itertools
+from collections import defaultdict, deque
+from datetime import date, timedelta
+from typing import Deque, Dict, Optional
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from distributions import Distribution
+
+app = FastAPI(title="Graph API Simulator")
+
+LATENCY = Distribution.parse(os.getenv("GRAPH_FAKE_LATENCY", "lognormal:0.4,0.3"))
+ERROR_RATE = float(os.getenv("GRAPH_FAKE_ERROR_RATE", "0"))            # Share of calls failing with a transient error
+RATE_LIMIT_RATE = float(os.getenv("GRAPH_FAKE_RATE_LIMIT_RATE", "0"))  # Share of calls randomly throttled (code 613)
+ACCOUNT_CALLS_PER_MINUTE = int(os.getenv("GRAPH_FAKE_ACCOUNT_CALLS_PER_MINUTE", "0"))  # 0 = unlimited
+REGAIN_MINUTES = float(os.getenv("GRAPH_FAKE_REGAIN_MINUTES", "1"))   # Lock-out once an account hits its limit
+
+EDGES = {"campaigns": "campaign", "adsets": "adset", "adimages": "image", "adcreatives": "creative", "ads": "ad"}
+
+# Fields that must name an existing object of the given type
+REFERENCES = {"adsets": ("campaign_id", "campaign"), "ads": ("adset_id", "adset")}
+
+
+def graph_error(status: int, code: int, message: str, headers: Optional[Dict] = None, **extra) -> JSONResponse:
+    return JSONResponse(status_code=status, headers=headers, content={"error": {
+        "message": message, "type": "OAuthException", "code": code,
+        "fbtrace_id": f"Sim{random.randrange(16 ** 10):010x}", **extra,
+    }})
+
+
+class GraphSimulator:
+    def __init__(self):
+        self.objects: Dict[str, dict] = {}
+        self.calls: Dict[str, Deque[float]] = defaultdict(deque)  # Account -> call times in the last minute
+        self.blocked_until: Dict[str, float] = {}
+        self.stats = defaultdict(int)
+        self._ids = itertools.count(120210000000000001)
+
+    def usage_headers(self, account: str, regain_minutes: float = 0) -> Dict[str, str]:
+        """Account usage headers the real API sends with every ads_management call"""
+        window = self.calls[account]
+        pct = min(100, round(100 * len(window) / ACCOUNT_CALLS_PER_MINUTE)) if ACCOUNT_CALLS_PER_MINUTE else 0
+        return {
+            "x-ad-account-usage": json.dumps({"acc_id_util_pct": pct}),
+            "x-business-use-case-usage": json.dumps({account.replace("act_", ""): [{
+                "type": "ads_management", "call_count": pct, "total_cputime": pct, "total_time": pct,
+                "estimated_time_to_regain_access": regain_minutes,
+            }]}),
+        }
+
+    def throttle(self, account: str) -> Optional[JSONResponse]:
+        """Count a call against the account; a 400 code 17 response once it is over its limit"""
+        now = time.time()
+        window = self.calls[account]
+        while window and window[0] < now - 60:
+            window.popleft()
+        if self.blocked_until.get(account, 0) > now:
+            regain = (self.blocked_until[account] - now) / 60
+        elif ACCOUNT_CALLS_PER_MINUTE and len(window) >= ACCOUNT_CALLS_PER_MINUTE:
+            self.blocked_until[account] = now + REGAIN_MINUTES * 60
+            regain = REGAIN_MINUTES
+        else:
+            window.append(now)
+            return None
+        self.stats["rate_limited"] += 1
+        return graph_error(400, 17, "User request limit reached", self.usage_headers(account, round(regain, 2)),
+                           is_transient=True, error_subcode=2446079)
+
+    def create(self, account: str, edge: str, fields: Dict[str, str]) -> JSONResponse:
+        reference = REFERENCES.get(edge)
+        if reference:
+            field, kind = reference
+            target = self.objects.get(fields.get(field, ""))
+            if target is None or target["type"] != kind:
+                return graph_error(400, 100, f"Invalid parameter: {field} does not exist")
+        object_id = str(next(self._ids))
+        self.objects[object_id] = {"id": object_id, "type": EDGES[edge], "account": account,
+                                   "created_time": time.time(), **fields}
+        self.stats[f"created_{EDGES[edge]}"] += 1
+        headers = self.usage_headers(account)
+        if edge == "adimages":
+            url = fields.get("url", "")
+            return JSONResponse(headers=headers, content={"images": {url: {"hash": f"{int(object_id):x}", "url": url}}})
+        return JSONResponse(headers=headers, content={"id": object_id})
+
+    def update(self, object_id: str, fields: Dict[str, str]) -> JSONResponse:
+        obj = self.objects.get(object_id)
+        if obj is None:
+            return graph_error(400, 100, f"Object with ID '{object_id}' does not exist")
+        obj.update(fields)
+        self.stats[f"updated_{obj['type']}"] += 1
+        return JSONResponse(headers=self.usage_headers(obj["account"]), content={"success": True})
+
+    def insights(self, object_id: str) -> dict:
+        """Stable made-up delivery numbers for an object, growing with its age in days"""
+        rng = random.Random(object_id)
+        created = self.objects.get(object_id, {}).get("created_time", time.time())
+        days = 1 + int((time.time() - created) / 86400)
+        impressions = rng.randint(500, 5000) * days
+        clicks = int(impressions * rng.uniform(0.005, 0.04))
+        spend = round(impressions * rng.uniform(0.004, 0.02), 2)
+        leads = int(clicks * rng.uniform(0.02, 0.2))
+        return {"data": [{
+            "impressions": str(impressions),
+            "clicks": str(clicks),
+            "spend": str(spend),
+            "ctr": str(round(100 * clicks / impressions, 4)),
+            "cpc": str(round(spend / clicks, 4)) if clicks else "0",
+            "actions": [{"action_type": "lead", "value": str(leads)}],
+            "date_start": (date.today() - timedelta(days=days - 1)).isoformat(),
+            "date_stop": date.today().isoformat(),
+        }]}
+
+
+simulator = GraphSimulator()
+
+
+async def simulate_call(account: Optional[str], access_token: Optional[str]) -> Optional[JSONResponse]:
+    """Latency, auth, throttling and random errors shared by every edge; None means proceed"""
+    simulator.stats["calls"] += 1
+    await asyncio.sleep(LATENCY.sample())
+    if not access_token:
+        return graph_error(400, 190, "An active access token must be used to query information")
+    if account:
+        throttled = simulator.throttle(account)
+        if throttled is not None:
+            return throttled
+    if random.random() < RATE_LIMIT_RATE:
+        simulator.stats["rate_limited"] += 1
+        return graph_error(400, 613, "Calls to this api have exceeded the rate limit", is_transient=True)
+    if random.random() < ERROR_RATE:
+        simulator.stats["errors"] += 1
+        return graph_error(500, 2, "An unexpected error has occurred. Please retry your request later.",
+                           is_transient=True)
+    return None
+
+
+@app.post("/{version}/{account}/{edge}")
+async def create_object(version: str, account: str, edge: str, request: Request):
+    if edge not in EDGES:
+        return graph_error(400, 100, f"Unknown path components: /{edge}")
+    fields = {key: values[-1] for key, values in parse_qs((await request.body()).decode()).items()}
+    failure = await simulate_call(account, fields.pop("access_token", None))
+    if failure is not None:
+        return failure
+    return simulator.create(account, edge, fields)
+
+
+@app.post("/{version}/{object_id}")
+async def update_object(version: str, object_id: str, request: Request):
+    fields = {key: values[-1] for key, values in parse_qs((await request.body()).decode()).items()}
+    account = simulator.objects.get(object_id, {}).get("account")
+    failure = await simulate_call(account, fields.pop("access_token", None))
+    if failure is not None:
+        return failure
+    return simulator.update(object_id, fields)
+
+
+@app.get("/{version}/{object_id}/insights")
+async def get_insights(version: str, object_id: str, access_token: Optional[str] = None):
+    account = simulator.objects.get(object_id, {}).get("account")
+    failure = await simulate_call(account, access_token)
+    if failure is not None:
+        return failure
+    return simulator.insights(object_id)
+
+
+@app.get("/{version}/{object_id}")
+async def get_object(version: str, object_id: str, access_token: Optional[str] = None):
+    failure = await simulate_call(None, access_token)
+    if failure is not None:
+        return failure
+    obj = simulator.objects.get(object_id)
+    if obj is None:
+        return graph_error(400, 100, f"Object with ID '{object_id}' does not exist")
+    return obj
+
+
+@app.get("/stats")
+async def stats():
+    """Call counts, throttling and created objects since start (or the last reset)"""
+    return {**simulator.stats, "blocked_accounts": sorted(
+        account for account, until in simulator.blocked_until.items() if until > time.time()
+    )}
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    simulator.__init__()
+    return {"reset": True}
+
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "service": "graph-simulator",
+        "latency": str(LATENCY),
+        "account_calls_per_minute": ACCOUNT_CALLS_PER_MINUTE,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8102)
@@ -0,0 +1,236 @@
+"""
+Kie.ai Simulator
+Local stand-in for the Kie.ai jobs API (createTask / recordInfo, plus callBackUrl
+notifications) with configurable completion times, failures and throttling, so the stack
+can run without a KIE_API_KEY
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import random
+import asyncio
+import threading
+import httpx
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from distributions import Distribution
+
+app = FastAPI(title="Kie.ai Simulator")
+
+# Completion time of a task in seconds, e.g. "lognormal:20,0.35"
+DEFAULT_COMPLETION = Distribution.parse(os.getenv("KIE_FAKE_COMPLETION", "lognormal:20,0.35"))
+
+# "keyword=spec;keyword=spec": the first keyword found in a task's model or prompt
+# picks its completion time, e.g. "meme=lognormal:12,0.3;minimalist=fixed:8"
+COMPLETION_RULES: List[Tuple[str, Distribution]] = [
+    (keyword.strip().lower(), Distribution.parse(spec))
+    for keyword, _, spec in (
+        rule.partition("=") for rule in os.getenv("KIE_FAKE_COMPLETION_RULES", "").split(";") if "=" in rule
+    )
+]
+
+FAIL_RATE = float(os.getenv("KIE_FAKE_FAIL_RATE", "0"))              # Share of tasks that end in "fail"
+RATE_LIMIT_RATE = float(os.getenv("KIE_FAKE_RATE_LIMIT_RATE", "0"))  # Share of createTask calls throttled
+MAX_IN_FLIGHT = int(os.getenv("KIE_FAKE_MAX_IN_FLIGHT", "0"))        # Throttle above this many running tasks
+PUBLIC_URL = os.getenv("KIE_FAKE_PUBLIC_URL", "http://localhost:8101").rstrip("/")
+TASK_TTL = float(os.getenv("KIE_FAKE_TASK_TTL", "3600"))
+CALLBACK_LOSS_RATE = float(os.getenv("KIE_FAKE_CALLBACK_LOSS_RATE", "0"))  # Share of callbacks never sent
+
+# 1x1 transparent PNG served for every generated image
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+class KieSimulator:
+    def __init__(self):
+        self.tasks: Dict[str, dict] = {}
+        self.stats = {"create_task": 0, "record_info": 0, "rate_limited": 0, "succeeded": 0, "failed": 0,
+                      "callbacks_sent": 0, "callbacks_failed": 0, "callbacks_lost": 0}
+        self._lock = threading.Lock()
+
+    def completion_for(self, model: str, prompt: str) -> Distribution:
+        text = f"{model} {prompt}".lower()
+        for keyword, distribution in COMPLETION_RULES:
+            if keyword in text:
+                return distribution
+        return DEFAULT_COMPLETION
+
+    def in_flight(self) -> int:
+        now = time.time()
+        return sum(1 for task in self.tasks.values() if task["done_at"] > now)
+
+    def create(self, body: dict) -> Tuple[int, dict]:
+        """(HTTP status, body) of a createTask call"""
+        with self._lock:
+            self.stats["create_task"] += 1
+            if random.random() < RATE_LIMIT_RATE or (MAX_IN_FLIGHT and self.in_flight() >= MAX_IN_FLIGHT):
+                self.stats["rate_limited"] += 1
+                return 200, {"code": 429, "msg": "Rate limited, please try again later", "data": None}
+            model = body.get("model") or "google/nano-banana"
+            prompt = (body.get("input") or {}).get("prompt", "")
+            now = time.time()
+            task_id = uuid.uuid4().hex
+            self.tasks[task_id] = {
+                "model": model,
+                "param": json.dumps(body),
+                "created_at": now,
+                "done_at": now + self.completion_for(model, prompt).sample(),
+                "fails": random.random() < FAIL_RATE,
+                "counted": False,
+            }
+            self._purge(now)
+        return 200, {"code": 200, "msg": "success", "data": {"taskId": task_id}}
+
+    def record(self, task_id: str) -> dict:
+        """recordInfo body; the task completes once its sampled completion time has passed"""
+        with self._lock:
+            self.stats["record_info"] += 1
+            task = self.tasks.get(task_id)
+            if task is None:
+                return {"code": 404, "msg": f"Task {task_id} not found", "data": None}
+            done = time.time() >= task["done_at"]
+            if done:
+                self._count(task)
+        return {"code": 200, "msg": "success", "data": self._task_data(task_id, task, done)}
+
+    def callback(self, task_id: str) -> Optional[dict]:
+        """Body POSTed to the task's callBackUrl once it has completed, the same as recordInfo's"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            self._count(task)
+        return {"code": 200, "msg": "success", "data": self._task_data(task_id, task, True)}
+
+    def _count(self, task: dict):
+        if not task["counted"]:
+            task["counted"] = True
+            self.stats["failed" if task["fails"] else "succeeded"] += 1
+
+    def _task_data(self, task_id: str, task: dict, done: bool) -> dict:
+        data = {
+            "taskId": task_id,
+            "model": task["model"],
+            "state": "waiting",
+            "param": task["param"],
+            "resultJson": None,
+            "failCode": None,
+            "failMsg": None,
+            "costTime": None,
+            "completeTime": None,
+            "createTime": int(task["created_at"] * 1000),
+        }
+        if not done:
+            return data
+        if task["fails"]:
+            data.update(state="fail", failCode="500", failMsg="Simulated generation failure")
+        else:
+            data.update(
+                state="success",
+                resultJson=json.dumps({"resultUrls": [f"{PUBLIC_URL}/files/{task_id}.png"]}),
+                costTime=int((task["done_at"] - task["created_at"]) * 1000),
+                completeTime=int(task["done_at"] * 1000),
+            )
+        return data
+
+    def _purge(self, now: float):
+        for task_id in [t for t, task in self.tasks.items() if task["created_at"] < now - TASK_TTL]:
+            del self.tasks[task_id]
+
+    def reset(self):
+        with self._lock:
+            self.tasks.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+
+simulator = KieSimulator()
+callback_client = httpx.AsyncClient(timeout=10)
+pending_callbacks: Set[asyncio.Task] = set()
+
+
+async def send_callback(task_id: str, url: str):
+    """POST the finished task to ``url`` when its completion time comes, like Kie.ai does"""
+    task = simulator.tasks.get(task_id)
+    if task is None:
+        return
+    await asyncio.sleep(max(0.0, task["done_at"] - time.time()))
+    if random.random() < CALLBACK_LOSS_RATE:
+        simulator.stats["callbacks_lost"] += 1
+        return
+    body = simulator.callback(task_id)
+    if body is None:
+        return
+    try:
+        response = await callback_client.post(url, json=body)
+        simulator.stats["callbacks_sent" if response.status_code < 400 else "callbacks_failed"] += 1
+    except httpx.HTTPError:
+        simulator.stats["callbacks_failed"] += 1
+
+
+def authorized(request: Request) -> bool:
+    return request.headers.get("authorization", "").startswith("Bearer ")
+
+
+@app.post("/api/v1/jobs/createTask")
+async def create_task(request: Request):
+    if not authorized(request):
+        return JSONResponse(status_code=401, content={"code": 401, "msg": "Unauthorized", "data": None})
+    payload = await request.json()
+    status, body = simulator.create(payload)
+    if body["code"] == 200 and payload.get("callBackUrl"):
+        callback = asyncio.create_task(send_callback(body["data"]["taskId"], payload["callBackUrl"]))
+        pending_callbacks.add(callback)
+        callback.add_done_callback(pending_callbacks.discard)
+    return JSONResponse(status_code=status, content=body)
+
+
+@app.get("/api/v1/jobs/recordInfo")
+async def record_info(taskId: str, request: Request):
+    if not authorized(request):
+        return JSONResponse(status_code=401, content={"code": 401, "msg": "Unauthorized", "data": None})
+    return simulator.record(taskId)
+
+
+@app.get("/files/{name}")
+async def file(name: str):
+    return Response(content=PNG, media_type="image/png")
+
+
+@app.get("/stats")
+async def stats():
+    """Call counts and task outcomes since start (or the last reset)"""
+    return {**simulator.stats, "in_flight": simulator.in_flight(), "tasks": len(simulator.tasks)}
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    simulator.reset()
+    return {"reset": True}
+
+
+@app.on_event("shutdown")
+async def close_callbacks():
+    for callback in list(pending_callbacks):
+        callback.cancel()
+    await callback_client.aclose()
+
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "service": "kie-simulator",
+        "completion": str(DEFAULT_COMPLETION),
+        "completion_rules": {keyword: str(distribution) for keyword, distribution in COMPLETION_RULES},
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8101)
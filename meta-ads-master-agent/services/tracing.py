@@ -0,0 +1,220 @@
+"""
+Lightweight distributed tracing for Meta Ads services
+W3C traceparent propagation between services and a local JSONL span exporter
+"""
+
+import os
+import json
+import time
+import glob
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return "%0*x" % (nbytes * 2, random.getrandbits(nbytes * 8))
+
+
+class SpanContext:
+    """Identifies a span across process boundaries"""
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        if not value:
+            return None
+        parts = value.strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return cls(parts[1], parts[2])
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional[SpanContext] = None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.start = time.time()
+        self._started = time.monotonic()
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)
+
+    def end(self):
+        """Finish the span and export it; ending twice is a no-op"""
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.monotonic() - self._started) * 1000
+        exporter.export(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": exporter.service,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlSpanExporter:
+    """Appends finished spans to <TRACE_DIR>/<service>.jsonl"""
+
+    def __init__(self):
+        self.service = os.getenv("SERVICE_NAME", "unknown")
+        self.enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        self.trace_dir = os.getenv("TRACE_DIR", "/data/traces")
+        self.max_bytes = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.trace_dir, f"{self.service}.jsonl")
+
+    def export(self, span: Span):
+        if not self.enabled:
+            return
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"⚠️  Span export disabled, cannot write {self.path}: {str(e)}")
+            self.enabled = False
+
+
+exporter = JsonlSpanExporter()
+
+
+def configure(service_name: str):
+    """Name this process's spans and span file"""
+    exporter.service = service_name
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, parent: Optional[SpanContext] = None, **attributes) -> Span:
+    """Start a span under ``parent``, or under the current span when no parent is given"""
+    if parent is None and current_span() is not None:
+        parent = current_span().context
+    return Span(name, parent, **attributes)
+
+
+@contextmanager
+def use_span(span: Span, end: bool = True):
+    """Make ``span`` current; errors raised inside mark it failed"""
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        if end:
+            span.end()
+
+
+@contextmanager
+def span(name: str, parent: Optional[SpanContext] = None, **attributes):
+    """Trace a block of code as a child of the current span"""
+    with use_span(start_span(name, parent, **attributes)) as s:
+        yield s
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, if any"""
+    active = current_span()
+    if active is not None:
+        active.set(**attributes)
+
+
+def inject(headers: Optional[Dict] = None) -> Dict:
+    """Add the current span's traceparent header"""
+    headers = dict(headers or {})
+    active = current_span()
+    if active is not None:
+        headers[TRACEPARENT_HEADER] = active.context.to_traceparent()
+    return headers
+
+
+def install(app, service_name: str):
+    """Trace every request to a FastAPI app, continuing any incoming trace"""
+    configure(service_name)
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        parent = SpanContext.from_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        if parent is None:
+            # Only requests that are part of a trace are recorded
+            return await call_next(request)
+        with span(f"{request.method} {request.url.path}", parent, kind="server") as s:
+            response = await call_next(request)
+            s.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                s.status = "error"
+            return response
+
+
+def load_spans(trace_id: Optional[str] = None, name: Optional[str] = None,
+               min_duration_ms: Optional[float] = None, limit: int = 1000) -> List[Dict]:
+    """Query exported spans from every service's span file"""
+    spans = []
+    for path in sorted(glob.glob(os.path.join(exporter.trace_dir, "*.jsonl*"))):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if trace_id and record["trace_id"] != trace_id:
+                    continue
+                if name and not record["name"].startswith(name):
+                    continue
+                if min_duration_ms is not None and (record["duration_ms"] or 0) < min_duration_ms:
+                    continue
+                spans.append(record)
+
+    if trace_id:
+        spans.sort(key=lambda s: s["start"])
+    else:
+        spans.sort(key=lambda s: s["duration_ms"] or 0, reverse=True)
+    return spans[:limit]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The services import their shared modules and siblings as top-level modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "services", name) for name in ("", "master", "image-generator")]
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class Recorder:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail:
+            raise RuntimeError("downstream failed")
+        return [item * 10 for item in items]
+
+
+def test_full_batch_flushes_without_waiting():
+    async def scenario():
+        flush = Recorder()
+        batcher = MicroBatcher("test", flush, max_size=3, max_wait=60)
+        started = time.monotonic()
+        results = await asyncio.gather(*(batcher.submit(n) for n in range(3)))
+        return flush, results, time.monotonic() - started
+
+    flush, results, elapsed = asyncio.run(scenario())
+    assert flush.batches == [[0, 1, 2]]
+    assert results == [0, 10, 20]
+    assert elapsed < 1
+
+
+def test_partial_batch_flushes_when_window_closes():
+    async def scenario():
+        flush = Recorder()
+        batcher = MicroBatcher("test", flush, max_size=10, max_wait=0.05)
+        first = asyncio.create_task(batcher.submit(1))
+        await asyncio.sleep(0)
+        assert flush.batches == []
+        second = asyncio.create_task(batcher.submit(2))
+        return flush, await asyncio.gather(first, second)
+
+    flush, results = asyncio.run(scenario())
+    assert flush.batches == [[1, 2]]
+    assert results == [10, 20]
+
+
+def test_items_past_max_size_start_the_next_batch():
+    async def scenario():
+        flush = Recorder()
+        batcher = MicroBatcher("test", flush, max_size=2, max_wait=0.05)
+        results = await asyncio.gather(*(batcher.submit(n) for n in range(5)))
+        return flush, results
+
+    flush, results = asyncio.run(scenario())
+    assert flush.batches == [[0, 1], [2, 3], [4]]
+    assert results == [0, 10, 20, 30, 40]
+
+
+def test_flush_error_reaches_every_caller_in_the_batch():
+    async def scenario():
+        batcher = MicroBatcher("test", Recorder(fail=True), max_size=2, max_wait=60)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_wrong_result_count_is_an_error():
+    async def short(items):
+        return items[:1]
+
+    async def scenario():
+        batcher = MicroBatcher("test", short, max_size=2, max_wait=60)
+        await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_aclose_sends_what_is_waiting():
+    async def scenario():
+        flush = Recorder()
+        batcher = MicroBatcher("test", flush, max_size=10, max_wait=60)
+        pending = asyncio.create_task(batcher.submit(7))
+        await asyncio.sleep(0)
+        await batcher.aclose()
+        return flush, await pending
+
+    flush, result = asyncio.run(scenario())
+    assert flush.batches == [[7]]
+    assert result == 70
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from budget import AD_SPEND, GENERATION, BudgetExceeded, BudgetGovernor
+
+
+@pytest.fixture
+def governor(tmp_path):
+    return BudgetGovernor(str(tmp_path / "budget.db"), {
+        GENERATION: {"hourly": 1.0, "daily": 3.0},
+        AD_SPEND: {"hourly": None, "daily": None},
+    })
+
+
+def remaining(governor, window, category=GENERATION):
+    return governor.headroom()[category][window]["remaining"]
+
+
+def age(governor, reservation_id, seconds):
+    """Move a reservation ``seconds`` into the past"""
+    conn = sqlite3.connect(governor.db_path)
+    conn.execute('''
+        UPDATE reservations SET created_at = created_at - ?, settled_at = settled_at - ?,
+            expires_at = expires_at - ?
+        WHERE reservation_id = ?
+    ''', (seconds, seconds, seconds, reservation_id))
+    conn.commit()
+    conn.close()
+
+
+def test_reservations_count_until_released(governor):
+    first = governor.reserve(GENERATION, 0.6)
+    assert remaining(governor, "hourly") == pytest.approx(0.4)
+    with pytest.raises(BudgetExceeded) as exceeded:
+        governor.reserve(GENERATION, 0.5)
+    assert exceeded.value.window == "hourly"
+    assert exceeded.value.remaining == pytest.approx(0.4)
+
+    governor.release(first)
+    assert remaining(governor, "hourly") == pytest.approx(1.0)
+    governor.reserve(GENERATION, 1.0)
+
+
+def test_settle_replaces_reserved_amount_with_actual(governor):
+    reservation = governor.reserve(GENERATION, 0.6)
+    governor.settle(reservation, 0.2)
+    usage = governor.headroom()[GENERATION]["hourly"]
+    assert usage["settled"] == pytest.approx(0.2)
+    assert usage["reserved"] == 0
+    assert usage["remaining"] == pytest.approx(0.8)
+
+
+def test_double_settle_counts_once(governor):
+    reservation = governor.reserve(GENERATION, 0.5)
+    governor.settle(reservation, 0.5)
+    governor.settle(reservation, 0.5)
+    assert remaining(governor, "hourly") == pytest.approx(0.5)
+    # A later settle corrects the amount instead of adding to it
+    governor.settle(reservation, 0.3)
+    assert remaining(governor, "hourly") == pytest.approx(0.7)
+
+
+def test_release_after_settle_keeps_the_cost(governor):
+    reservation = governor.reserve(GENERATION, 0.5)
+    governor.settle(reservation, 0.4)
+    governor.release(reservation)
+    assert remaining(governor, "hourly") == pytest.approx(0.6)
+
+
+def test_settle_after_release_still_counts(governor):
+    reservation = governor.reserve(GENERATION, 0.5)
+    governor.release(reservation)
+    governor.settle(reservation, 0.4)
+    assert remaining(governor, "hourly") == pytest.approx(0.6)
+
+
+def test_daily_cap_outlives_the_hourly_window(governor):
+    for amount in (1.0, 1.0, 0.5):
+        reservation = governor.reserve(GENERATION, amount)
+        governor.settle(reservation, amount)
+        age(governor, reservation, 2 * 3600)
+    assert remaining(governor, "hourly") == pytest.approx(1.0)
+    assert remaining(governor, "daily") == pytest.approx(0.5)
+
+    with pytest.raises(BudgetExceeded) as exceeded:
+        governor.reserve(GENERATION, 0.6)  # Fits the hourly cap, not the daily one
+    assert exceeded.value.window == "daily"
+    governor.reserve(GENERATION, 0.5)
+
+
+def test_expired_reservation_stops_counting(governor):
+    reservation = governor.reserve(GENERATION, 1.0, ttl=60)
+    age(governor, reservation, 120)
+    governor.reserve(GENERATION, 1.0)
+
+
+def test_uncapped_category(governor):
+    for _ in range(3):
+        governor.reserve(AD_SPEND, 1000)
+    assert remaining(governor, "daily", AD_SPEND) is None
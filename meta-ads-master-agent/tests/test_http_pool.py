@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from http_pool import ERROR, OK, OVERLOAD, AdaptiveLimiter, CircuitBreaker, CircuitOpenError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def saturate(limiter: AdaptiveLimiter, outcome: str = OK):
+    """One window: fill every slot, then release them all with ``outcome``"""
+    started = [await limiter.acquire() for _ in range(int(limiter.limit))]
+    for start in started:
+        await limiter.release(start, outcome)
+
+
+class TestAdaptiveLimiter:
+    def test_saturated_healthy_window_adds_one(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=2, max_limit=4)
+            await saturate(limiter)
+            assert limiter.limit == 3
+            await saturate(limiter)
+            await saturate(limiter)
+            return limiter
+
+        limiter = run(scenario())
+        assert limiter.limit == 4  # Capped at max_limit
+        assert limiter.increases == 2
+        assert limiter.in_flight == 0
+
+    def test_unsaturated_window_does_not_grow(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=2)
+            for _ in range(10):
+                await limiter.release(await limiter.acquire(), OK)
+            return limiter
+
+        limiter = run(scenario())
+        assert limiter.limit == 2
+        assert limiter.increases == 0
+
+    def test_errors_above_max_rate_do_not_grow(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=2, max_error_rate=0.1)
+            await saturate(limiter, ERROR)
+            return limiter
+
+        limiter = run(scenario())
+        assert limiter.limit == 2
+        assert limiter.decreases == 0
+
+    def test_overload_multiplies_by_backoff_down_to_min(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=8, min_limit=3, backoff=0.5)
+            limits = []
+            for _ in range(3):
+                await limiter.release(await limiter.acquire(), OVERLOAD)
+                limits.append(int(limiter.limit))
+            return limiter, limits
+
+        limiter, limits = run(scenario())
+        assert limits == [4, 3, 3]
+        assert limiter.decreases == 3
+
+    def test_requests_in_flight_at_a_cut_do_not_cut_again(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=8, backoff=0.5)
+            await saturate(limiter, OVERLOAD)
+            return limiter
+
+        limiter = run(scenario())
+        assert limiter.limit == 4
+        assert limiter.decreases == 1
+
+    def test_waiters_get_freed_slots(self):
+        async def scenario():
+            limiter = AdaptiveLimiter("svc", initial=1)
+            started = await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            await limiter.release(started, OK)
+            await limiter.release(await waiter, OK)
+            return limiter
+
+        assert run(scenario()).in_flight == 0
+
+
+class TestCircuitBreaker:
+    def open_breaker(self, threshold: int = 3) -> CircuitBreaker:
+        breaker = CircuitBreaker("svc", failure_threshold=threshold, reset_timeout=30)
+        for n in range(threshold):
+            breaker.before_request()
+            breaker.record_failure(f"error {n}")
+        return breaker
+
+    @staticmethod
+    def elapse(breaker: CircuitBreaker, seconds: float):
+        breaker.opened_at -= seconds
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("svc", failure_threshold=3)
+        breaker.record_failure("a")
+        breaker.record_failure("b")
+        breaker.record_success()  # Resets the count
+        breaker.record_failure("c")
+        breaker.record_failure("d")
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        breaker.record_failure("e")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 1
+        assert not breaker.available
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+
+    def test_half_open_after_reset_timeout_lets_one_probe_through(self):
+        breaker = self.open_breaker()
+        self.elapse(breaker, 30)
+        assert breaker.available
+        assert breaker.to_dict()["state"] == CircuitBreaker.HALF_OPEN
+
+        breaker.before_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.available
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+
+    def test_successful_probe_closes(self):
+        breaker = self.open_breaker()
+        self.elapse(breaker, 30)
+        breaker.before_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.consecutive_failures == 0
+        breaker.before_request()
+
+    def test_failed_probe_reopens_for_a_new_timeout(self):
+        breaker = self.open_breaker()
+        self.elapse(breaker, 30)
+        breaker.before_request()
+        breaker.record_failure("still down")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+        assert breaker.retry_in() > 29
+        assert breaker.last_error == "still down"
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.db"), ttl_seconds=60)
+
+
+PARAMS = {"ads_to_create": 2, "daily_budget": 500}
+
+
+def expire(store, key):
+    """Move a key's expiry into the past"""
+    conn = sqlite3.connect(store.db_path)
+    conn.execute('UPDATE idempotency_keys SET expires_at = expires_at - 120 WHERE key = ?', (key,))
+    conn.commit()
+    conn.close()
+
+
+def test_fingerprint_ignores_key_order():
+    assert IdempotencyStore.fingerprint({"a": 1, "b": 2}) == IdempotencyStore.fingerprint({"b": 2, "a": 1})
+    assert IdempotencyStore.fingerprint({"a": 1}) != IdempotencyStore.fingerprint({"a": 2})
+
+
+def test_duplicate_claim_returns_the_original_job(store):
+    fingerprint = IdempotencyStore.fingerprint(PARAMS)
+    assert store.claim("k1", fingerprint, "job-1")["job_id"] == "job-1"
+    assert store.claim("k1", fingerprint, "job-2")["job_id"] == "job-1"
+
+
+def test_different_payload_conflicts(store):
+    store.claim("k1", IdempotencyStore.fingerprint(PARAMS), "job-1")
+    with pytest.raises(IdempotencyConflict):
+        store.claim("k1", IdempotencyStore.fingerprint({**PARAMS, "ads_to_create": 3}), "job-2")
+    # Other keys are unaffected
+    assert store.claim("k2", IdempotencyStore.fingerprint({"ads_to_create": 3}), "job-3")["job_id"] == "job-3"
+
+
+def test_completed_job_result_is_replayed(store):
+    fingerprint = IdempotencyStore.fingerprint(PARAMS)
+    store.claim("k1", fingerprint, "job-1")
+    assert store.get("k1")["status"] is None
+    store.complete("k1", "completed", {"result": {"ads_created": 2}})
+    record = store.get("k1")
+    assert record["status"] == "completed"
+    assert record["result"] == {"result": {"ads_created": 2}}
+    assert store.claim("k1", fingerprint, "job-2")["job_id"] == "job-1"
+
+
+def test_release_frees_the_key_only_for_its_job(store):
+    fingerprint = IdempotencyStore.fingerprint(PARAMS)
+    store.claim("k1", fingerprint, "job-1")
+    store.release("k1", "job-other")
+    assert store.get("k1")["job_id"] == "job-1"
+    store.release("k1", "job-1")
+    assert store.get("k1") is None
+    assert store.claim("k1", fingerprint, "job-2")["job_id"] == "job-2"
+
+
+def test_claim_after_ttl_starts_a_new_job(store):
+    store.claim("k1", IdempotencyStore.fingerprint(PARAMS), "job-1")
+    expire(store, "k1")
+    assert store.get("k1") is None
+    # An expired key can be reused, even with different parameters
+    record = store.claim("k1", IdempotencyStore.fingerprint({"ads_to_create": 5}), "job-2")
+    assert record["job_id"] == "job-2"
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from job_queue import JobQueue, SqliteJobQueue
+from jobs import JobStatus
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SqliteJobQueue(str(tmp_path / "jobs.db"), max_attempts=2)
+
+
+def test_interface_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_lease_is_exclusive_while_heartbeating(queue):
+    queue.enqueue("job-1", {"ads_to_create": 1}, "batch")
+    leased = queue.lease("batch", "worker-a", lease_seconds=60)
+    assert leased["job_id"] == "job-1"
+    assert leased["attempts"] == 1
+    assert queue.lease("batch", "worker-b", lease_seconds=60) is None
+    assert queue.heartbeat("job-1", leased["lease_token"], 60, snapshot={"progress": 1})
+    assert queue.depth() == 0
+
+
+def test_lease_reclaimed_after_missed_heartbeat(queue):
+    queue.enqueue("job-1", {}, "batch")
+    first = queue.lease("batch", "worker-a", lease_seconds=-1)  # Already expired
+    assert queue.depth() == 1
+    assert queue.ready_lanes(["batch", "interactive"]) == ["batch"]
+
+    second = queue.lease("batch", "worker-b", lease_seconds=60)
+    assert second["job_id"] == "job-1"
+    assert second["lease_owner"] == "worker-b"
+    assert second["attempts"] == 2
+    # The first worker lost its lease and can no longer touch the job
+    assert not queue.heartbeat("job-1", first["lease_token"], 60)
+    assert not queue.finish("job-1", first["lease_token"], JobStatus.COMPLETED, {})
+    assert queue.finish("job-1", second["lease_token"], JobStatus.COMPLETED, {"done": True})
+    assert queue.get("job-1")["status"] == JobStatus.COMPLETED
+
+
+def test_job_fails_after_max_attempts(queue):
+    queue.enqueue("job-1", {}, "batch")
+    for _ in range(2):
+        assert queue.lease("batch", "worker", lease_seconds=-1) is not None
+
+    assert queue.lease("batch", "worker", lease_seconds=60) is None
+    record = queue.get("job-1")
+    assert record["status"] == JobStatus.FAILED
+    assert record["attempts"] == 2
+    assert "giving up" in record["error"]
+    assert queue.active() == []
+
+
+def test_release_redelivers_without_waiting(queue):
+    queue.enqueue("job-1", {}, "batch")
+    leased = queue.lease("batch", "worker-a", lease_seconds=60)
+    queue.release("job-1", leased["lease_token"])
+    assert queue.get("job-1")["status"] == JobStatus.QUEUED
+    assert queue.lease("batch", "worker-b", lease_seconds=60)["job_id"] == "job-1"
+
+
+def test_lanes_and_order(queue):
+    queue.enqueue("old", {}, "batch")
+    time.sleep(0.001)
+    queue.enqueue("new", {}, "batch")
+    queue.enqueue("urgent", {}, "interactive")
+    assert queue.lease("interactive", "worker", 60)["job_id"] == "urgent"
+    assert queue.lease("batch", "worker", 60)["job_id"] == "old"
+
+
+def test_events_saved_with_progress(queue):
+    queue.enqueue("job-1", {}, "batch")
+    token = queue.lease("batch", "worker", 60)["lease_token"]
+    queue.heartbeat("job-1", token, 60, events=[{"id": 1, "type": "stage"}, {"id": 2, "type": "ad"}])
+    queue.finish("job-1", token, JobStatus.COMPLETED, {}, events=[{"id": 2, "type": "ad"}, {"id": 3, "type": "done"}])
+    assert [event["id"] for event in queue.events("job-1")] == [1, 2, 3]
+    assert [event["id"] for event in queue.events("job-1", after=2)] == [3]
+
+
+def test_counts(queue):
+    for job_id in ("job-1", "job-2", "job-3"):
+        queue.enqueue(job_id, {}, "batch")
+    token = queue.lease("batch", "worker", 60)["lease_token"]
+    assert (queue.count_active(), queue.depth()) == (3, 2)
+    queue.finish("job-1", token, JobStatus.COMPLETED, {})
+    assert (queue.count_active(), queue.depth()) == (2, 2)
+    assert queue.count_active() == len(queue.active())
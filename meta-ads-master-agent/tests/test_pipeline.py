@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from pipeline import run_task_graph
+
+
+def node(calls, name, deps=(), ok=True, delay=0.0):
+    async def factory():
+        calls.append(name)
+        await asyncio.sleep(delay)
+        return ok
+    return list(deps), factory
+
+
+def test_runs_independent_nodes_concurrently():
+    order = []
+
+    def tracked(name, deps=()):
+        async def factory():
+            order.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            order.append(f"end {name}")
+            return True
+        return list(deps), factory
+
+    results = asyncio.run(run_task_graph({
+        "image": tracked("image"),
+        "campaign": tracked("campaign"),
+        "ad": tracked("ad", ["image", "campaign"]),
+    }))
+    assert results == {"image": True, "campaign": True, "ad": True}
+    assert order[:2] == ["start image", "start campaign"]
+    assert order[-2:] == ["start ad", "end ad"]
+
+
+def test_failure_skips_dependents_but_not_siblings():
+    calls = []
+    results = asyncio.run(run_task_graph({
+        "image": node(calls, "image", ok=False),
+        "campaign": node(calls, "campaign", delay=0.01),
+        "adset": node(calls, "adset", ["campaign"]),
+        "ad": node(calls, "ad", ["image", "adset"]),
+        "report": node(calls, "report", ["ad"]),
+    }))
+    assert results == {"image": False, "campaign": True, "adset": True, "ad": False, "report": False}
+    assert sorted(calls) == ["adset", "campaign", "image"]
+
+
+def test_exception_propagates():
+    async def boom():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_task_graph({"a": ([], boom)}))
+
+
+def test_dependencies_must_be_listed_first():
+    calls = []
+    with pytest.raises(ValueError):
+        asyncio.run(run_task_graph({
+            "ad": node(calls, "ad", ["image"]),
+            "image": node(calls, "image"),
+        }))
+    assert calls == []
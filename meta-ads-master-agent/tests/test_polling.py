@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from polling import AdaptivePollSchedule, CallbackPollSchedule, FixedPollSchedule
+from tasks import GenerationTask, TaskState, TaskStatus, TaskTracker
+
+
+def make_task(style: str = "mrbeast", created_at: float = 1000.0) -> GenerationTask:
+    return GenerationTask(task_id="t1", hook_name="hook", creative_style=style, model="banana",
+                          created_at=created_at)
+
+
+def learn(schedule, durations, style: str = "mrbeast"):
+    for duration in durations:
+        schedule.observe(make_task(style), duration)
+
+
+class TestAdaptivePollSchedule:
+    def test_fixed_interval_until_enough_samples(self):
+        schedule = AdaptivePollSchedule(interval=5, min_samples=5)
+        task = make_task()
+        learn(schedule, [10, 11, 12, 13])
+        assert schedule.first_check(task) == 1005
+        assert schedule.next_check(task, 1005) == 1010
+
+    def test_first_check_at_learned_quantile(self):
+        schedule = AdaptivePollSchedule(interval=5, first_quantile=0.2, min_samples=5)
+        learn(schedule, range(10, 20))
+        assert schedule.first_check(make_task()) == 1011  # p20 of 10..19
+
+    def test_checks_spaced_by_spread_between_bounds(self):
+        schedule = AdaptivePollSchedule(interval=5, min_interval=1, steps=4, min_samples=5)
+        task = make_task()
+        learn(schedule, range(10, 20))
+        assert schedule.next_check(task, 1012) == 1014  # (p90 18 - p10 10) / 4
+
+        narrow = AdaptivePollSchedule(interval=5, min_interval=1, steps=4, min_samples=5)
+        learn(narrow, [10] * 10)
+        assert narrow.next_check(task, 1010) == 1011  # Never below min_interval
+
+        wide = AdaptivePollSchedule(interval=5, min_interval=1, steps=4, min_samples=5)
+        learn(wide, range(10, 100, 9))
+        assert wide.next_check(task, 1020) == 1025  # Never above interval
+
+    def test_overrunning_task_checked_at_widening_interval(self):
+        schedule = AdaptivePollSchedule(interval=5, max_interval=8, steps=4, min_samples=5)
+        task = make_task()
+        learn(schedule, range(10, 20))  # p95 is 19
+        assert schedule.next_check(task, 1029) == 1034  # Half the 10s overrun
+        assert schedule.next_check(task, 1049) == 1057  # Capped at max_interval
+
+    def test_style_falls_back_to_model_samples(self):
+        schedule = AdaptivePollSchedule(interval=5, first_quantile=0.2, min_samples=5)
+        learn(schedule, range(10, 20), style="mrbeast")
+        learn(schedule, [40, 41], style="minimal")
+        assert schedule.first_check(make_task("minimal")) == 1012  # p20 of the 12 pooled model times
+        learn(schedule, [42, 43, 44], style="minimal")
+        assert schedule.first_check(make_task("minimal")) == 1040  # Its own once it has enough
+
+        stats = schedule.to_dict()
+        assert stats["distributions"]["banana/minimal"]["samples"] == 5
+        assert stats["models"]["banana"]["samples"] == 15
+
+
+class TestCallbackPollSchedule:
+    def test_reconciles_after_p95_then_every_interval(self):
+        schedule = CallbackPollSchedule(interval=30, min_samples=5)
+        task = make_task()
+        assert schedule.first_check(task) == 1030
+        learn(schedule, range(40, 50))
+        assert schedule.first_check(task) == 1049
+        assert schedule.next_check(task, 1049) == 1079
+
+
+def tracker_with(statuses=()):
+    finished = []
+    readings = list(statuses)
+
+    async def check(task):
+        return readings.pop(0) if readings else None
+
+    async def on_finish(task):
+        finished.append(task.task_id)
+
+    tracker = TaskTracker(check, on_finish, schedule=AdaptivePollSchedule(min_samples=1))
+    return tracker, finished
+
+
+class TestTaskTrackerResolve:
+    def test_poll_and_callback_resolve_once(self):
+        async def scenario():
+            tracker, finished = tracker_with([TaskStatus("success", image_url="https://img/1", duration=8.0)])
+            task = make_task()
+            tracker.add(task)
+            waiter = asyncio.create_task(tracker.wait(task, 5))
+
+            await tracker._check(task)  # Poll finds it done
+            await tracker.resolve(task, TaskStatus("success", image_url="https://img/2", duration=9.0),
+                                  pushed=True)  # Late callback
+            return tracker, finished, task, await waiter
+
+        tracker, finished, task, woke = asyncio.run(scenario())
+        assert woke
+        assert finished == ["t1"]
+        assert task.state == TaskState.SUCCEEDED
+        assert task.image_url == "https://img/1"
+        stats = tracker.poll_stats()
+        assert stats["finished"] == 1
+        assert stats["callbacks"] == 0
+        assert stats["schedule"]["models"]["banana"]["samples"] == 1
+
+    def test_callback_confirms_with_a_status_check(self):
+        async def scenario():
+            tracker, finished = tracker_with([TaskStatus("success", image_url="https://img/1", duration=8.0)])
+            task = make_task()
+            tracker.add(task)
+            await tracker.confirm(task)
+            await tracker.confirm(task)  # Repeated callback
+            return tracker, finished, task
+
+        tracker, finished, task = asyncio.run(scenario())
+        assert finished == ["t1"]
+        assert task.image_url == "https://img/1"
+        assert tracker.callbacks == 1
+        assert tracker.status_checks == 1
+
+    def test_callback_for_unfinished_task_leaves_it_pending(self):
+        async def scenario():
+            tracker, finished = tracker_with([TaskStatus("waiting")])
+            task = make_task()
+            tracker.add(task)
+            await tracker.confirm(task)
+            return tracker, finished, task
+
+        tracker, finished, task = asyncio.run(scenario())
+        assert not task.finished
+        assert finished == []
+        assert tracker.callbacks == 0
+
+    @pytest.mark.parametrize("status", [TaskStatus("fail", error="NSFW"), TaskStatus("success")])
+    def test_failure_or_missing_image_fails_task(self, status):
+        async def scenario():
+            tracker, finished = tracker_with()
+            task = make_task()
+            tracker.add(task)
+            await tracker.resolve(task, status)
+            return tracker, task
+
+        tracker, task = asyncio.run(scenario())
+        assert task.state == TaskState.FAILED
+        assert task.error
+        assert tracker.detected == 0
+
+
+def test_fixed_schedule():
+    schedule = FixedPollSchedule(interval=5)
+    assert schedule.first_check(make_task()) == 1005
+    assert schedule.next_check(make_task(), 1100) == 1105
@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from scheduler import CronExpression, MisfirePolicy, Scheduler, ScheduleStore
+
+
+def ts(text: str, tz: str = "UTC") -> float:
+    return datetime.fromisoformat(text).replace(tzinfo=ZoneInfo(tz)).timestamp()
+
+
+def wall(timestamp: float, tz: str = "UTC") -> str:
+    return datetime.fromtimestamp(timestamp, ZoneInfo(tz)).strftime("%Y-%m-%d %H:%M %Z")
+
+
+class TestCronParsing:
+    def test_ranges_steps_and_lists(self):
+        cron = CronExpression("0,30 9-17/2 1-5 jan-mar mon-fri")
+        assert cron.minutes == {0, 30}
+        assert cron.hours == {9, 11, 13, 15, 17}
+        assert cron.days == {1, 2, 3, 4, 5}
+        assert cron.months == {1, 2, 3}
+        assert cron.weekdays == {1, 2, 3, 4, 5}
+
+    def test_star_step_and_open_ended_step(self):
+        assert CronExpression("*/15 * * * *").minutes == {0, 15, 30, 45}
+        assert CronExpression("10/20 * * * *").minutes == {10, 30, 50}
+
+    def test_sunday_as_seven_and_macros(self):
+        assert CronExpression("0 0 * * 7").weekdays == {0}
+        assert CronExpression("@weekly").weekdays == {0}
+        assert CronExpression("@daily").hours == {0}
+
+    @pytest.mark.parametrize("expression", [
+        "* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "5-1 * * * *", "*/0 * * * *", "x * * * *",
+    ])
+    def test_invalid_expressions(self, expression):
+        with pytest.raises(ValueError):
+            CronExpression(expression)
+
+    def test_day_of_month_or_day_of_week(self):
+        # The 13th, or any Friday
+        cron = CronExpression("0 0 13 * fri")
+        assert wall(cron.next_after(ts("2026-10-01 00:00"))) == "2026-10-02 00:00 UTC"  # Friday
+        assert wall(cron.next_after(ts("2026-10-10 00:00"))) == "2026-10-13 00:00 UTC"  # Tuesday the 13th
+
+    def test_single_restricted_day_field(self):
+        assert wall(CronExpression("0 0 13 * *").next_after(ts("2026-10-01 00:00"))) == "2026-10-13 00:00 UTC"
+        assert wall(CronExpression("0 0 * * fri").next_after(ts("2026-10-10 00:00"))) == "2026-10-16 00:00 UTC"
+
+
+class TestNextAfter:
+    def test_strictly_after(self):
+        cron = CronExpression("*/5 * * * *")
+        assert wall(cron.next_after(ts("2026-10-17 10:05"))) == "2026-10-17 10:10 UTC"
+        assert wall(cron.next_after(ts("2026-10-17 10:05:59"))) == "2026-10-17 10:10 UTC"
+
+    def test_across_month_and_year_ends(self):
+        assert wall(CronExpression("0 0 31 * *").next_after(ts("2026-04-01 00:00"))) == "2026-05-31 00:00 UTC"
+        assert wall(CronExpression("@monthly").next_after(ts("2026-12-15 00:00"))) == "2027-01-01 00:00 UTC"
+        assert wall(CronExpression("0 12 29 feb *").next_after(ts("2026-03-01 00:00"))) == "2028-02-29 12:00 UTC"
+
+    def test_in_timezone(self):
+        fires = CronExpression("0 9 * * *").next_after(ts("2026-10-17 12:00"), "Europe/Berlin")
+        assert wall(fires, "Europe/Berlin") == "2026-10-18 09:00 CEST"
+
+    def test_spring_forward_gap_runs_once(self):
+        # 02:30 does not exist on 2026-03-08 in New York; it runs at 03:30 EDT
+        tz = "America/New_York"
+        cron = CronExpression("30 2 * * *")
+        first = cron.next_after(ts("2026-03-07 12:00", tz), tz)
+        assert wall(first, tz) == "2026-03-08 03:30 EDT"
+        assert wall(cron.next_after(first, tz), tz) == "2026-03-09 02:30 EDT"
+
+    def test_fall_back_runs_repeated_time_once(self):
+        tz = "America/New_York"
+        cron = CronExpression("30 1 * * *")
+        first = cron.next_after(ts("2026-10-31 12:00", tz), tz)
+        assert wall(first, tz) == "2026-11-01 01:30 EDT"
+        assert wall(cron.next_after(first, tz), tz) == "2026-11-02 01:30 EST"
+
+    def test_fall_back_from_inside_repeated_hour_moves_forward(self):
+        tz = "America/New_York"
+        cron = CronExpression("*/15 * * * *")
+        # 01:20 EST, the second 01:20 of the night; 01:30 EDT is already in the past
+        now = ts("2026-11-01 06:20")
+        fires = cron.next_after(now, tz)
+        assert fires > now
+        assert wall(fires, tz) == "2026-11-01 01:30 EST"
+
+    def test_never_fires(self):
+        with pytest.raises(ValueError):
+            CronExpression("0 0 31 feb *").next_after(ts("2026-01-01 00:00"))
+
+
+class TestMisfirePolicies:
+    @pytest.fixture
+    def scheduler(self, tmp_path):
+        submitted = []
+
+        def submit(params):
+            submitted.append(params)
+            return f"job-{len(submitted)}"
+
+        scheduler = Scheduler(ScheduleStore(str(tmp_path / "schedules.db")), submit,
+                              is_active=lambda job_id: False, max_catchup=2)
+        scheduler.submitted = submitted
+        return scheduler
+
+    def schedule(self, policy, fire_at, **fields):
+        return {
+            "schedule_id": "s1", "name": "hourly", "cron": "0 * * * *", "timezone": "UTC",
+            "ads_to_create": 1, "daily_budget": 500, "params": {}, "enabled": True,
+            "jitter_seconds": 0, "misfire_policy": policy, "misfire_grace_seconds": 300,
+            "next_fire_at": fire_at, "next_run_at": fire_at, "last_job_id": None,
+            "runs": 0, "skipped": 0, "catchup_runs": 0, **fields,
+        }
+
+    def test_on_time_run_within_grace(self, scheduler):
+        fire_at = ts("2026-10-17 10:00")
+        changes = scheduler._advance(self.schedule(MisfirePolicy.SKIP, fire_at), fire_at + 60)
+        assert changes["last_job_id"] == "job-1"
+        assert wall(changes["next_fire_at"]) == "2026-10-17 11:00 UTC"
+        assert scheduler.submitted[0]["scheduled_for"] == "2026-10-17T10:00:00+00:00"
+
+    def test_skip_drops_missed_runs(self, scheduler):
+        fire_at = ts("2026-10-17 10:00")
+        changes = scheduler._advance(self.schedule(MisfirePolicy.SKIP, fire_at), ts("2026-10-17 13:30"))
+        assert "last_job_id" not in changes
+        assert changes["skipped"] == 4  # 10:00, 11:00, 12:00 and 13:00
+        assert wall(changes["next_fire_at"]) == "2026-10-17 14:00 UTC"
+        assert scheduler.submitted == []
+
+    def test_run_once_runs_one_for_all_missed(self, scheduler):
+        fire_at = ts("2026-10-17 10:00")
+        changes = scheduler._advance(self.schedule(MisfirePolicy.RUN_ONCE, fire_at), ts("2026-10-17 13:30"))
+        assert changes["last_job_id"] == "job-1"
+        assert changes["skipped"] == 3
+        assert wall(changes["next_fire_at"]) == "2026-10-17 14:00 UTC"
+
+    def test_run_all_catches_up_to_max_catchup(self, scheduler):
+        now = ts("2026-10-17 13:30")
+        schedule = self.schedule(MisfirePolicy.RUN_ALL, ts("2026-10-17 10:00"))
+        fired = []
+        for _ in range(3):
+            changes = scheduler._advance(schedule, now)
+            fired.append(scheduler.submitted[-1]["scheduled_for"])
+            schedule.update(changes)
+        assert fired == ["2026-10-17T10:00:00+00:00", "2026-10-17T11:00:00+00:00", "2026-10-17T12:00:00+00:00"]
+        # Past max_catchup the rest is one run, as with run_once
+        assert schedule["catchup_runs"] == 0
+        assert schedule["skipped"] == 1
+        assert wall(schedule["next_fire_at"]) == "2026-10-17 14:00 UTC"
+
+    def test_never_overlaps_an_active_run(self, scheduler):
+        scheduler.is_active = lambda job_id: True
+        schedule = self.schedule(MisfirePolicy.RUN_ONCE, ts("2026-10-17 10:00"), last_job_id="job-0")
+        assert scheduler._advance(schedule, ts("2026-10-17 10:00")) == {}
+        assert scheduler.submitted == []
+
+    def test_tick_fires_and_stores_next_run(self, scheduler):
+        spec = self.schedule(MisfirePolicy.RUN_ONCE, 0.0)
+        created = scheduler.store.create(spec)
+        asyncio.run(scheduler.tick())
+        stored = scheduler.store.get(created["schedule_id"])
+        assert stored["last_job_id"] == "job-1"
+        assert stored["runs"] == 1
+        assert stored["next_run_at"] > stored["last_run_at"]